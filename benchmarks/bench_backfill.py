@@ -0,0 +1,90 @@
+# benchmarks/bench_backfill.py
+"""Backfill throughput over a directory of compressed archives
+
+Writes --files archives (gz, bz2 and xz in turn) of synthetic apache and
+firewall logs, then backfills them into a fake ES client with 1 worker and
+with --workers, so the scaling across cores is visible.
+
+Run from the project root:
+    python -m benchmarks.bench_backfill --files 12 --lines 50000 --workers 4
+"""
+import argparse
+import bz2
+import functools
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.fake_es import FakeESClient
+from benchmarks.synthetic_logs import apache_lines, firewall_lines
+from src.backfill import Backfill
+
+
+WRITERS = [(".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)]
+
+
+class CountingClient(FakeESClient):
+    """Fake client that keeps a count instead of every document"""
+
+    def bulk(self, operations=None, body=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        count = len(operations) // 2
+        return {"errors": False, "items": [{"index": {"status": 201}}] * count}
+
+
+def write_archives(directory, files, lines):
+    total = 0
+    for n in range(files):
+        suffix, opener = WRITERS[n % len(WRITERS)]
+        make = apache_lines if n % 2 else firewall_lines
+        path = os.path.join(directory, f"archive-{n:03d}.log{suffix}")
+        with opener(path, "wt") as f:
+            f.write("\n".join(make(lines, seed=n)) + "\n")
+        total += os.path.getsize(path)
+    return total
+
+
+def run(directory, workers, lines_total):
+    state_dir = tempfile.mkdtemp(prefix="siem-backfill-state-")
+    try:
+        backfill = Backfill(
+            state_path=os.path.join(state_dir, "state.json"),
+            workers=workers,
+            client_factory=functools.partial(CountingClient, latency=0.001),
+            report_interval=60
+        )
+        start = time.perf_counter()
+        result = backfill.run([directory])
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(state_dir)
+
+    print(f"{workers} worker(s) {result['lines'] / elapsed:>12,.0f} lines/sec  "
+          f"({result['lines']:,}/{lines_total:,} lines in {elapsed:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--lines", type=int, default=50000, help="lines per archive")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="siem-backfill-")
+    try:
+        size = write_archives(directory, args.files, args.lines)
+        print(f"{args.files} archives, {size / 1024 ** 2:,.1f} MiB compressed")
+
+        run(directory, 1, args.files * args.lines)
+        if args.workers > 1:
+            run(directory, args.workers, args.files * args.lines)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_bulk_indexer.py
+"""Compare per-line indexing against the BulkIndexer on a fake ES client
+
+Run from the project root:
+    python -m benchmarks.bench_bulk_indexer --lines 20000 --latency 0.001
+"""
+import argparse
+import time
+
+from benchmarks.fake_es import FakeESClient
+from src.bulk_indexer import BulkIndexer
+from src.log_collector import LogFileHandler
+
+
+SAMPLE_LINE = '2026-02-07 10:15:30 DENY TCP 10.0.0.50:12345 -> 192.168.1.10:80'
+
+
+class PerLineIndexer:
+    """The pre-bulk behaviour: one index() round trip per line"""
+
+    def __init__(self, es_client):
+        self.es_client = es_client
+
+    def add(self, index_name, doc, doc_id=None):
+        self.es_client.index(index=index_name, document=doc)
+
+    def add_batch(self, batch):
+        for index_name, doc in batch:
+            self.add(index_name, doc)
+
+    def close(self):
+        pass
+
+
+def run(name, es_client, indexer, lines):
+    handler = LogFileHandler(es_client, "siem-logs", indexer)
+
+    start = time.perf_counter()
+    for _ in range(lines):
+        handler.index_log_entry("bench.log", SAMPLE_LINE)
+    indexer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<10} {lines / elapsed:>12,.0f} lines/sec  "
+          f"({es_client.requests} requests, {len(es_client.docs)} docs stored)")
+
+    if isinstance(indexer, BulkIndexer):
+        print(f"{'':<10} stats: {indexer.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.001,
+                        help="simulated round trip per request, seconds")
+    parser.add_argument("--reject-rate", type=float, default=0.0,
+                        help="fraction of bulk items answered with 429")
+    parser.add_argument("--max-docs", type=int, default=500)
+    args = parser.parse_args()
+
+    es_client = FakeESClient(latency=args.latency)
+    run("per-line", es_client, PerLineIndexer(es_client), args.lines)
+
+    es_client = FakeESClient(latency=args.latency, reject_rate=args.reject_rate)
+    indexer = BulkIndexer(es_client, max_docs=args.max_docs, backoff=0.01)
+    run("bulk", es_client, indexer, args.lines)
+
+
+if __name__ == "__main__":
+    main()
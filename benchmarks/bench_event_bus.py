@@ -0,0 +1,55 @@
+# benchmarks/bench_event_bus.py
+"""Fan events out to many simulated dashboard tabs through the EventBus
+
+Run from the project root:
+    python -m benchmarks.bench_event_bus --clients 500 --events 20000
+"""
+import time
+import argparse
+import threading
+
+from src.event_bus import EventBus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    bus = EventBus(max_subscribers=args.clients)
+    received = [0] * args.clients
+    stop = threading.Event()
+
+    def client(i, subscription):
+        while not stop.is_set():
+            received[i] += len(subscription.get(timeout=0.1))
+
+    # Half the tabs only want critical alerts, the rest take everything
+    threads = []
+    for i in range(args.clients):
+        filters = {"severity": {"critical"}} if i % 2 else None
+        subscription = bus.subscribe(["alerts"], filters)
+        thread = threading.Thread(target=client, args=(i, subscription), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    severities = ["critical", "high", "medium", "low"]
+    start = time.perf_counter()
+    for n in range(args.events):
+        bus.publish("alerts", {"rule_name": "bench", "severity": severities[n % 4]})
+    publish_elapsed = time.perf_counter() - start
+
+    time.sleep(1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    dropped = sum(s.dropped for s in bus.subscribers)
+    print(f"{args.events:,} events to {args.clients} clients: "
+          f"{args.events / publish_elapsed:,.0f} publishes/sec, "
+          f"{sum(received):,} deliveries, {dropped:,} dropped by backpressure")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_index_pruning.py
+"""Query latency over every log partition versus only the ones in range
+
+Needs a running Elasticsearch. Loads --days of synthetic logs into daily
+partitions under a throwaway prefix, then runs the dashboard and detector
+query shapes against `<prefix>-*` and against the pruned index list.
+
+Run from the project root:
+    python -m benchmarks.bench_index_pruning --days 28 --docs-per-day 20000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from elasticsearch import Elasticsearch
+
+from benchmarks.synthetic_logs import apache_lines, firewall_lines
+from src.bulk_indexer import BulkIndexer
+from src.index_manager import IndexManager, indices_for_range
+from src.log_parser import LogParser
+from src.pipeline import IngestPipeline
+
+
+QUERIES = {
+    "last 5m by ip": ("now-5m", {
+        "size": 0,
+        "query": {"range": {"timestamp": {"gte": "now-5m", "lte": "now"}}},
+        "aggs": {"keys": {"terms": {"field": "ip_address", "size": 1000, "min_doc_count": 5}}}
+    }),
+    "last 1h latest": ("now-1h", {
+        "size": 100,
+        "query": {"range": {"timestamp": {"gte": "now-1h", "lte": "now"}}},
+        "sort": [{"timestamp": "desc"}]
+    }),
+    "last 24h count": ("now-24h", {
+        "size": 0,
+        "track_total_hits": True,
+        "query": {"range": {"timestamp": {"gte": "now-24h", "lte": "now"}}}
+    }),
+    "last 7d denies": ("now-7d", {
+        "size": 0,
+        "query": {"bool": {"filter": [
+            {"range": {"timestamp": {"gte": "now-7d", "lte": "now"}}},
+            {"term": {"action": "DENY"}}
+        ]}},
+        "aggs": {"keys": {"terms": {"field": "source_ip", "size": 100}}}
+    })
+}
+
+
+def load(es_client, prefix, days, docs_per_day):
+    manager = IndexManager(es_client, prefix=prefix, retention_days=None)
+    manager.install_templates()
+
+    indexer = BulkIndexer(es_client, max_docs=2000)
+    pipeline = IngestPipeline(indexer, LogParser(), prefix, indices=manager)
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    per_hour = max(1, docs_per_day // 48)
+
+    start = time.perf_counter()
+    for day in range(days, -1, -1):
+        for hour in range(24):
+            ts = now - timedelta(days=day, hours=hour)
+            if ts > now:
+                continue
+            seed = day * 24 + hour
+            pipeline.process_lines("bench.log", apache_lines(per_hour, seed=seed, start=ts), prefix)
+            pipeline.process_lines("bench.log", firewall_lines(per_hour, seed=seed, start=ts), prefix)
+    indexer.close()
+    es_client.indices.refresh(index=f"{prefix}-*")
+
+    print(f"loaded {indexer.stats['flushed']:,} docs into "
+          f"{len(manager.partitions(prefix))} partitions in {time.perf_counter() - start:.1f}s")
+
+
+def timed(es_client, index, body, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        es_client.search(index=index, body=body, request_cache=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:9200")
+    parser.add_argument("--prefix", default="siem-bench")
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--docs-per-day", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark indices")
+    args = parser.parse_args()
+
+    es_client = Elasticsearch(args.url, request_timeout=120)
+    load(es_client, args.prefix, args.days, args.docs_per_day)
+
+    try:
+        print(f"{'query':<16} {'all (ms)':>10} {'pruned (ms)':>12}  partitions")
+        for name, (start, body) in QUERIES.items():
+            pruned = indices_for_range(args.prefix, start)
+            everything = timed(es_client, f"{args.prefix}-*", body, args.repeat)
+            narrowed = timed(es_client, pruned, body, args.repeat)
+            print(f"{name:<16} {everything:>10.2f} {narrowed:>12.2f}  {len(pruned.split(','))}")
+    finally:
+        if not args.keep:
+            es_client.indices.delete(index=f"{args.prefix}-*")
+            es_client.indices.delete_index_template(name=args.prefix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_local_store.py
+"""Measure ingest rate and query latency of the embedded local store
+
+Parses synthetic apache and firewall lines through the ingest pipeline into
+a LocalStore on disk, then times the queries the dashboard and the
+aggregate/incremental detectors issue.
+
+Run from the project root:
+    python -m benchmarks.bench_local_store --lines 200000
+"""
+import os
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.synthetic_logs import apache_lines, firewall_lines
+from src.bulk_indexer import BulkIndexer
+from src.local_store import LocalStore
+from src.pipeline import IngestPipeline
+from src.rule_queries import LOG_INDEX_PATTERN
+
+
+QUERIES = {
+    "count (24h)": {
+        "size": 0, "track_total_hits": True,
+        "query": {"range": {"ingest_timestamp": {"gte": "now-24h"}}}
+    },
+    "latest 50 logs": {
+        "size": 50, "sort": [{"ingest_timestamp": "desc"}, {"_shard_doc": "desc"}]
+    },
+    "logs by type + minute": {
+        "size": 0,
+        "query": {"range": {"ingest_timestamp": {"gte": "now-24h"}}},
+        "aggs": {
+            "types": {"terms": {"field": "log_type"}},
+            "minutes": {"date_histogram": {"field": "ingest_timestamp", "fixed_interval": "1m"}}
+        }
+    },
+    "one IP, 10m": {
+        "size": 100,
+        "query": {"bool": {"filter": [
+            {"term": {"source_ip": "10.0.0.50"}},
+            {"range": {"timestamp": {"gte": "now-10m"}}}
+        ]}}
+    },
+    "port scan rule, 2m": {
+        "size": 0,
+        "query": {"bool": {"filter": [
+            {"range": {"timestamp": {"gte": "now-2m"}}},
+            {"term": {"log_type": "firewall"}},
+            {"term": {"action": "DENY"}}
+        ]}},
+        "aggs": {"groups": {
+            "terms": {"field": "source_ip", "size": 1000},
+            "aggs": {
+                "distinct": {"cardinality": {"field": "destination_port"}},
+                "over_threshold": {"bucket_selector": {
+                    "buckets_path": {"distinct": "distinct"}, "script": "params.distinct >= 10"
+                }}
+            }
+        }}
+    }
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Events spread over the last ~2 hours so the time filters have work to do
+    start = datetime.now(timezone.utc) - timedelta(hours=2)
+    half = args.lines // 2
+    sources = [("/var/log/apache2/access.log", apache_lines(half, start=start)),
+               ("/var/log/firewall.log", firewall_lines(half, start=start))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "siem.db")
+        store = LocalStore(path)
+        indexer = BulkIndexer(store)
+        pipeline = IngestPipeline(indexer)
+
+        started = time.perf_counter()
+        for source, lines in sources:
+            for i in range(0, len(lines), args.batch_size):
+                pipeline.process_lines(source, lines[i:i + args.batch_size])
+        indexer.close()
+        elapsed = time.perf_counter() - started
+
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        print(f"ingest:    {args.lines:,} lines in {elapsed:.2f}s = {args.lines / elapsed:,.0f} lines/s "
+              f"(parse + index, {size_mb:,.0f} MB on disk)")
+
+        for name, body in QUERIES.items():
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = store.search(index=LOG_INDEX_PATTERN, body=body)
+                timings.append(time.perf_counter() - started)
+            hits = response["hits"]["total"]["value"]
+            print(f"{name:<22} {min(timings) * 1000:>9.1f} ms (best of {args.repeat}, {hits:,} hits)")
+
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_metrics.py
+"""Measure the ingest overhead of pipeline and rule metrics
+
+Runs the parse + streaming detection path with the real metrics and with
+no-op stand-ins, alternating, and reports the difference.
+
+Run from the project root:
+    python -m benchmarks.bench_metrics --lines 100000
+"""
+import time
+import argparse
+
+from benchmarks.synthetic_logs import apache_lines, firewall_lines
+import src.pipeline as pipeline_module
+import src.rule_engine as rule_engine_module
+from src.pipeline import IngestPipeline
+from src.threat_detector import ThreatDetector
+from benchmarks.fake_es import FakeESClient
+
+
+class NullMetric:
+    def inc(self, *args):
+        pass
+
+    def observe(self, *args):
+        pass
+
+
+INSTRUMENTED = {
+    pipeline_module: ("LINES_READ", "LINES_PARSED", "PARSE_SECONDS", "INGEST_LAG"),
+    rule_engine_module: ("RULE_MATCHES",)
+}
+
+
+class CollectingIndexer:
+    def add_batch(self, batch):
+        pass
+
+
+def run(lines, batch_size):
+    detector = ThreatDetector(FakeESClient())
+    pipeline = IngestPipeline(CollectingIndexer())
+    pipeline.add_sink(detector.engine.process_batch)
+
+    start = time.perf_counter()
+    for i in range(0, len(lines), batch_size):
+        pipeline.process_lines("bench.log", lines[i:i + batch_size])
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = apache_lines(args.lines // 2) + firewall_lines(args.lines // 2)
+    real = {module: {name: getattr(module, name) for name in names}
+            for module, names in INSTRUMENTED.items()}
+
+    rates = {"with metrics": [], "without": []}
+    for _ in range(args.rounds):
+        for module, metrics in real.items():
+            for name, metric in metrics.items():
+                setattr(module, name, metric)
+        rates["with metrics"].append(run(lines, args.batch_size))
+
+        for module, names in INSTRUMENTED.items():
+            for name in names:
+                setattr(module, name, NullMetric())
+        rates["without"].append(run(lines, args.batch_size))
+
+    best = {name: max(values) for name, values in rates.items()}
+    for name, rate in best.items():
+        print(f"{name:<14} {rate:>12,.0f} lines/sec (best of {args.rounds})")
+    overhead = (best["without"] - best["with metrics"]) / best["without"] * 100
+    print(f"overhead       {overhead:>11.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_network_input.py
+"""Load-generate syslog over UDP and JSON over TCP against a localhost listener
+
+The listener feeds a real IngestPipeline (parse, sinks, routing) whose
+indexer only counts documents, so the numbers cover socket reads, framing,
+syslog stripping and parsing. UDP reports loss as well as throughput; an
+unpaced sender on the same host will overrun the receive buffer, so use
+--rate to find the sustainable rate.
+
+Run from the project root:
+    python -m benchmarks.bench_network_input --messages 200000
+"""
+import argparse
+import json
+import socket
+import time
+
+from benchmarks.synthetic_logs import firewall_lines
+from src.log_parser import LogParser
+from src.network_input import NetworkListener
+from src.pipeline import IngestPipeline
+
+
+class CountingIndexer:
+    def __init__(self):
+        self.count = 0
+
+    def add_batch(self, batch):
+        self.count += len(batch)
+
+
+def syslog_messages(count):
+    return [
+        f"<134>Feb  7 10:15:30 fw01 kernel: {line}".encode()
+        for line in firewall_lines(min(count, 10000))
+    ]
+
+
+def json_lines(count):
+    return [
+        json.dumps({"timestamp": "2026-02-07T10:15:30Z", "source_ip": "10.0.0.5",
+                    "event": "login", "seq": n}).encode()
+        for n in range(min(count, 10000))
+    ]
+
+
+def wait_for(indexer, expected, listener, idle_timeout=2.0):
+    # Stop once the count reaches `expected` or stops moving
+    last, last_change = -1, time.perf_counter()
+    while indexer.count < expected:
+        if indexer.count != last:
+            last, last_change = indexer.count, time.perf_counter()
+        elif time.perf_counter() - last_change > idle_timeout:
+            break
+        time.sleep(0.01)
+    return last_change if indexer.count < expected else time.perf_counter()
+
+
+def run_udp(args):
+    indexer = CountingIndexer()
+    listener = NetworkListener(IngestPipeline(indexer, LogParser()), "udp", "127.0.0.1", 0,
+                               "syslog", recv_buffer=args.recv_buffer)
+    listener.start()
+
+    messages = syslog_messages(args.messages)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    start = time.perf_counter()
+    for n in range(args.messages):
+        sender.sendto(messages[n % len(messages)], listener.address)
+        # Pace in bursts of 100 when a target rate is given
+        if args.rate and n % 100 == 99:
+            delay = start + (n + 1) / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    end = wait_for(indexer, args.messages, listener)
+    listener.close()
+
+    loss = 1 - indexer.count / args.messages
+    print(f"udp syslog {indexer.count / (end - start):>12,.0f} msgs/sec  "
+          f"({indexer.count:,} of {args.messages:,} received, {loss:.1%} loss)")
+    print(f"{'':<10} per source: {listener.rates.snapshot()}")
+
+
+def run_tcp(args):
+    indexer = CountingIndexer()
+    listener = NetworkListener(IngestPipeline(indexer, LogParser()), "tcp", "127.0.0.1", 0,
+                               "json", recv_buffer=args.recv_buffer)
+    listener.start()
+
+    lines = json_lines(args.messages)
+    sender = socket.create_connection(listener.address)
+
+    start = time.perf_counter()
+    batch = []
+    for n in range(args.messages):
+        batch.append(lines[n % len(lines)])
+        if len(batch) == 500:
+            sender.sendall(b"\n".join(batch) + b"\n")
+            batch = []
+    if batch:
+        sender.sendall(b"\n".join(batch) + b"\n")
+    sender.close()
+    end = wait_for(indexer, args.messages, listener)
+    listener.close()
+
+    print(f"tcp json   {indexer.count / (end - start):>12,.0f} msgs/sec  "
+          f"({indexer.count:,} of {args.messages:,} received)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--rate", type=int, default=0,
+                        help="UDP messages/sec to send; 0 sends as fast as possible")
+    parser.add_argument("--recv-buffer", type=int, default=8 * 1024 * 1024)
+    args = parser.parse_args()
+
+    run_udp(args)
+    run_tcp(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_parse_pool.py
+"""Show parse throughput scaling from 1 to N worker processes
+
+Run from the project root:
+    python -m benchmarks.bench_parse_pool --lines 400000 --max-workers 8
+"""
+import os
+import time
+import argparse
+
+from benchmarks.synthetic_logs import apache_lines, firewall_lines
+from src.log_parser import LogParser
+from src.parse_pool import ParsePool
+
+
+def bench(parser, lines, read_batch):
+    start = time.perf_counter()
+    for i in range(0, len(lines), read_batch):
+        parser.parse_lines(lines[i:i + read_batch])
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=400000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--read-batch", type=int, default=20000,
+                        help="lines handed to parse_lines per call, like one tailer read")
+    args = parser.parse_args()
+
+    workloads = {
+        "apache": apache_lines(args.lines // 2),
+        "firewall": firewall_lines(args.lines // 2),
+    }
+
+    worker_counts = sorted({1, 2, 4, args.max_workers} & set(range(1, args.max_workers + 1)))
+
+    for name, lines in workloads.items():
+        inline = bench(LogParser(), lines, args.read_batch)
+        print(f"{name}: inline {inline:,.0f} lines/sec")
+
+        for workers in worker_counts:
+            pool = ParsePool(workers=workers, batch_size=args.batch_size)
+            pool.parse_lines(lines[:args.batch_size * workers + 1])  # warm up workers
+            rate = bench(pool, lines, args.read_batch)
+            pool.close()
+            print(f"{name}: {workers:>2} workers {rate:>12,.0f} lines/sec  ({rate / inline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
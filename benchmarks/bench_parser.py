@@ -0,0 +1,63 @@
+# benchmarks/bench_parser.py
+"""Report classify + parse throughput per log format using the files in logs/
+
+Run from the project root:
+    python -m benchmarks.bench_parser --lines 200000
+"""
+import os
+import glob
+import time
+import argparse
+from collections import defaultdict
+
+from src.log_parser import LogParser
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_samples(log_dir):
+    """Group the sample lines in log_dir by their detected format"""
+    parser = LogParser()
+    samples = defaultdict(list)
+
+    for path in sorted(glob.glob(os.path.join(log_dir, "*.log"))):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    samples[parser.get_log_type(line)].append(line)
+
+    return samples
+
+
+def bench(parser, lines, repeat):
+    start = time.perf_counter()
+    parsed = 0
+    for _ in range(repeat):
+        for doc in parser.parse_lines(lines):
+            if doc is not None:
+                parsed += 1
+    elapsed = time.perf_counter() - start
+    return len(lines) * repeat / elapsed, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000,
+                        help="approximate lines parsed per format")
+    parser.add_argument("--log-dir", default=os.path.join(BASE_DIR, "logs"))
+    args = parser.parse_args()
+
+    log_parser = LogParser()
+    samples = load_samples(args.log_dir)
+
+    print(f"{'format':<10} {'sample lines':>12} {'lines/sec':>14} {'parsed':>10}")
+    for log_type, lines in sorted(samples.items()):
+        repeat = max(1, args.lines // len(lines))
+        rate, parsed = bench(log_parser, lines, repeat)
+        print(f"{log_type:<10} {len(lines):>12} {rate:>14,.0f} {parsed:>10}")
+
+
+if __name__ == "__main__":
+    main()
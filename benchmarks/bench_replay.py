@@ -0,0 +1,372 @@
+# benchmarks/bench_replay.py
+"""Replay a log corpus through parser, enrichment, detection and indexing
+
+Feeds recorded log files (plain or compressed, as backfill reads them) or
+a generated corpus through the same pipeline the collector uses, with the
+streaming detector as a sink, either as fast as possible or at the
+corpus's own pace scaled by --speed. Reports throughput, per-stage
+latency percentiles per batch, peak RSS and the alerts raised, and
+appends the result as one JSON line to --output so runs of different
+versions can be compared.
+
+Run from the project root:
+    python -m benchmarks.bench_replay --generate 1000000
+    python -m benchmarks.bench_replay --corpus /var/log/archive --store local
+    python -m benchmarks.bench_replay --generate 100000 --speed 60
+"""
+import os
+import glob
+import json
+import time
+import heapq
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+from benchmarks.synthetic_logs import scale_samples
+from src.backfill import line_batches
+from src.bulk_indexer import BulkIndexer
+from src.local_store import LocalStore
+from src.log_parser import LogParser
+from src.pipeline import IngestPipeline
+from src.threat_detector import ThreatDetector
+from src.threat_intel import ThreatIntel
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "data", "replay_results.jsonl")
+STAGES = ("read", "parse", "enrich", "detect", "index", "batch")
+
+
+class StageTimes:
+    """Seconds per batch for each stage; percentiles are exact"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def timed(self, stage, function):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return wrapper
+
+    @staticmethod
+    def percentile(ordered, share):
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+    def summary(self):
+        result = {}
+        for stage, values in self.samples.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            result[stage] = {
+                "batches": len(values),
+                "total_s": round(sum(values), 4),
+                "p50_ms": round(self.percentile(ordered, 0.50) * 1000, 3),
+                "p90_ms": round(self.percentile(ordered, 0.90) * 1000, 3),
+                "p99_ms": round(self.percentile(ordered, 0.99) * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3)
+            }
+        return result
+
+
+class TimedParser:
+    def __init__(self, parser, times):
+        self.parser = parser
+        self.parse_lines = times.timed("parse", parser.parse_lines)
+
+
+class NullIndexer:
+    def add_batch(self, batch):
+        pass
+
+    def close(self):
+        pass
+
+
+def corpus_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(p for p in glob.glob(os.path.join(path, "**", "*"), recursive=True)
+                                if os.path.isfile(p)))
+        else:
+            files.append(path)
+    return files
+
+
+def batches_fast(files, batch_size, times):
+    """Round-robin batches from every file, read as fast as they are consumed"""
+    readers = [(path, line_batches(path)) for path in files]
+    pending = {path: [] for path in files}
+
+    while readers:
+        for path, reader in list(readers):
+            started = time.perf_counter()
+            buffer = pending[path]
+            while len(buffer) < batch_size:
+                chunk = next(reader, None)
+                if chunk is None:
+                    readers.remove((path, reader))
+                    break
+                buffer.extend(chunk[0])
+            batch, pending[path] = buffer[:batch_size], buffer[batch_size:]
+            times.add("read", time.perf_counter() - started)
+            if batch:
+                yield path, batch, None
+
+
+def timed_lines(path, file_number, parser):
+    """(event millis, file number, line) for one file; unparseable lines reuse the last time"""
+    last = 0
+    for lines, _, _ in line_batches(path):
+        for line in lines:
+            parsed = parser.parse_line(line.strip()) if line.strip() else None
+            if parsed is not None and parsed.get("timestamp_ms") is not None:
+                last = parsed["timestamp_ms"]
+            yield last, file_number, line
+
+
+def batches_paced(files, batch_size, times, tick_ms=1000):
+    """Batches merged across files in event-time order, one per `tick_ms` of event time at most
+
+    Reading includes a timestamp peek per line, which is counted as read time.
+    """
+    peek = LogParser()
+    merged = heapq.merge(*(timed_lines(path, n, peek) for n, path in enumerate(files)))
+
+    started = time.perf_counter()
+    current = []
+    current_path = None
+    first_ms = None
+    for ms, file_number, line in merged:
+        path = files[file_number]
+        if current and (path != current_path or len(current) >= batch_size or ms - first_ms >= tick_ms):
+            times.add("read", time.perf_counter() - started)
+            yield current_path, current, first_ms
+            started = time.perf_counter()
+            current = []
+        if not current:
+            current_path, first_ms = path, ms
+        current.append(line)
+
+    if current:
+        times.add("read", time.perf_counter() - started)
+        yield current_path, current, first_ms
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def previous_result(path, corpus_lines, settings):
+    """Latest earlier run over the same number of lines with the same settings"""
+    previous = None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("corpus", {}).get("lines") == corpus_lines and record.get("settings") == settings:
+                    previous = record
+    except OSError:
+        pass
+    return previous
+
+
+def replay(files, args):
+    times = StageTimes()
+    tmp = tempfile.TemporaryDirectory()
+
+    store = LocalStore(os.path.join(tmp.name, "replay.db") if args.store == "local" else ":memory:")
+    indexer = BulkIndexer(store) if args.store == "local" else NullIndexer()
+    indexer.add_batch = times.timed("index", indexer.add_batch)
+
+    pipeline = IngestPipeline(indexer, TimedParser(LogParser(), times))
+
+    if args.threat_intel:
+        with open(os.path.join(BASE_DIR, "config", "log_sources.json"), "r", encoding="utf-8") as f:
+            config = json.load(f).get("threat_intel")
+        if config:
+            # The sample port scanner, so the threat intel rule has something to find
+            config = dict(config, lists=config.get("lists", []) + [
+                {"name": "demo-blocklist", "path": "benchmarks/demo_blocklist.txt"}
+            ])
+        intel = ThreatIntel.from_config(config, BASE_DIR)
+        if intel is not None:
+            intel.load(force=True)
+            pipeline.add_enricher(times.timed("enrich", intel.enrich))
+
+    # Alerts are stored in the replay's own store, never in a live cluster
+    detector = ThreatDetector(store)
+    firings = {}
+    opened = {}
+
+    def detect(docs):
+        with detector.engine_lock:
+            alerts = detector.engine.process_batch(docs)
+        for alert in alerts:
+            firings[alert["rule_name"]] = firings.get(alert["rule_name"], 0) + 1
+        for alert in detector.emit_alerts(alerts):
+            opened[alert["rule_name"]] = opened.get(alert["rule_name"], 0) + 1
+
+    pipeline.add_sink(times.timed("detect", detect))
+
+    paced = args.speed > 0
+    batches = (batches_paced(files, args.batch_size, times) if paced
+               else batches_fast(files, args.batch_size, times))
+
+    lines = 0
+    behind = []
+    first_ms = None
+    started = time.perf_counter()
+    for path, batch, batch_ms in batches:
+        if paced:
+            first_ms = batch_ms if first_ms is None else first_ms
+            due = started + (batch_ms - first_ms) / 1000.0 / args.speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                behind.append(-wait)
+
+        batch_started = time.perf_counter()
+        pipeline.process_lines(path, batch)
+        times.add("batch", time.perf_counter() - batch_started)
+        lines += len(batch)
+
+    indexer.close()
+    detector.close()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "elapsed_s": round(elapsed, 3),
+        "lines_per_s": round(lines / elapsed, 1) if elapsed else None,
+        "lines": lines,
+        "stages": times.summary(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "alerts": {
+            "firings": sum(firings.values()),
+            "incidents": sum(opened.values()),
+            "by_rule": {rule: {"firings": count, "incidents": opened.get(rule, 0)}
+                        for rule, count in sorted(firings.items())}
+        }
+    }
+    if paced:
+        ordered = sorted(behind)
+        result["behind_schedule"] = {
+            "batches": len(behind),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            "p99_ms": round(StageTimes.percentile(ordered, 0.99) * 1000, 3) if ordered else 0.0
+        }
+    if args.store == "local":
+        result["stored_docs"] = store.count(index="siem-logs-*")["count"]
+
+    store.close()
+    tmp.cleanup()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", nargs="*", default=[],
+                        help="log files or directories to replay (plain, .gz, .bz2, .xz)")
+    parser.add_argument("--generate", type=int, default=0,
+                        help="generate a corpus of about this many lines from logs/sample_*.log")
+    parser.add_argument("--corpus-dir", default=None,
+                        help="where to write the generated corpus (default: a temporary directory)")
+    parser.add_argument("--attack-share", type=float, default=0.01,
+                        help="share of generated lines copied from the samples' incidents")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="event rate of the generated corpus, lines per second")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="0 replays at full speed; N replays at N times the corpus's own pace")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--store", choices=("none", "local"), default="none",
+                        help="index parsed documents into a temporary local store")
+    parser.add_argument("--no-threat-intel", dest="threat_intel", action="store_false")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help="JSON lines file each run's result is appended to")
+    args = parser.parse_args()
+
+    generated = None
+    if args.generate:
+        if args.corpus_dir is None:
+            generated = tempfile.TemporaryDirectory()
+            args.corpus_dir = generated.name
+        started = time.perf_counter()
+        samples = sorted(glob.glob(os.path.join(BASE_DIR, "logs", "sample_*.log")))
+        written = scale_samples(samples, args.corpus_dir, args.generate,
+                                attack_share=args.attack_share, rate=args.rate)
+        print(f"📦 Generated {sum(written.values()):,} lines in {len(written)} files "
+              f"in {time.perf_counter() - started:.1f}s ({args.corpus_dir})")
+        args.corpus.append(args.corpus_dir)
+
+    files = corpus_files(args.corpus)
+    if not files:
+        parser.error("nothing to replay: give --corpus or --generate")
+
+    settings = {"speed": args.speed, "batch_size": args.batch_size, "store": args.store,
+                "threat_intel": args.threat_intel}
+    print(f"🔄 Replaying {len(files)} files ({'full speed' if not args.speed else f'{args.speed}x pace'})")
+    result = replay(files, args)
+
+    record = {
+        "run_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "corpus": {"files": [os.path.basename(path) for path in files], "lines": result["lines"],
+                   "bytes": sum(os.path.getsize(path) for path in files),
+                   "generated": bool(args.generate)},
+        "settings": settings,
+        **{key: value for key, value in result.items() if key != "lines"}
+    }
+
+    print(f"throughput: {result['lines']:,} lines in {result['elapsed_s']:.2f}s "
+          f"= {result['lines_per_s']:,.0f} lines/s, peak RSS {result['peak_rss_mb']:,.0f} MB")
+    print(f"{'stage':<8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total s':>9}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<8} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+              f"{stats['max_ms']:>9.2f} {stats['total_s']:>9.2f}")
+    alerts = result["alerts"]
+    print(f"alerts:   {alerts['firings']:,} firings -> {alerts['incidents']:,} incidents")
+    for rule, counts in alerts["by_rule"].items():
+        print(f"  {rule:<32} {counts['firings']:>8,} {counts['incidents']:>8,}")
+    if "behind_schedule" in result:
+        lag = result["behind_schedule"]
+        print(f"behind:   {lag['batches']:,} batches late, worst {lag['max_ms']:.1f} ms")
+
+    previous = previous_result(args.output, result["lines"], settings)
+    if previous and previous.get("lines_per_s"):
+        change = (result["lines_per_s"] - previous["lines_per_s"]) / previous["lines_per_s"] * 100
+        print(f"vs {previous.get('commit') or 'previous run'}: {change:+.1f}% throughput")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"✅ Result appended to {args.output}")
+
+    if generated is not None:
+        generated.cleanup()
+
+
+if __name__ == "__main__":
+    main()
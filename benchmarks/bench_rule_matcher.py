@@ -0,0 +1,80 @@
+# benchmarks/bench_rule_matcher.py
+"""Compare per-rule regex scanning with the combined RuleMatcher
+
+Run from the project root:
+    python -m benchmarks.bench_rule_matcher --lines 20000
+"""
+import re
+import time
+import random
+import argparse
+
+from benchmarks.synthetic_logs import apache_lines, firewall_lines
+from src.rule_matcher import RuleMatcher
+
+
+WORDS = [
+    "failed", "login", "authentication", "denied", "malware", "trojan", "virus",
+    "scan", "refused", "exploit", "injection", "overflow", "privilege", "sudo",
+    "root", "shell", "payload", "beacon", "exfil", "ransom", "brute", "token",
+    "session", "admin", "backdoor", "miner", "phish", "dropper", "worm", "spyware"
+]
+
+
+def synthetic_rules(count, seed=7):
+    """Rules shaped like threat_rules.json: word.*word alternations"""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        a, b, c = rng.sample(WORDS, 3)
+        rules.append(f"{a}.*{b}{i}|{c}-{i}.*detected")
+    return rules
+
+
+def synthetic_lines(count, seed=11):
+    rng = random.Random(seed)
+    lines = apache_lines(count // 2) + firewall_lines(count - count // 2)
+    # Sprinkle in lines that actually trip rules
+    for i in range(0, len(lines), 50):
+        a, b = rng.sample(WORDS, 2)
+        lines[i] += f" {a} attempt {b}{rng.randint(0, 999)}"
+    return lines
+
+
+def naive(patterns, lines):
+    compiled = [re.compile(p, re.IGNORECASE) for p in patterns]
+    return [{i for i, p in enumerate(compiled) if p.search(line)} for line in lines]
+
+
+def combined(matcher, lines):
+    return [matcher.match(line) for line in lines]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--rules", type=int, nargs="+", default=[100, 500, 1000])
+    args = parser.parse_args()
+
+    lines = synthetic_lines(args.lines)
+
+    print(f"{'rules':>6} {'per-rule lines/sec':>20} {'combined lines/sec':>20} {'speedup':>8}")
+    for count in args.rules:
+        patterns = synthetic_rules(count)
+
+        start = time.perf_counter()
+        expected = naive(patterns, lines)
+        naive_rate = len(lines) / (time.perf_counter() - start)
+
+        matcher = RuleMatcher(patterns)
+        start = time.perf_counter()
+        got = combined(matcher, lines)
+        combined_rate = len(lines) / (time.perf_counter() - start)
+
+        assert got == expected, "combined matcher disagrees with per-rule regexes"
+        print(f"{count:>6} {naive_rate:>20,.0f} {combined_rate:>20,.0f} "
+              f"{combined_rate / naive_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# benchmarks/bench_state_store.py
+"""Push millions of distinct keys through KeyedWindowStore and report memory
+
+Run from the project root:
+    python -m benchmarks.bench_state_store --keys 2000000 --max-keys 100000
+"""
+import time
+import random
+import argparse
+import resource
+
+from src.state_store import KeyedWindowStore
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=2000000)
+    parser.add_argument("--max-keys", type=int, default=100000)
+    parser.add_argument("--distinct", action="store_true",
+                        help="count distinct destination ports per key")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    store = KeyedWindowStore(120, 10, distinct=args.distinct, max_keys=args.max_keys)
+
+    start = time.perf_counter()
+    ts = 1_700_000_000.0
+    for i in range(args.keys):
+        ts += 0.0005
+        key = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        store.observe(key, ts, rng.randint(1, 65535))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.keys:,} distinct keys in {elapsed:.2f}s ({args.keys / elapsed:,.0f} events/sec)")
+    print(f"tracked keys: {len(store):,}, evicted: {store.evicted:,}, peak rss {peak_rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
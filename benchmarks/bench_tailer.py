@@ -0,0 +1,68 @@
+# benchmarks/bench_tailer.py
+"""Measure FileTailer throughput and peak memory on a large generated file
+
+Run from the project root:
+    python -m benchmarks.bench_tailer --size-mb 512
+"""
+import os
+import time
+import argparse
+import resource
+import tempfile
+
+from src.tailer import CheckpointStore, FileTailer
+
+
+SAMPLE_LINE = b'192.168.1.101 - - [07/Feb/2026:10:15:31 +0000] "POST /login HTTP/1.1" 401 567 "-" "Mozilla/5.0"\n'
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate(path, size_mb):
+    block = SAMPLE_LINE * (1024 * 1024 // len(SAMPLE_LINE))
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--chunk-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "big.log")
+        generate(log_path, args.size_mb)
+        print(f"generated {args.size_mb} MB, rss {peak_rss_mb():.1f} MB")
+
+        checkpoints = CheckpointStore(os.path.join(tmp, "checkpoints.json"))
+        tailer = FileTailer(log_path, checkpoints, chunk_size=args.chunk_kb * 1024)
+
+        start = time.perf_counter()
+        lines = 0
+        for batch in tailer.read_batches():
+            lines += len(batch)
+            tailer.commit()
+        elapsed = time.perf_counter() - start
+        tailer.close()
+        checkpoints.close()
+
+        print(f"first pass: {lines:,} lines in {elapsed:.2f}s "
+              f"({lines / elapsed:,.0f} lines/sec), peak rss {peak_rss_mb():.1f} MB")
+
+        # A restart resumes from the persisted offset instead of byte 0
+        start = time.perf_counter()
+        checkpoints = CheckpointStore(os.path.join(tmp, "checkpoints.json"))
+        tailer = FileTailer(log_path, checkpoints)
+        resumed = sum(len(batch) for batch in tailer.read_batches())
+        tailer.close()
+
+        print(f"restart: {resumed} lines re-read in {time.perf_counter() - start:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
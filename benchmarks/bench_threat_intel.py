@@ -0,0 +1,86 @@
+# benchmarks/bench_threat_intel.py
+"""Measure blocklist load time, memory and lookup rate for ThreatIntel
+
+Run from the project root:
+    python -m benchmarks.bench_threat_intel --entries 1000000 --lookups 500000
+"""
+import os
+import time
+import random
+import socket
+import argparse
+import resource
+import tempfile
+
+from src.threat_intel import ThreatIntel
+
+
+def random_ipv4(rng):
+    return socket.inet_ntoa(rng.getrandbits(32).to_bytes(4, "big"))
+
+
+def write_blocklist(path, entries, cidr_share, seed=1):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(entries):
+            if rng.random() < cidr_share:
+                f.write(f"{random_ipv4(rng)}/{rng.randint(16, 30)} ; feed\n")
+            else:
+                f.write(f"{random_ipv4(rng)}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--cidr-share", type=float, default=0.1,
+                        help="fraction of entries that are CIDR blocks")
+    parser.add_argument("--lookups", type=int, default=500000)
+    parser.add_argument("--distinct", type=int, default=5000,
+                        help="distinct addresses in the cached lookup run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "blocklist.txt")
+        write_blocklist(path, args.entries, args.cidr_share)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        intel = ThreatIntel([("bench", path)], reload_interval=0)
+        started = time.perf_counter()
+        intel.load(force=True)
+        load_time = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    blocklist = intel.blocklists[0]
+    print(f"load:      {args.entries:,} entries ({size_mb:,.1f} MB) in {load_time:.2f}s "
+          f"= {args.entries / load_time:,.0f} entries/s")
+    print(f"memory:    {len(blocklist.v4):,} ranges in {blocklist.v4.nbytes() / 1024 ** 2:,.1f} MB "
+          f"(peak RSS +{(rss_after - rss_before) / 1024:,.0f} MB while loading)")
+
+    rng = random.Random(2)
+    addresses = [rng.getrandbits(32) for _ in range(args.lookups)]
+    started = time.perf_counter()
+    hits = sum(1 for address in addresses if address in blocklist.v4)
+    elapsed = time.perf_counter() - started
+    print(f"ranges:    {args.lookups / elapsed:,.0f} lookups/s "
+          f"({elapsed / args.lookups * 1e6:.2f} us each, {hits:,} hits)")
+
+    values = [random_ipv4(rng) for _ in range(args.lookups)]
+    intel.cache = {}
+    started = time.perf_counter()
+    for value in values:
+        intel.lookup(value)
+    elapsed = time.perf_counter() - started
+    print(f"uncached:  {args.lookups / elapsed:,.0f} lookups/s from strings")
+
+    pool = [random_ipv4(rng) for _ in range(args.distinct)]
+    values = [rng.choice(pool) for _ in range(args.lookups)]
+    started = time.perf_counter()
+    for value in values:
+        intel.lookup(value)
+    elapsed = time.perf_counter() - started
+    print(f"cached:    {args.lookups / elapsed:,.0f} lookups/s over {args.distinct:,} addresses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_timestamps.py
+"""Compare strptime timestamp handling against the cached TimestampNormalizer
+
+Run from the project root:
+    python -m benchmarks.bench_timestamps --count 200000
+"""
+import time
+import argparse
+from datetime import datetime, timezone
+
+from src.index_manager import PARTITION_FORMAT, partition_day
+from src.timestamps import TimestampNormalizer, iso_utc, partition_for_ms
+
+
+SAMPLES = {
+    "apache": ("10/Oct/2026:13:55:36 -0700", "%d/%b/%Y:%H:%M:%S %z"),
+    "windows": ("1/15/2026 10:15:30 PM", "%m/%d/%Y %I:%M:%S %p"),
+    "firewall": ("2026-02-07 10:15:30", None),
+    "json": ("2026-02-07T10:15:30.123+02:00", None)
+}
+
+
+def strptime_path(value, fmt):
+    """What the parser and pipeline did per line before: parse, ISO, route"""
+    if fmt is None:
+        dt = datetime.fromisoformat(value)
+    else:
+        dt = datetime.strptime(value, fmt)
+    iso = dt.isoformat()
+    today = datetime.now(timezone.utc).strftime(PARTITION_FORMAT)
+    return partition_day(iso, today)
+
+
+def normalizer_path(normalizer, value, source, today):
+    ms = normalizer.parse(value, source)
+    iso_utc(ms)
+    return min(partition_for_ms(ms), today)
+
+
+def timed(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000, help="timestamps per format")
+    args = parser.parse_args()
+
+    normalizer = TimestampNormalizer()
+    today = partition_for_ms(int(time.time() * 1000))
+
+    print(f"{'format':<10} {'strptime/s':>14} {'normalizer/s':>14} {'speedup':>8}")
+    for source, (value, fmt) in SAMPLES.items():
+        before = timed(lambda: strptime_path(value, fmt), args.count)
+        after = timed(lambda: normalizer_path(normalizer, value, source, today), args.count)
+        print(f"{source:<10} {before:>14,.0f} {after:>14,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/fake_es.py
+import json
+import time
+import random
+
+
+class FakeAdmin:
+    """indices.* and ingest.* calls made while setting up templates; accepted and ignored"""
+
+    def put_pipeline(self, **kwargs):
+        return {"acknowledged": True}
+
+    def put_index_template(self, **kwargs):
+        return {"acknowledged": True}
+
+    def put_mapping(self, **kwargs):
+        return {"acknowledged": True}
+
+    def put_settings(self, **kwargs):
+        return {"acknowledged": True}
+
+
+class FakeESClient:
+    """In-process stand-in for the Elasticsearch client used by benchmarks
+
+    Every request sleeps for `latency` seconds to model a network round trip.
+    `reject_rate` makes that fraction of bulk items come back with a 429 so
+    retry paths get exercised; setting `down` makes every request fail as if
+    the cluster were unreachable.
+    """
+
+    def __init__(self, latency=0.001, reject_rate=0.0, seed=42, down=False):
+        self.latency = latency
+        self.reject_rate = reject_rate
+        self.down = down
+        self.random = random.Random(seed)
+        self.docs = []
+        self.requests = 0
+        self.indices = self.ingest = FakeAdmin()
+
+    def ping(self):
+        return True
+
+    def index(self, index, document=None, body=None, id=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        self.docs.append((index, document if document is not None else body))
+        return {"result": "created", "_index": index}
+
+    def bulk(self, operations=None, body=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        if self.down:
+            raise ConnectionError("connection refused")
+
+        lines = operations if operations is not None else body
+        lines = [json.loads(line) if isinstance(line, str) else line for line in lines]
+
+        items = []
+        errors = False
+        for action, source in zip(lines[::2], lines[1::2]):
+            op, meta = next(iter(action.items()))
+
+            if self.random.random() < self.reject_rate:
+                errors = True
+                items.append({op: {"_index": meta["_index"], "status": 429}})
+                continue
+
+            self.docs.append((meta["_index"], source))
+            items.append({op: {"_index": meta["_index"], "status": 201}})
+
+        return {"errors": errors, "items": items}
@@ -0,0 +1,199 @@
+# benchmarks/synthetic_logs.py
+import os
+import re
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+
+METHODS = ["GET", "GET", "GET", "POST", "PUT", "DELETE"]
+PATHS = ["/index.html", "/login", "/api/users", "/admin", "/static/app.js", "/search?q=test"]
+STATUSES = [200, 200, 200, 301, 401, 403, 404, 500]
+ACTIONS = ["DENY", "ALLOW", "ACCEPT"]
+PROTOCOLS = ["TCP", "UDP"]
+PORTS = [21, 22, 23, 25, 53, 80, 443, 445, 3306, 3389, 8080]
+LEVELS = ["INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR"]
+SERVICES = ["auth-service", "billing", "inventory", "gateway", "scheduler"]
+MESSAGES = ["Request completed", "Cache refreshed", "Job finished", "Session started", "Config reloaded"]
+
+
+def random_ip(rng, prefix="10"):
+    return f"{prefix}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def apache_line(rng, ts):
+    return (
+        f'{random_ip(rng, "192")} - - [{ts.strftime("%d/%b/%Y:%H:%M:%S")} +0000] '
+        f'"{rng.choice(METHODS)} {rng.choice(PATHS)} HTTP/1.1" {rng.choice(STATUSES)} '
+        f'{rng.randint(100, 50000)} "-" "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"'
+    )
+
+
+def firewall_line(rng, ts):
+    return (
+        f'{ts.strftime("%Y-%m-%d %H:%M:%S")} {rng.choice(ACTIONS)} {rng.choice(PROTOCOLS)} '
+        f'{random_ip(rng)}:{rng.randint(1024, 65535)} -> '
+        f'{random_ip(rng, "192")}:{rng.choice(PORTS)}'
+    )
+
+
+def app_line(rng, ts):
+    return json.dumps({
+        "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "level": rng.choice(LEVELS),
+        "source": rng.choice(SERVICES),
+        "message": f"{rng.choice(MESSAGES)} for {random_ip(rng, '172')}"
+    })
+
+
+def apache_lines(count, seed=1, start=None):
+    rng = random.Random(seed)
+    ts = start or datetime(2026, 2, 7, 10, 0, 0)
+    lines = []
+    for _ in range(count):
+        ts += timedelta(milliseconds=rng.randint(0, 50))
+        lines.append(apache_line(rng, ts))
+    return lines
+
+
+def firewall_lines(count, seed=2, start=None):
+    rng = random.Random(seed)
+    ts = start or datetime(2026, 2, 7, 10, 0, 0)
+    lines = []
+    for _ in range(count):
+        ts += timedelta(milliseconds=rng.randint(0, 50))
+        lines.append(firewall_line(rng, ts))
+    return lines
+
+
+# How each sample format writes its timestamp: (pattern, strptime/strftime format)
+SAMPLE_TIMESTAMPS = (
+    (re.compile(r"(?<=\[)\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}(?= [+-]\d{4}\])"), "%d/%b/%Y:%H:%M:%S"),
+    (re.compile(r'(?<="timestamp": ")\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?=Z")'), "%Y-%m-%dT%H:%M:%S"),
+    (re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}"), "%Y-%m-%d %H:%M:%S"),
+)
+IPV4 = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+
+# Background traffic generated around the sample lines, by sample file content
+BACKGROUND = {"%d/%b/%Y:%H:%M:%S": apache_line, "%Y-%m-%dT%H:%M:%S": app_line,
+              "%Y-%m-%d %H:%M:%S": firewall_line}
+
+
+class SampleScenario:
+    """The lines of one sample log as a template that can be replayed at any time and address
+
+    Timestamps become offsets from the first line and every distinct IP
+    becomes a slot, so each copy keeps the sample's timing and who-talks-to-
+    whom (a burst from one address stays a burst from one address) while
+    landing at a new time with new addresses.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.templates = []
+        self.offsets = []
+        self.time_format = None
+        self.ips = []
+
+        previous = None
+        offset = 0.0
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip():
+                    continue
+                template, when = self._template(line)
+                if when is not None:
+                    # Gaps that go backwards or span hours are squeezed to a second
+                    delta = (when - previous).total_seconds() if previous else 0.0
+                    offset += delta if 0 <= delta <= 3600 else 1.0
+                    previous = when
+                self.templates.append(template)
+                self.offsets.append(offset)
+
+    def _template(self, line):
+        when = None
+        for pattern, time_format in SAMPLE_TIMESTAMPS:
+            match = pattern.search(line)
+            if match:
+                when = datetime.strptime(match.group(0), time_format)
+                self.time_format = self.time_format or time_format
+                line = line[:match.start()] + "\0ts\0" + line[match.end():]
+                break
+
+        def slot(match):
+            if match.group(0) not in self.ips:
+                self.ips.append(match.group(0))
+            return f"\0ip{self.ips.index(match.group(0))}\0"
+        return IPV4.sub(slot, line), when
+
+    def render(self, rng, start):
+        """One copy of the sample starting at `start`; yields (time, line)"""
+        addresses = [random_ip(rng, ip.split(".")[0]) for ip in self.ips]
+        for template, offset in zip(self.templates, self.offsets):
+            ts = start + timedelta(seconds=offset)
+            line = template.replace("\0ts\0", ts.strftime(self.time_format or "%Y-%m-%d %H:%M:%S"))
+            for slot, address in enumerate(addresses):
+                line = line.replace(f"\0ip{slot}\0", address)
+            yield ts, line
+
+    def duration(self):
+        return self.offsets[-1] if self.offsets else 0.0
+
+
+def scale_samples(sample_paths, out_dir, lines, start=None, attack_share=0.01, rate=1000.0, seed=7):
+    """Write a corpus of about `lines` lines shaped like the given sample logs
+
+    Each sample file becomes one output file of the same name: background
+    traffic in its format at `rate` lines per second overall, with copies of
+    the sample itself (its attacks, scans and failures) mixed in so they
+    make up about `attack_share` of the lines. Lines are written in time
+    order and in chunks, so millions of lines need little memory. Returns
+    {output path: lines written}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    scenarios = [SampleScenario(path) for path in sample_paths]
+    scenarios = [scenario for scenario in scenarios if scenario.templates]
+    start = start or datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+    per_file = max(1, lines // max(1, len(scenarios)))
+    written = {}
+
+    for number, scenario in enumerate(scenarios):
+        rng = random.Random(seed + number)
+        background = BACKGROUND.get(scenario.time_format, firewall_line)
+        copies = max(1, int(per_file * attack_share / len(scenario.templates)))
+        step = 1.0 / (rate / len(scenarios))
+        span = per_file * step
+
+        # Scenario copies start at random points across the file's time span
+        pending = sorted(rng.uniform(0, max(0.0, span - scenario.duration())) for _ in range(copies))
+        injected = []
+        path = os.path.join(out_dir, os.path.basename(scenario.path))
+        count = 0
+        ts = start
+        chunk = []
+
+        with open(path, "w", encoding="utf-8") as f:
+            while count < per_file:
+                while pending and pending[0] <= (ts - start).total_seconds():
+                    injected.extend(scenario.render(rng, start + timedelta(seconds=pending.pop(0))))
+                    injected.sort(key=lambda item: item[0])
+
+                # Due scenario lines go first; the rest of the time is background
+                if injected and injected[0][0] <= ts:
+                    chunk.append(injected.pop(0)[1])
+                else:
+                    ts += timedelta(seconds=rng.expovariate(1.0 / step))
+                    chunk.append(background(rng, ts))
+                count += 1
+
+                if len(chunk) >= 10000:
+                    f.write("\n".join(chunk) + "\n")
+                    chunk = []
+
+            chunk.extend(line for _, line in injected)
+            if chunk:
+                f.write("\n".join(chunk) + "\n")
+        written[path] = count + len(injected)
+
+    return written
@@ -1,56 +1,104 @@
 # main.py
+import sys
+import signal
 import threading
 import time
-from src.log_collector import LogCollector
+from src.config_watcher import ConfigWatcher
+from src.log_collector import create_collector
 from src.log_parser import LogParser
 from src.threat_detector import ThreatDetector
-from src.dashboard import app
-from elasticsearch import Elasticsearch
+from src.dashboard import app, attach_live_feed
+from src.metrics import PROFILER
+from src.storage import backend_name, get_client
 
 def main():
     print("🚀 Starting SIEM Tool...")
     
-    # Initialize Elasticsearch client
-    es_client = Elasticsearch("http://localhost:9200")
-    
-    # Test Elasticsearch connection
+    # One storage client for every component: Elasticsearch, or the embedded
+    # local store when configured or when Elasticsearch is unreachable
     try:
-        es_client.ping()
-        print("✅ Connected to Elasticsearch")
+        es_client = get_client()
     except Exception as e:
-        print(f"❌ Failed to connect to Elasticsearch: {e}")
-        print("Please make sure Elasticsearch is running on localhost:9200")
+        print(f"❌ Failed to open storage: {e}")
         return
-    
+
+    if backend_name(es_client) == "local":
+        print(f"✅ Using local store at {es_client.path}")
+    else:
+        print("✅ Connected to Elasticsearch")
+
     # Initialize components
-    log_collector = LogCollector()
     log_parser = LogParser(es_client)
+    log_collector = create_collector(parser=log_parser)
     threat_detector = ThreatDetector(es_client)
+    # Keep merging into incidents that were still open before a restart, and
+    # write changed or quiet ones on a timer
+    threat_detector.alerts.restore()
+    threat_detector.alerts.start()
     
+    def report_alert(alert):
+        print(f"🚨 Alert: {alert['rule_name']} ({alert['severity']}, {alert['count']} events)")
+
+    threat_detector.add_alert_listener(report_alert)
+
+    mode = threat_detector.settings.get("mode", "streaming")
+
+    if mode in ("aggregate", "incremental"):
+        # Let Elasticsearch do the counting, or page through new documents,
+        # on a fixed interval
+        detect = (threat_detector.detect_aggregated if mode == "aggregate"
+                  else threat_detector.detect_threats)
+
+        def threat_detection_loop():
+            while True:
+                try:
+                    detect()
+                except Exception as e:
+                    print(f"❌ Error in threat detection: {e}")
+                time.sleep(threat_detector.settings.get("interval", 30))
+
+        detector_thread = threading.Thread(target=threat_detection_loop)
+        detector_thread.daemon = True
+        detector_thread.start()
+    else:
+        # Parsed events go straight to the streaming rule engine
+        log_collector.add_sink(threat_detector.process_events)
+
+    # Keep dashboard stats current from ingest and detection events
+    attach_live_feed(log_collector, threat_detector)
+
+    # Metrics are always on (/metrics); the sampling profiler is opt-in here
+    # and can also be toggled at runtime through /debug/profiler
+    metrics_config = log_collector.config.get("metrics", {})
+    if metrics_config.get("profiler"):
+        PROFILER.start(metrics_config.get("profiler_interval", 0.01))
+
+    # Edits to the rules and log sources apply without a restart: both files
+    # are polled for changes, and SIGHUP forces a reload
+    reload_config = log_collector.config.get("reload", {})
+    if reload_config.get("enabled", True):
+        watcher = ConfigWatcher(reload_config.get("interval", 2.0))
+        watcher.watch(threat_detector.rules_path, threat_detector.reload_rules)
+        watcher.watch(log_collector.config_path, log_collector.reload_config)
+        watcher.start()
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: watcher.request())
+
     # Start log collection in a separate thread
     collector_thread = threading.Thread(target=log_collector.start_collection)
     collector_thread.daemon = True
     collector_thread.start()
     
-    # Start threat detection in a separate thread
-    def threat_detection_loop():
-        while True:
-            try:
-                alerts = threat_detector.detect_threats()
-                if alerts:
-                    print(f"🚨 Generated {len(alerts)} new alerts")
-                time.sleep(30)  # Check for threats every 30 seconds
-            except Exception as e:
-                print(f"❌ Error in threat detection: {e}")
-                time.sleep(30)
-    
-    detector_thread = threading.Thread(target=threat_detection_loop)
-    detector_thread.daemon = True
-    detector_thread.start()
-    
     # Start the web dashboard
     print("🌐 Starting web dashboard on http://localhost:5000")
-    app.run(debug=False, host="0.0.0.0", port=5000)
+    # threaded: each /api/stream client holds its own connection
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        app.run(debug=False, host="0.0.0.0", port=5000, threaded=True)
+    finally:
+        # Pending incident updates are written before exiting
+        print("🛑 Stopping SIEM Tool...")
+        threat_detector.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,321 @@
+# src/alert_manager.py
+import time
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from src.bulk_indexer import encode_item, failed_items, record_bulk
+from src.metrics import counter
+from src.rule_engine import parse_time_window
+from src.rule_queries import keyword_field
+
+
+ALERT_INDEX = "siem-alerts"
+
+ALERTS = counter("siem_alerts_total", "Incidents opened", ("rule", "severity"))
+ALERTS_MERGED = counter("siem_alerts_merged_total",
+                        "Repeat alerts merged into an open incident", ("rule",))
+ALERTS_SUPPRESSED = counter("siem_alerts_suppressed_total",
+                            "Alerts dropped by a suppression window", ("rule",))
+
+
+def fingerprint(rule_name, key=None):
+    """Stable id for a rule and group key, the same across restarts"""
+    return hashlib.sha1(f"{rule_name}\x00{key if key is not None else ''}".encode("utf-8")).hexdigest()[:20]
+
+
+def parse_when(value):
+    """Epoch seconds of an ISO timestamp (naive means UTC), or None"""
+    if not value:
+        return None
+    when = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+class Suppression:
+    """Mute one rule (or "*"), optionally for one key, between two times"""
+
+    def __init__(self, rule="*", key=None, start=None, end=None, reason=""):
+        self.rule = rule
+        self.key = key
+        self.start = parse_when(start)
+        self.end = parse_when(end)
+        self.reason = reason
+
+    def matches(self, rule_name, key, now):
+        if self.rule not in ("*", rule_name):
+            return False
+        if self.key is not None and str(self.key) != str(key):
+            return False
+        return (self.start is None or now >= self.start) and (self.end is None or now < self.end)
+
+
+def parse_suppressions(entries):
+    """Suppression windows from config; entries that don't parse are skipped with a warning"""
+    suppressions = []
+    for entry in entries or []:
+        try:
+            suppressions.append(Suppression(**entry))
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Skipping suppression {entry!r}: {e}")
+    return suppressions
+
+
+class Incident:
+    """One ongoing alert: every repeat of a rule and key until it goes quiet"""
+
+    __slots__ = ("id", "fingerprint", "alert", "status", "first_seen", "last_seen", "occurrences",
+                 "peak_count", "first_matches", "recent_matches", "dirty")
+
+    def __init__(self, incident_id, fingerprint, alert, now, max_samples):
+        self.id = incident_id
+        self.fingerprint = fingerprint
+        self.alert = alert
+        self.status = "open"
+        self.first_seen = now
+        self.last_seen = now
+        self.occurrences = 0
+        self.peak_count = 0
+        # The opening matches are kept as they were; the rest of the budget
+        # follows the newest ones
+        self.first_matches = list(alert.get("matches", []))[:max(1, max_samples // 2)]
+        self.recent_matches = deque(maxlen=max(1, max_samples - len(self.first_matches)))
+        self.dirty = True
+
+    def merge(self, alert, now):
+        if self.occurrences:
+            self.recent_matches.extend(alert.get("matches", []))
+        self.alert = alert
+        self.last_seen = now
+        self.occurrences += 1
+        self.peak_count = max(self.peak_count, alert.get("count", 0))
+        self.dirty = True
+
+    def document(self):
+        doc = {key: value for key, value in self.alert.items() if key not in ("id", "matches")}
+        doc.update(
+            fingerprint=self.fingerprint,
+            status=self.status,
+            first_seen=datetime.fromtimestamp(self.first_seen, timezone.utc).isoformat(),
+            last_seen=datetime.fromtimestamp(self.last_seen, timezone.utc).isoformat(),
+            occurrences=self.occurrences,
+            peak_count=self.peak_count,
+            matches=self.first_matches + list(self.recent_matches)
+        )
+        # Sorting and time filters on the dashboard follow the latest activity
+        doc["timestamp"] = doc["last_seen"]
+        return doc
+
+    @classmethod
+    def from_document(cls, incident_id, doc, max_samples):
+        incident = cls(incident_id, doc["fingerprint"], doc, parse_when(doc["first_seen"]), max_samples)
+        incident.status = doc.get("status", "open")
+        incident.last_seen = parse_when(doc["last_seen"])
+        incident.occurrences = doc.get("occurrences", 1)
+        incident.peak_count = doc.get("peak_count", doc.get("count", 0))
+        incident.recent_matches.extend(doc.get("matches", [])[len(incident.first_matches):])
+        incident.dirty = False
+        return incident
+
+
+class AlertManager:
+    """Deduplicate, group and suppress alerts before they are stored
+
+    Alerts are fingerprinted by rule and group key. A repeat while the
+    incident is open (seen within `incident_gap`) updates that incident's
+    occurrence count, last_seen and sampled matches instead of adding a
+    document, so the alert index grows with incidents rather than with
+    detection cycles. Changed incidents are written together with one bulk
+    request at most every `flush_interval` seconds, each under its own id
+    so a write replaces the previous version.
+
+    An incident that stays quiet for `incident_gap` is written a last time
+    with status "resolved"; the next alert for it opens a new incident.
+    start() flushes on a timer as well, so that happens even when no new
+    alerts arrive; close() writes whatever is still pending.
+
+    Suppression windows from the config silence a rule (optionally one key)
+    for a period; suppressed alerts are counted but neither stored nor
+    announced.
+    """
+
+    def __init__(self, es_client, rules=(), incident_gap=1800.0, flush_interval=5.0,
+                 max_samples=10, suppressions=(), index=ALERT_INDEX):
+        self.es_client = es_client
+        self.index = index
+        self.incident_gap = incident_gap
+        self.flush_interval = flush_interval
+        self.max_samples = max_samples
+        self.suppressions = list(suppressions)
+        self.rule_gaps = {
+            rule["name"]: parse_time_window(rule["incident_gap"])
+            for rule in rules if rule.get("incident_gap")
+        }
+
+        self.incidents = {}
+        self.resolved = []
+        self.last_flush = 0.0
+        self._lock = threading.Lock()
+        # Held from snapshot to bulk response, so a slower flush of an older
+        # snapshot can't land after (and overwrite) a newer one
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, es_client, config, rules=()):
+        """Build from the "alerts" section of threat_rules.json"""
+        config = config or {}
+        return cls(
+            es_client,
+            rules=rules,
+            incident_gap=parse_time_window(config.get("incident_gap", "30m")),
+            flush_interval=config.get("flush_interval", 5.0),
+            max_samples=config.get("max_samples", 10),
+            suppressions=parse_suppressions(config.get("suppressions"))
+        )
+
+    def reconfigure(self, config, rules=()):
+        """Apply a reloaded "alerts" section; open incidents carry on"""
+        updated = self.from_config(self.es_client, config, rules)
+        with self._lock:
+            self.incident_gap = updated.incident_gap
+            self.flush_interval = updated.flush_interval
+            self.max_samples = updated.max_samples
+            self.suppressions = updated.suppressions
+            self.rule_gaps = updated.rule_gaps
+
+    def gap(self, rule_name):
+        return self.rule_gaps.get(rule_name, self.incident_gap)
+
+    def suppressed(self, rule_name, key, now):
+        return any(s.matches(rule_name, key, now) for s in self.suppressions)
+
+    def restore(self):
+        """Reload incidents still open in storage, so a restart keeps merging into them"""
+        longest = max([self.incident_gap] + list(self.rule_gaps.values()))
+        query = {
+            "size": 10000,
+            "query": {"bool": {"filter": [
+                {"term": {keyword_field("status"): "open"}},
+                {"range": {"timestamp": {"gte": f"now-{int(longest)}s"}}}
+            ]}}
+        }
+        try:
+            response = self.es_client.search(index=self.index, body=query)
+        except Exception as e:
+            print(f"⚠️ Could not restore open alerts: {e}")
+            return 0
+
+        now = time.time()
+        with self._lock:
+            for hit in response["hits"]["hits"]:
+                doc = hit["_source"]
+                if "fingerprint" not in doc or "last_seen" not in doc:
+                    continue
+                incident = Incident.from_document(hit["_id"], doc, self.max_samples)
+                if now - incident.last_seen < self.gap(doc["rule_name"]):
+                    self.incidents[incident.fingerprint] = incident
+        return len(self.incidents)
+
+    def process(self, alerts):
+        """Fold alerts into incidents; returns the alerts that opened a new incident"""
+        now = time.time()
+        opened = []
+
+        with self._lock:
+            for alert in alerts:
+                rule_name = alert["rule_name"]
+                key = alert.get("key")
+                if self.suppressed(rule_name, key, now):
+                    ALERTS_SUPPRESSED.inc(1, rule_name)
+                    continue
+
+                fp = fingerprint(rule_name, key)
+                incident = self.incidents.get(fp)
+                if incident is not None and now - incident.last_seen < self.gap(rule_name):
+                    incident.merge(alert, now)
+                    ALERTS_MERGED.inc(1, rule_name)
+                    continue
+
+                # New incident (or the old one went quiet): a fresh document
+                if incident is not None:
+                    self.resolve(incident)
+                incident = Incident(f"{fp}-{int(now * 1000)}", fp, alert, now, self.max_samples)
+                incident.merge(alert, now)
+                self.incidents[fp] = incident
+                ALERTS.inc(1, rule_name, alert.get("severity", "medium"))
+
+                # Lets the dashboard fetch match details by id later
+                alert["id"] = incident.id
+                opened.append(alert)
+
+        if opened or now - self.last_flush >= self.flush_interval:
+            self.flush(now)
+        return opened
+
+    def flush(self, now=None):
+        """Write every changed incident in one bulk request; returns how many were written"""
+        with self._flush_lock:
+            now = time.time() if now is None else now
+            with self._lock:
+                for fp, incident in list(self.incidents.items()):
+                    if now - incident.last_seen >= self.gap(incident.alert["rule_name"]):
+                        del self.incidents[fp]
+                        self.resolve(incident)
+
+                dirty = [incident for incident in self.incidents.values() if incident.dirty] + self.resolved
+                self.resolved = []
+                items = [encode_item(self.index, incident.document(), incident.id) for incident in dirty]
+                for incident in dirty:
+                    incident.dirty = False
+            self.last_flush = now
+            if not items:
+                return 0
+
+            started = time.perf_counter()
+            operations = [line for item in items for line in item]
+            try:
+                response = self.es_client.bulk(operations=operations)
+            except Exception as e:
+                print(f"❌ Failed to write alerts: {e}")
+                self._mark_dirty(dirty)
+                return 0
+
+            retry, rejected = failed_items(items, response)
+            record_bulk("alerts", started, len(items), len(retry), rejected)
+            if retry:
+                retry_ids = {id(item) for item in retry}
+                self._mark_dirty([incident for incident, item in zip(dirty, items) if id(item) in retry_ids])
+            return len(items) - len(retry) - rejected
+
+    def resolve(self, incident):
+        """Queue a quiet incident's final write (caller holds the lock)"""
+        incident.status = "resolved"
+        incident.dirty = True
+        self.resolved.append(incident)
+
+    def _mark_dirty(self, incidents):
+        with self._lock:
+            for incident in incidents:
+                incident.dirty = True
+                if incident.status == "resolved":
+                    self.resolved.append(incident)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name="alert-flush", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _watch(self):
+        while not self._closed.wait(max(self.flush_interval, 1.0)):
+            self.flush()
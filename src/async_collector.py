@@ -0,0 +1,508 @@
+# src/async_collector.py
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from src.bulk_indexer import encode_item, failed_items, item_size, record_bulk
+from src.index_manager import IndexManager
+from src.log_collector import BASE_DIR, DEFAULT_CHECKPOINT_PATH, restart_sections, source_path
+from src.network_input import start_network_inputs
+from src.parse_pool import create_parser
+from src.pipeline import IngestPipeline
+from src.spool import Spool, SpoolDrainer
+from src.storage import create_async_client, get_client
+from src.tailer import CheckpointStore, FileTailer
+from src.threat_intel import ThreatIntel
+
+
+class AsyncBulkSender:
+    """Coalesce encoded batches into bulk requests, at most `max_in_flight` at once
+
+    Readers hand batches over through a bounded queue. When every sender is
+    waiting on Elasticsearch and the queue is full, put() blocks, so a slow
+    cluster slows down reading instead of growing memory.
+    """
+
+    def __init__(self, es_client, max_docs=500, max_bytes=5 * 1024 * 1024, max_latency=1.0,
+                 max_in_flight=4, queue_batches=64, max_retries=3, backoff=0.5, max_backoff=10.0):
+        self.es_client = es_client
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.max_in_flight = max_in_flight
+        self.queue_batches = queue_batches
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.queue = None
+        self.tasks = []
+
+        self.stats = {
+            "flushed": 0,
+            "retried": 0,
+            "dropped": 0,
+            "batches": 0
+        }
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_batches)
+        self.tasks = [asyncio.create_task(self._send_loop()) for _ in range(self.max_in_flight)]
+
+    async def put(self, items, size):
+        await self.queue.put((items, size))
+
+    async def close(self):
+        """Send everything queued, then stop the senders"""
+        for _ in self.tasks:
+            await self.queue.put(None)
+        await asyncio.gather(*self.tasks)
+
+    async def _send_loop(self):
+        loop = asyncio.get_running_loop()
+        items = []
+        size = 0
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                batch = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                batch = ()
+
+            if batch is None:
+                if items:
+                    await self._send(items)
+                return
+
+            if batch:
+                if not items:
+                    deadline = loop.time() + self.max_latency
+                items.extend(batch[0])
+                size += batch[1]
+
+            while len(items) >= self.max_docs:
+                await self._send(items[:self.max_docs])
+                items = items[self.max_docs:]
+                size = sum(item_size(item) for item in items)
+
+            # Time's up or the byte limit is hit: send what we have
+            if items and (not batch or size >= self.max_bytes):
+                await self._send(items)
+                items = []
+
+            if not items:
+                size = 0
+                deadline = None
+
+    async def _send(self, items):
+        pending = items
+        attempt = 0
+
+        while pending:
+            operations = []
+            for action, source in pending:
+                operations.append(action)
+                operations.append(source)
+
+            started = time.perf_counter()
+            try:
+                response = await self.es_client.bulk(operations=operations)
+                failed, rejected = failed_items(pending, response)
+            except Exception as e:
+                print(f"❌ Bulk request failed: {e}")
+                failed, rejected = pending, 0
+            record_bulk("async", started, len(pending), len(failed), rejected)
+
+            self.stats["batches"] += 1
+            self.stats["flushed"] += len(pending) - len(failed) - rejected
+            self.stats["dropped"] += rejected
+
+            if not failed:
+                return
+
+            if attempt >= self.max_retries:
+                print(f"❌ Dropping {len(failed)} documents after {attempt} retries")
+                self.stats["dropped"] += len(failed)
+                return
+
+            await asyncio.sleep(min(self.backoff * (2 ** attempt), self.max_backoff))
+
+            attempt += 1
+            self.stats["retried"] += len(failed)
+            pending = failed
+
+
+class ThreadedSender:
+    """Indexer interface (add_batch) over an AsyncBulkSender for threads outside the loop
+
+    Network listeners run on their own threads; their batches are encoded
+    there and handed to the sender on the event loop. add_batch() waits
+    for the hand-over, so a full sender queue slows the listener down the
+    same way it slows down the file readers.
+    """
+
+    def __init__(self, sender, loop):
+        self.sender = sender
+        self.loop = loop
+
+    def add_batch(self, batch):
+        if not batch:
+            return
+        items = [encode_item(index_name, doc) for index_name, doc in batch]
+        size = sum(item_size(item) for item in items)
+        asyncio.run_coroutine_threadsafe(self.sender.put(items, size), self.loop).result()
+
+
+class AsyncLogCollector:
+    """Tail many log files from one event loop instead of watchdog threads
+
+    Every `poll_interval` the watched paths are stat'ed; changed files are
+    queued for a pool of reader tasks. Their blocking work (reads, parsing,
+    sinks, encoding) runs on `read_threads` worker threads, while bulk
+    requests go out through AsyncBulkSender on a pooled async client.
+    Checkpoints advance once a batch is handed to the sender, as with the
+    threaded collector. Idle files are closed so thousands of watched files
+    don't hold thousands of descriptors.
+    """
+
+    def __init__(self, config_path="config/log_sources.json", parser=None):
+
+        self.config_path = os.path.join(BASE_DIR, config_path)
+        self.config = self.load_config(config_path)
+        settings = self.config.get("async", {})
+
+        self.poll_interval = settings.get("poll_interval", 1.0)
+        self.readers = settings.get("readers", 64)
+        self.read_threads = settings.get("read_threads", 4)
+        self.max_in_flight = settings.get("max_in_flight", 4)
+        self.queue_batches = settings.get("queue_batches", 64)
+        self.idle_close = settings.get("idle_close", 60)
+        self.max_open_files = settings.get("max_open_files", 512)
+
+        # Index templates and maintenance stay on a blocking client, off the loop
+        self.es_client = get_client(self.config.get("storage"))
+
+        self.parser = create_parser(self.config.get("parsing"), parser)
+        self.indices = IndexManager.from_config(self.es_client, self.config.get("indices"))
+        self.pipeline = IngestPipeline(None, self.parser, indices=self.indices)
+
+        self.threat_intel = ThreatIntel.from_config(self.config.get("threat_intel"), BASE_DIR)
+        if self.threat_intel is not None:
+            self.pipeline.add_enricher(self.threat_intel.enrich)
+
+        self.checkpoints = CheckpointStore(
+            os.path.join(BASE_DIR, self.config.get("checkpoint_path", DEFAULT_CHECKPOINT_PATH))
+        )
+
+        # With a spool, readers append to disk and a drainer thread does the
+        # sending instead of AsyncBulkSender
+        spool_config = self.config.get("spool", {})
+        self.spool = Spool.from_config(spool_config, BASE_DIR) if spool_config.get("enabled") else None
+        self.drainer = None
+
+        self.sender = None
+        self.executor = None
+        self.work = None
+
+        # (log path, source entry) per configured source, and
+        # path -> source entry as found by the last scan
+        self.sources = []
+        self.files = {}
+        self.seen = {}
+        # path -> source entry of open files whose source was removed
+        self.retired = {}
+        self.tailers = {}
+        self.last_read = {}
+        self.busy = set()
+        self.dirty = set()
+        self.stopping = False
+
+    def add_sink(self, sink):
+        self.pipeline.add_sink(sink)
+
+    def load_config(self, config_path):
+
+        full_path = os.path.join(BASE_DIR, config_path)
+
+        with open(full_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def setup_indices(self):
+        prefixes = {source.get("index_prefix", "siem-logs") for source in self.config["log_sources"]}
+
+        try:
+            self.indices.install_templates(prefixes)
+            self.indices.discover()
+            print("✅ Index templates installed")
+        except Exception as e:
+            print(f"❌ Failed to set up index templates: {e}")
+
+    def source_paths(self, log_sources=None, quiet=()):
+        sources = []
+        for source in self.config["log_sources"] if log_sources is None else log_sources:
+            log_path = source_path(source)
+
+            if not os.path.exists(log_path):
+                print(f"❌ Path not found: {log_path}")
+                continue
+
+            if log_path not in quiet:
+                print(f"✅ Watching: {log_path}")
+            sources.append((log_path, source))
+        return sources
+
+    def reload_config(self, config):
+        """Apply a changed log_sources.json without a restart
+
+        The next scan walks the new source list: new files are read from
+        their checkpoints and open files of removed sources get one last
+        read, then are closed and forgotten. Other sections are only read
+        at startup.
+        """
+        previous = {log_path for log_path, source in self.sources}
+        sources = self.source_paths(config.get("log_sources", []), quiet=previous)
+
+        prefixes = {source.get("index_prefix", "siem-logs") for log_path, source in sources
+                    if log_path not in previous}
+        if prefixes:
+            try:
+                self.indices.install_templates(prefixes)
+            except Exception as e:
+                print(f"❌ Failed to set up index templates: {e}")
+
+        for log_path in previous - {log_path for log_path, source in sources}:
+            print(f"🗑️ Stopped watching: {log_path}")
+
+        pending = restart_sections(self.config, config)
+        self.config = dict(self.config, log_sources=config.get("log_sources", []))
+        # Swapped whole; the scan loop picks it up on its next pass
+        self.sources = sources
+        if pending:
+            print(f"⚠️ Changes to {', '.join(pending)} take effect after a restart")
+
+    def scan(self, sources, open_paths):
+        """Stat every watched file; returns the paths that changed or vanished"""
+        files = {}
+        for log_path, source in sources:
+            if os.path.isfile(log_path):
+                files[log_path] = source
+                continue
+
+            for root, dirs, names in os.walk(log_path):
+                for name in names:
+                    files[os.path.join(root, name)] = source
+                if not source.get("recursive", False):
+                    break
+
+        changed = []
+        seen = {}
+        for path in files:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            seen[path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if self.seen.get(path) != seen[path]:
+                changed.append(path)
+
+        # Removed files, and open files no source covers any more, get one
+        # last read so their tailer drains and closes
+        gone = [path for path in open_paths if path not in seen]
+        changed.extend(gone)
+        self.retired.update((path, self.files[path]) for path in gone
+                            if path in self.files and path not in files)
+
+        self.files = files
+        self.seen = seen
+        return changed
+
+    def schedule(self, path):
+        if path in self.busy:
+            # Read again once the current pass over it finishes
+            self.dirty.add(path)
+            return
+        self.busy.add(path)
+        self.work.put_nowait(path)
+
+    def get_tailer(self, path):
+        tailer = self.tailers.get(path)
+
+        if tailer is None:
+            source = self.files.get(path, {})
+            tailer = FileTailer(
+                path,
+                self.checkpoints,
+                chunk_size=self.config.get("read_chunk_size", 64 * 1024),
+                start_at_end=source.get("start_position", "beginning") == "end"
+            )
+            self.tailers[path] = tailer
+
+        return tailer
+
+    def next_batch(self, path, prefix, tailer, batches):
+        """Commit the batch handed over last time and encode the next one"""
+        tailer.commit()
+
+        for lines in batches:
+            items = [
+                encode_item(index_name, doc)
+                for index_name, doc in self.pipeline.build_batch(path, lines, prefix)
+            ]
+            if items and self.spool is not None:
+                self.spool.append(items)
+            elif items:
+                return items, sum(item_size(item) for item in items)
+            tailer.commit()
+
+        return None
+
+    async def drain(self, path):
+        loop = asyncio.get_running_loop()
+        source = self.files.get(path)
+        if source is None and path not in self.tailers:
+            # Already had its last read (e.g. queued again while draining)
+            return
+        last = source is None
+        source = source or self.retired.get(path, {})
+
+        tailer = self.get_tailer(path)
+        prefix = source.get("index_prefix", "siem-logs")
+        batches = tailer.read_batches()
+
+        while True:
+            batch = await loop.run_in_executor(
+                self.executor, self.next_batch, path, prefix, tailer, batches
+            )
+            if batch is None:
+                break
+            await self.sender.put(*batch)
+
+        self.last_read[path] = time.monotonic()
+        if tailer.file is None or last:
+            tailer.close()
+            self.tailers.pop(path, None)
+            self.last_read.pop(path, None)
+            self.retired.pop(path, None)
+
+    async def read_loop(self):
+        while True:
+            path = await self.work.get()
+            try:
+                await self.drain(path)
+            except Exception as e:
+                print(f"❌ Error reading {path}: {e}")
+            finally:
+                self.busy.discard(path)
+                if path in self.dirty:
+                    self.dirty.discard(path)
+                    self.schedule(path)
+
+    def close_idle(self):
+        now = time.monotonic()
+        idle = sorted(
+            (self.last_read.get(path, 0), path)
+            for path in self.tailers if path not in self.busy
+        )
+        excess = len(self.tailers) - self.max_open_files
+
+        for last, path in idle:
+            if excess <= 0 and now - last < self.idle_close:
+                break
+            # The committed offset excludes any partial line, so reopening
+            # later picks up exactly where we stopped
+            self.tailers.pop(path).close()
+            self.last_read.pop(path, None)
+            excess -= 1
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.read_threads,
+                                           thread_name_prefix="collector")
+        await loop.run_in_executor(self.executor, self.setup_indices)
+        if self.threat_intel is not None:
+            await loop.run_in_executor(self.executor, self.threat_intel.start)
+        self.sources = self.source_paths()
+
+        bulk = self.config.get("bulk", {})
+        if self.spool is not None:
+            self.drainer = SpoolDrainer.from_config(self.es_client, self.spool, bulk)
+
+        async_client = create_async_client(
+            self.es_client,
+            self.config.get("storage"),
+            connections=self.max_in_flight
+        )
+        self.sender = AsyncBulkSender(
+            async_client,
+            max_docs=bulk.get("max_docs", 500),
+            max_bytes=bulk.get("max_bytes", 5 * 1024 * 1024),
+            max_latency=bulk.get("max_latency", 1.0),
+            max_in_flight=self.max_in_flight,
+            queue_batches=self.queue_batches,
+            max_retries=bulk.get("max_retries", 3),
+            backoff=bulk.get("backoff", 0.5),
+            max_backoff=bulk.get("max_backoff", 10.0)
+        )
+        self.sender.start()
+
+        self.work = asyncio.Queue()
+        readers = [asyncio.create_task(self.read_loop()) for _ in range(self.readers)]
+
+        # Network listeners run on their own threads and share the pipeline;
+        # file readers only use it to build batches, so its indexer is theirs
+        self.pipeline.indexer = self.spool if self.spool is not None else ThreadedSender(self.sender, loop)
+        listeners = start_network_inputs(self.pipeline, self.config.get("network_inputs"))
+        print("🚀 Log collection started (async)...")
+
+        try:
+            while not self.stopping:
+                changed = await loop.run_in_executor(
+                    self.executor, self.scan, self.sources, list(self.tailers)
+                )
+                for path in changed:
+                    self.schedule(path)
+
+                self.close_idle()
+                await loop.run_in_executor(self.executor, self.indices.maintain)
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            # Batches not yet handed over were never committed and are
+            # re-read on the next start
+            # Off the loop: a listener's last flush waits on the sender
+            for listener in listeners:
+                await loop.run_in_executor(self.executor, listener.close)
+            if self.threat_intel is not None:
+                self.threat_intel.close()
+
+            for reader in readers:
+                reader.cancel()
+            await asyncio.gather(*readers, return_exceptions=True)
+
+            await self.sender.close()
+            await async_client.close()
+            self.executor.shutdown(wait=True)
+
+            if self.drainer is not None:
+                self.drainer.close()
+            if self.spool is not None:
+                self.spool.close()
+
+            for tailer in self.tailers.values():
+                tailer.close()
+            self.checkpoints.close()
+
+            if hasattr(self.parser, "close"):
+                self.parser.close()
+
+    def stop(self):
+        self.stopping = True
+
+    def start_collection(self):
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping collector...")
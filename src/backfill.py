@@ -0,0 +1,344 @@
+# src/backfill.py
+import os
+import bz2
+import gzip
+import json
+import lzma
+import mmap
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from src.bulk_indexer import BulkIndexer
+from src.index_manager import IndexManager
+from src.log_parser import LogParser
+from src.pipeline import IngestPipeline
+from src.storage import create_client, load_config
+from src.threat_intel import ThreatIntel
+
+
+# Project base directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_STATE_PATH = os.path.join(BASE_DIR, "data", "backfill_state.json")
+
+# Each takes the raw file object, so its position shows compressed progress
+OPENERS = {
+    ".gz": lambda raw: gzip.GzipFile(fileobj=raw, mode="rb"),
+    ".bz2": bz2.BZ2File,
+    ".xz": lzma.LZMAFile,
+    ".lzma": lzma.LZMAFile
+}
+
+
+def default_client():
+    # Each worker process needs a client of its own
+    return create_client(dict(load_config(), request_timeout=60))
+
+
+def line_batches(path, offset=0, batch_bytes=4 * 1024 * 1024):
+    """Yield (lines, offset after them, compressed bytes read) from `offset` on
+
+    Offsets count decompressed bytes, so a compressed file resumes by
+    decompressing forward to them. Plain files are read through mmap.
+    """
+    opener = OPENERS.get(os.path.splitext(path)[1].lower())
+
+    if opener is None:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= offset:
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                while offset < size:
+                    end = min(offset + batch_bytes, size)
+                    if end < size:
+                        newline = mm.find(b"\n", end)
+                        end = size if newline == -1 else newline + 1
+                    lines = mm[offset:end].decode("utf-8", errors="ignore").splitlines()
+                    offset = end
+                    yield lines, offset, offset
+        return
+
+    with open(path, "rb") as raw, opener(raw) as stream:
+        if offset:
+            stream.seek(offset)
+
+        partial = b""
+        while True:
+            chunk = stream.read(batch_bytes)
+            if not chunk:
+                break
+
+            data = partial + chunk
+            cut = data.rfind(b"\n") + 1
+            partial = data[cut:]
+            offset += cut
+            if cut:
+                yield data[:cut].decode("utf-8", errors="ignore").splitlines(), offset, raw.tell()
+
+        if partial:
+            offset += len(partial)
+            yield [partial.decode("utf-8", errors="ignore")], offset, raw.tell()
+
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(progress, client_factory, bulk_config, index_prefix, batch_bytes,
+                 threat_intel_config=None):
+    indexer = BulkIndexer.from_config(client_factory(), bulk_config)
+    pipeline = IngestPipeline(indexer, LogParser(), index_prefix)
+
+    # Archives get the same IP reputation tags as live data; lists are
+    # loaded once per worker and not watched for changes
+    threat_intel = ThreatIntel.from_config(threat_intel_config, BASE_DIR)
+    if threat_intel is not None:
+        threat_intel.load(force=True)
+        pipeline.add_enricher(threat_intel.enrich)
+
+    _worker.update(
+        progress=progress,
+        indexer=indexer,
+        pipeline=pipeline,
+        batch_bytes=batch_bytes
+    )
+
+
+def _checkpoint(indexer, dropped):
+    # The resume point only moves once everything before it is indexed
+    indexer.flush()
+    if indexer.stats["dropped"] > dropped:
+        raise RuntimeError(f"{indexer.stats['dropped'] - dropped} documents were not indexed")
+
+
+def _backfill_file(path, offset, lines_done):
+    """Index one file from `offset`, reporting each checkpoint to the parent"""
+    indexer = _worker["indexer"]
+    pipeline = _worker["pipeline"]
+    progress = _worker["progress"]
+    dropped = indexer.stats["dropped"]
+    position = 0
+
+    for lines, offset, position in line_batches(path, offset, _worker["batch_bytes"]):
+        pipeline.process_lines(path, lines)
+        lines_done += len(lines)
+
+        _checkpoint(indexer, dropped)
+        progress.put((path, offset, lines_done, position, False))
+
+    _checkpoint(indexer, dropped)
+    progress.put((path, offset, lines_done, position, True))
+    return lines_done
+
+
+class Backfill:
+    """Bulk-load historical log files, compressed or not, across worker processes
+
+    Each file is read start to finish by one worker (largest files first),
+    so a directory of archives keeps every core busy. Per-file progress
+    (decompressed offset and line count) is persisted after each indexed
+    batch; an interrupted backfill resumes where each file stopped, and
+    files that changed since are started over. Backfilled events go
+    straight to the indexer: streaming detection is meant for live data.
+    """
+
+    def __init__(self, state_path=DEFAULT_STATE_PATH, workers=None, index_prefix="siem-logs",
+                 bulk_config=None, client_factory=default_client, batch_bytes=4 * 1024 * 1024,
+                 report_interval=5.0, threat_intel_config=None, indices_config=None):
+        self.state_path = state_path
+        self.workers = workers or os.cpu_count() or 1
+        self.index_prefix = index_prefix
+        self.bulk_config = bulk_config
+        self.client_factory = client_factory
+        self.batch_bytes = batch_bytes
+        self.report_interval = report_interval
+        self.threat_intel_config = threat_intel_config
+        self.indices_config = indices_config
+        self.state = self.load_state()
+        self._state_saved = 0.0
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Build a backfill from log_sources.json ("backfill", "bulk" and "indices" sections)"""
+        backfill = config.get("backfill", {})
+        state_path = backfill.get("state_path", os.path.join("data", "backfill_state.json"))
+        options = dict(
+            state_path=os.path.join(BASE_DIR, state_path),
+            workers=backfill.get("workers") or None,
+            bulk_config=config.get("bulk"),
+            batch_bytes=backfill.get("batch_mb", 4) * 1024 * 1024,
+            report_interval=backfill.get("report_interval", 5.0),
+            threat_intel_config=config.get("threat_intel"),
+            indices_config=config.get("indices")
+        )
+        options.update(kwargs)
+        return cls(**options)
+
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+        self._state_saved = time.monotonic()
+
+    def find_files(self, paths):
+        files = []
+        for path in paths:
+            if os.path.isfile(path):
+                files.append(os.path.abspath(path))
+                continue
+            for root, dirs, names in os.walk(path):
+                files.extend(os.path.join(os.path.abspath(root), name) for name in sorted(names))
+        return files
+
+    def pending_files(self, files):
+        """[(path, size, offset, lines)] still to do, largest first"""
+        pending = []
+        for path in files:
+            stat = os.stat(path)
+            entry = self.state.get(path)
+            if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime:
+                entry = self.state[path] = {
+                    "size": stat.st_size, "mtime": stat.st_mtime,
+                    "offset": 0, "lines": 0, "done": False
+                }
+            if not entry["done"]:
+                pending.append((path, stat.st_size, entry["offset"], entry["lines"]))
+
+        pending.sort(key=lambda item: item[1], reverse=True)
+        return pending
+
+    def report(self, started, total_bytes, positions, files_done, files_total, lines):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        done_bytes = sum(positions.values())
+        rate = done_bytes / elapsed
+        eta = (total_bytes - done_bytes) / rate if rate else 0
+
+        print(f"📦 Backfill: {files_done}/{files_total} files, "
+              f"{done_bytes / 1024 ** 3:,.2f}/{total_bytes / 1024 ** 3:,.2f} GB read, "
+              f"{lines / elapsed:,.0f} lines/s, {rate / 1024 ** 2:,.1f} MB/s, "
+              f"ETA {eta / 60:,.1f} min")
+
+    def setup_indices(self):
+        """Install the index templates before any worker creates a partition"""
+        client = self.client_factory()
+        try:
+            IndexManager.from_config(client, self.indices_config).install_templates({self.index_prefix})
+        finally:
+            if hasattr(client, "close"):
+                client.close()
+
+    def run(self, paths):
+        files = self.pending_files(self.find_files(paths))
+        if not files:
+            print("✅ Backfill: nothing to do")
+            return {"files": 0, "lines": 0, "failed": 0}
+
+        # Partitions created without them get dynamic mappings (IPs as text,
+        # no indexed_at pipeline) that live ingestion would then write into
+        try:
+            self.setup_indices()
+        except Exception as e:
+            print(f"❌ Failed to set up index templates, not backfilling: {e}")
+            return {"files": 0, "lines": 0, "failed": len(files)}
+
+        total_bytes = sum(size for _, size, _, _ in files)
+        print(f"🚀 Backfilling {len(files)} files ({total_bytes / 1024 ** 3:,.2f} GB) "
+              f"with {self.workers} workers")
+
+        progress = multiprocessing.Queue()
+        started = time.monotonic()
+        last_report = started
+        positions = {}
+        lines_at_start = {path: lines for path, _, _, lines in files}
+        lines_now = dict(lines_at_start)
+        files_done = failed = 0
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(progress, self.client_factory, self.bulk_config,
+                      self.index_prefix, self.batch_bytes, self.threat_intel_config)
+        ) as executor:
+            futures = {
+                executor.submit(_backfill_file, path, offset, lines): path
+                for path, _, offset, lines in files
+            }
+            remaining = set(futures)
+
+            while remaining:
+                while not progress.empty():
+                    path, offset, lines, position, done = progress.get()
+                    entry = self.state[path]
+                    entry.update(offset=offset, lines=lines, done=done)
+                    positions[path] = position
+                    lines_now[path] = lines
+
+                for future in [future for future in remaining if future.done()]:
+                    remaining.discard(future)
+                    path = futures[future]
+                    try:
+                        future.result()
+                        files_done += 1
+                        positions[path] = self.state[path]["size"]
+                    except Exception as e:
+                        failed += 1
+                        print(f"❌ Backfill of {path} stopped, will resume later: {e}")
+
+                now = time.monotonic()
+                if now - self._state_saved >= 1.0:
+                    self.save_state()
+                if now - last_report >= self.report_interval:
+                    last_report = now
+                    lines = sum(lines_now.values()) - sum(lines_at_start.values())
+                    self.report(started, total_bytes, positions, files_done, len(files), lines)
+
+                time.sleep(0.1)
+
+        # Drain checkpoints reported after the last poll
+        while not progress.empty():
+            path, offset, lines, position, done = progress.get()
+            self.state[path].update(offset=offset, lines=lines, done=done)
+            lines_now[path] = lines
+        self.save_state()
+
+        lines = sum(lines_now.values()) - sum(lines_at_start.values())
+        self.report(started, total_bytes, positions, files_done, len(files), lines)
+        return {"files": files_done, "lines": lines, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical log files into Elasticsearch")
+    parser.add_argument("paths", nargs="+", help="files or directories (.gz, .bz2, .xz or plain)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--index-prefix", default="siem-logs")
+    parser.add_argument("--state", default=None, help="progress file (default from config)")
+    args = parser.parse_args()
+
+    with open(os.path.join(BASE_DIR, "config", "log_sources.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    options = {"index_prefix": args.index_prefix}
+    if args.workers:
+        options["workers"] = args.workers
+    if args.state:
+        options["state_path"] = args.state
+
+    Backfill.from_config(config, **options).run(args.paths)
+
+if __name__ == "__main__":
+    main()
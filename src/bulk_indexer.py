@@ -0,0 +1,212 @@
+# src/bulk_indexer.py
+import json
+import time
+import threading
+
+from src.metrics import counter, histogram
+
+
+# Item statuses worth retrying: throttled or temporarily unavailable
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+BULK_SECONDS = histogram("siem_bulk_request_seconds", "Bulk request round trip", ("sender",))
+BULK_DOCS = counter("siem_bulk_docs_total", "Documents sent by bulk requests, by outcome",
+                    ("sender", "result"))
+
+
+def record_bulk(sender, started, sent, failed, rejected):
+    """Record one bulk attempt: its latency and what happened to its documents"""
+    BULK_SECONDS.observe(time.perf_counter() - started, sender)
+    BULK_DOCS.inc(sent - failed - rejected, sender, "indexed")
+    if failed:
+        BULK_DOCS.inc(failed, sender, "retryable")
+    if rejected:
+        BULK_DOCS.inc(rejected, sender, "rejected")
+
+
+def encode_item(index_name, doc, doc_id=None):
+    """Serialize one document as its (action, source) NDJSON pair"""
+    action = {"index": {"_index": index_name}}
+    if doc_id is not None:
+        action["index"]["_id"] = doc_id
+
+    return (json.dumps(action), json.dumps(doc, default=str))
+
+
+def item_size(item):
+    return len(item[0]) + len(item[1]) + 2
+
+
+def failed_items(pending, response):
+    """Split a bulk response into items to retry and a count of rejected ones"""
+    if not response.get("errors"):
+        return [], 0
+
+    retry = []
+    rejected = 0
+    for item, result in zip(pending, response["items"]):
+        status = next(iter(result.values())).get("status", 200)
+
+        if status < 300:
+            continue
+
+        if status in RETRYABLE_STATUSES:
+            retry.append(item)
+        else:
+            rejected += 1
+
+    return retry, rejected
+
+
+class BulkIndexer:
+    """Buffer documents and flush them through the Elasticsearch bulk API"""
+
+    RETRYABLE_STATUSES = RETRYABLE_STATUSES
+
+    def __init__(self, es_client, max_docs=500, max_bytes=5 * 1024 * 1024,
+                 max_latency=1.0, max_retries=3, backoff=0.5, max_backoff=10.0):
+        self.es_client = es_client
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # Each buffered item is a pre-serialized (action, source) NDJSON pair,
+        # so documents are encoded once and byte accounting is exact.
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._oldest = None
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+
+        self.stats = {
+            "flushed": 0,
+            "retried": 0,
+            "dropped": 0,
+            "batches": 0
+        }
+
+        self._timer = threading.Thread(target=self._flush_loop, daemon=True)
+        self._timer.start()
+
+    @classmethod
+    def from_config(cls, es_client, config):
+        """Build an indexer from the "bulk" section of log_sources.json"""
+        config = config or {}
+        return cls(
+            es_client,
+            max_docs=config.get("max_docs", 500),
+            max_bytes=config.get("max_bytes", 5 * 1024 * 1024),
+            max_latency=config.get("max_latency", 1.0),
+            max_retries=config.get("max_retries", 3),
+            backoff=config.get("backoff", 0.5),
+            max_backoff=config.get("max_backoff", 10.0)
+        )
+
+    def add(self, index_name, doc, doc_id=None):
+        """Queue a document; flushes inline once the count or size limit is hit"""
+        item = encode_item(index_name, doc, doc_id)
+        size = item_size(item)
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BulkIndexer is closed")
+
+            if not self._buffer:
+                self._oldest = time.monotonic()
+                self._wakeup.notify()
+
+            self._buffer.append(item)
+            self._buffer_bytes += size
+            full = (len(self._buffer) >= self.max_docs
+                    or self._buffer_bytes >= self.max_bytes)
+
+        if full:
+            self.flush()
+
+    def add_batch(self, batch):
+        """Queue [(index name, doc)] pairs, as produced by IngestPipeline"""
+        for index_name, doc in batch:
+            self.add(index_name, doc)
+
+    def flush(self):
+        """Send everything buffered so far"""
+        with self._lock:
+            items = self._buffer
+            self._buffer = []
+            self._buffer_bytes = 0
+            self._oldest = None
+
+        if items:
+            with self._flush_lock:
+                self._send(items)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+
+        self._timer.join()
+        self.flush()
+
+    def _flush_loop(self):
+        # Enforces max_latency for trickling sources that never fill a batch
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+
+                if self._oldest is None:
+                    self._wakeup.wait()
+                    continue
+
+                remaining = self._oldest + self.max_latency - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+
+            self.flush()
+
+    def _send(self, items):
+        pending = items
+        attempt = 0
+
+        while pending:
+            operations = []
+            for action, source in pending:
+                operations.append(action)
+                operations.append(source)
+
+            started = time.perf_counter()
+            try:
+                response = self.es_client.bulk(operations=operations)
+                failed, rejected = failed_items(pending, response)
+            except Exception as e:
+                print(f"❌ Bulk request failed: {e}")
+                failed, rejected = pending, 0
+            record_bulk("sync", started, len(pending), len(failed), rejected)
+
+            self.stats["batches"] += 1
+            self.stats["flushed"] += len(pending) - len(failed) - rejected
+            self.stats["dropped"] += rejected
+
+            if not failed:
+                return
+
+            if attempt >= self.max_retries:
+                print(f"❌ Dropping {len(failed)} documents after {attempt} retries")
+                self.stats["dropped"] += len(failed)
+                return
+
+            delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+            time.sleep(delay)
+
+            attempt += 1
+            self.stats["retried"] += len(failed)
+            pending = failed
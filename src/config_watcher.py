@@ -0,0 +1,92 @@
+# src/config_watcher.py
+import os
+import json
+import threading
+
+
+class ConfigWatcher:
+    """Reload JSON config files when they change, or when asked to (SIGHUP)
+
+    Each watched file is checked every `interval` seconds by mtime and
+    size. A changed file is parsed first and only handed to its callback
+    when it is valid JSON, so a half-saved or broken edit leaves the running
+    configuration alone; the callback decides what to swap in.
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.watches = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._force = False
+        self._closed = False
+        self._thread = None
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def watch(self, path, callback):
+        """Call callback(config) whenever the JSON file at path changes"""
+        with self._lock:
+            self.watches[path] = [callback, self._stamp(path)]
+
+    def check(self, force=False):
+        """Reload the files that changed (all of them with force); returns their paths"""
+        reloaded = []
+        with self._lock:
+            watches = list(self.watches.items())
+
+        for path, watch in watches:
+            callback, stamp = watch
+            current = self._stamp(path)
+            if current is None or (current == stamp and not force):
+                continue
+            watch[1] = current
+
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"❌ Not reloading {os.path.basename(path)}: {e}")
+                continue
+
+            try:
+                callback(config)
+            except Exception as e:
+                print(f"❌ Failed to apply {os.path.basename(path)}: {e}")
+                continue
+            print(f"🔄 Reloaded {os.path.basename(path)}")
+            reloaded.append(path)
+
+        return reloaded
+
+    def request(self):
+        """Reload everything on the watcher thread soon (safe from a signal handler)"""
+        self._force = True
+        self._wake.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            # An interval of 0 turns polling off; only request() reloads
+            self._wake.wait(self.interval or None)
+            self._wake.clear()
+            if self._closed:
+                return
+            force, self._force = self._force, False
+            self.check(force)
@@ -1,11 +1,17 @@
 # src/dashboard.py
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context, g
 import json
-from datetime import datetime, timedelta
-from elasticsearch import Elasticsearch
+import time
+import base64
 
 import os
 
+from src.event_bus import EventBus
+from src.metrics import PROFILER, REGISTRY, gauge, histogram
+from src.rule_queries import LOG_INDEX_PATTERN, keyword_field, log_indices
+from src.stats_cache import MinuteRollups, TTLCache
+from src.storage import SharedClient
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 app = Flask(
@@ -14,21 +20,265 @@ app = Flask(
     static_folder=os.path.join(BASE_DIR, "static")
 )
 
-es = Elasticsearch([{"host": "localhost", "port": 9200, "scheme": "http"}])
+# The process-wide storage client, resolved on first request
+es = SharedClient()
 
-@app.route('/')
-def index():
-    return render_template('dashboard.html')
+# When the collector and detector run in this process (see main.py) they keep
+# the rollups current and the API answers from memory; ES is only queried to
+# seed them and to resync every ROLLUP_REFRESH_SECONDS. On its own, the
+# dashboard falls back to short-lived cached ES responses.
+ROLLUP_REFRESH_SECONDS = 300
+RESPONSE_TTL_SECONDS = 5
 
-@app.route('/api/alerts')
-def get_alerts():
-    # Get the most recent alerts
+rollups = MinuteRollups()
+rollup_refresh = TTLCache(ROLLUP_REFRESH_SECONDS)
+response_cache = TTLCache(RESPONSE_TTL_SECONDS)
+live_feed = {"enabled": False}
+
+# Push channel for /api/stream; published to by the collector and detector
+event_bus = EventBus()
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_FILTERS = ("severity", "log_type", "source_ip", "ip_address", "rule_name")
+# Cap on log lines pushed per ingest batch; the dashboard only shows the latest
+STREAM_LOGS_PER_BATCH = 50
+
+
+REQUEST_SECONDS = histogram("siem_dashboard_request_seconds",
+                            "Dashboard request handling time (streams: until the response starts)",
+                            ("endpoint", "status"))
+gauge("siem_stream_clients", "Connected /api/stream clients").set_function(
+    lambda: len(event_bus.subscribers)
+)
+
+
+# Paged /api/logs and /api/alerts requests
+DEFAULT_PAGE_SIZE = {"logs": 100, "alerts": 50}
+MAX_PAGE_SIZE = 500
+PIT_KEEP_ALIVE = "2m"
+PAGE_FILTERS = ("severity", "log_type", "rule_name", "action")
+# source_ip matches whichever IP field a document carries
+IP_FIELDS = ("source_ip", "ip_address", "key")
+
+
+def compact_alert(alert):
+    return {key: value for key, value in alert.items() if key != "matches"}
+
+
+def compact_logs(docs):
+    return [
+        {
+            "timestamp": doc.get("timestamp"),
+            "log_type": doc.get("log_type"),
+            "source_ip": doc.get("source_ip"),
+            "ip_address": doc.get("ip_address"),
+            "line": doc.get("raw_log")
+        }
+        for doc in docs[-STREAM_LOGS_PER_BATCH:]
+    ]
+
+
+def attach_live_feed(log_collector, threat_detector):
+    """Keep the rollups and the event stream current from ingest and detection"""
+    log_collector.add_sink(rollups.record_logs)
+    threat_detector.add_alert_listener(rollups.record_alert)
+
+    log_collector.add_sink(lambda docs: event_bus.publish("logs", compact_logs(docs)))
+    threat_detector.add_alert_listener(lambda alert: event_bus.publish("alerts", compact_alert(alert)))
+
+    live_feed["enabled"] = True
+
+
+def encode_cursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+# Cursor keys and the types their values may have
+CURSOR_FIELDS = {
+    "pit": (str,),
+    "search_after": (list,),
+    "before": (str, int, type(None)),
+    "skip": (int,)
+}
+
+
+def decode_cursor(value):
+    """The dict encode_cursor made; ValueError (a 400) for anything else"""
+    cursor = json.loads(base64.urlsafe_b64decode(value.encode()))
+    if not isinstance(cursor, dict):
+        raise ValueError("invalid cursor")
+    for key, item in cursor.items():
+        types = CURSOR_FIELDS.get(key)
+        if types is None or not isinstance(item, types) or isinstance(item, bool):
+            raise ValueError("invalid cursor")
+    if cursor.get("skip", 0) < 0:
+        raise ValueError("invalid cursor")
+    return cursor
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def page_size(kind):
+    # ValueError for a non-numeric ?size, which the routes turn into a 400
+    return max(1, min(int(request.args.get("size", DEFAULT_PAGE_SIZE[kind])), MAX_PAGE_SIZE))
+
+
+def first_page(items, size):
+    """A newest-first page read without a PIT, with a cursor continuing it in ES
+
+    Items sharing the page's oldest timestamp are left to the next page,
+    which opens a PIT at or below that timestamp, so paging on from here
+    neither repeats nor skips anything. Returns None when every item has
+    the same timestamp and there is no such boundary.
+    """
+    last = items[-1].get("timestamp") if len(items) == size else None
+    if not last:
+        return {"items": items, "next_cursor": None}
+
+    kept = [item for item in items if item.get("timestamp") != last]
+    if not kept:
+        return None
+    return {"items": kept, "next_cursor": encode_cursor({"before": last})}
+
+
+def search_page(index, default_from, default_excludes=(), snapshot=True):
+    """One search_after page over a point-in-time, newest first
+
+    Supports ?size, ?cursor, ?fields (source projection), ?from/?to (ES date
+    math or ISO timestamps) and term filters. The returned next_cursor carries
+    the PIT id and sort values, so every page costs the same however deep
+    the client goes. With snapshot=False a first page is read without a PIT
+    (for cached pages, which nobody would close it for).
+    """
+    args = request.args
+    kind = "alerts" if index == "siem-alerts" else "logs"
+    if kind == "logs":
+        index = log_indices(args.get("from", default_from), args.get("to", "now"))
+    size = page_size(kind)
+    cursor = decode_cursor(args["cursor"]) if args.get("cursor") else {}
+
+    filters = [{"range": {"timestamp": {"gte": args.get("from", default_from), "lte": args.get("to", "now")}}}]
+    if cursor.get("before"):
+        filters.append({"range": {"timestamp": {"lte": cursor["before"]}}})
+
+    for field in PAGE_FILTERS:
+        if args.get(field):
+            filters.append({"terms": {keyword_field(field): args[field].split(",")}})
+
+    if args.get("source_ip"):
+        values = args["source_ip"].split(",")
+        filters.append({"bool": {
+            "should": [{"terms": {keyword_field(field): values}} for field in IP_FIELDS],
+            "minimum_should_match": 1
+        }})
+
+    if args.get("fields"):
+        source = {"includes": args["fields"].split(",")}
+    else:
+        source = {"excludes": list(default_excludes)}
+
+    pit_id = cursor.get("pit")
+    opened = pit_id is None and bool(snapshot or cursor)
+    if opened:
+        pit_id = es.open_point_in_time(index=index, keep_alive=PIT_KEEP_ALIVE)["id"]
+
+    body = {
+        "size": size,
+        "query": {"bool": {"filter": filters}},
+        "sort": [{"timestamp": "desc"}],
+        "_source": source,
+        "track_total_hits": False
+    }
+    if pit_id is not None:
+        body["sort"].append({"_shard_doc": "desc"})
+        body["pit"] = {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE}
+    if cursor.get("search_after"):
+        body["search_after"] = cursor["search_after"]
+    elif cursor.get("skip"):
+        body["from"] = int(cursor["skip"])
+
+    try:
+        results = es.search(body=body) if pit_id is not None else es.search(index=index, body=body)
+    except Exception as e:
+        if opened:
+            # Nobody holds a cursor for it yet, so nobody else would close it
+            try:
+                es.close_point_in_time(id=pit_id)
+            except Exception as close_error:
+                print(f"⚠️ Failed to close point in time: {close_error}")
+        # A PIT that timed out is gone (404); anything else is storage trouble
+        if cursor.get("pit") and getattr(e, "status_code", None) == 404:
+            raise CursorExpired() from e
+        raise
+    pit_id = results.get("pit_id", pit_id)
+    hits = results["hits"]["hits"]
+    items = [dict(hit["_source"], id=hit["_id"]) for hit in hits]
+
+    if pit_id is None:
+        page = first_page(items, size)
+        if page is not None:
+            return page
+        # One timestamp throughout: the next page skips this one in ES order
+        return {"items": items, "next_cursor": encode_cursor({"before": items[-1]["timestamp"], "skip": size})}
+
+    next_cursor = None
+    if len(hits) == size:
+        next_cursor = encode_cursor({
+            "pit": pit_id,
+            "search_after": hits[-1]["sort"],
+            "before": cursor.get("before")
+        })
+    else:
+        es.close_point_in_time(id=pit_id)
+
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def rollup_page(items, size):
+    """First page served from memory; deeper pages continue in ES
+
+    The rollups keep ingest order, so the page is put in the order ES pages
+    in (newest timestamp first) before the cursor is taken from it. None
+    when the page can't be continued that way.
+    """
+    return first_page(sorted(items, key=lambda item: item.get("timestamp") or "", reverse=True), size)
+
+
+def plain_request(size, kind):
+    # The default "latest N" request, which is cacheable
+    return not set(request.args) - {"size"} and size <= DEFAULT_PAGE_SIZE[kind]
+
+
+def wants_rollups(size, kind):
+    return live_feed["enabled"] and plain_request(size, kind)
+
+
+def cached_page(size, kind, index, default_from, default_excludes=()):
+    if not plain_request(size, kind):
+        return search_page(index, default_from, default_excludes)
+
+    return response_cache.get((kind, size), lambda: search_page(
+        index, default_from, default_excludes, snapshot=False
+    ))
+
+
+def page_error(e):
+    if isinstance(e, ValueError):
+        return jsonify({"error": "invalid size or cursor"}), 400
+    if isinstance(e, CursorExpired):
+        return jsonify({"error": "cursor expired, start again from the first page"}), 410
+    print(f"❌ Dashboard search failed: {e}")
+    return jsonify({"error": "storage unavailable"}), 503
+
+
+def query_alerts(size=50):
     query = {
         "query": {
             "range": {
                 "timestamp": {
-                    "gte": (datetime.now() - timedelta(hours=24)).isoformat(),
-                    "lte": datetime.now().isoformat()
+                    "gte": "now-24h",
+                    "lte": "now"
                 }
             }
         },
@@ -39,27 +289,45 @@ def get_alerts():
                 }
             }
         ],
-        "size": 50
+        "size": size
     }
-    
+
     results = es.search(index="siem-alerts", body=query)
-    alerts = [hit["_source"] for hit in results["hits"]["hits"]]
-    
-    return jsonify(alerts)
+    return [dict(hit["_source"], id=hit["_id"]) for hit in results["hits"]["hits"]]
 
-@app.route('/api/stats')
-def get_stats():
-    # Get statistics for the dashboard
-    current_time = datetime.now()
-    time_24h_ago = current_time - timedelta(hours=24)
-    
+
+def query_logs(size=100):
+    query = {
+        "query": {
+            "range": {
+                "timestamp": {
+                    "gte": "now-1h",
+                    "lte": "now"
+                }
+            }
+        },
+        "sort": [
+            {
+                "timestamp": {
+                    "order": "desc"
+                }
+            }
+        ],
+        "size": size
+    }
+
+    results = es.search(index=log_indices("now-1h"), body=query)
+    return [hit["_source"] for hit in results["hits"]["hits"]]
+
+
+def query_stats():
     # Get total alerts in the last 24 hours
     alerts_query = {
         "query": {
             "range": {
                 "timestamp": {
-                    "gte": time_24h_ago.isoformat(),
-                    "lte": current_time.isoformat()
+                    "gte": "now-24h",
+                    "lte": "now"
                 }
             }
         },
@@ -67,65 +335,230 @@ def get_stats():
         "aggs": {
             "severity_breakdown": {
                 "terms": {
-                    "field": "severity"
+                    "field": keyword_field("severity")
                 }
             }
         }
     }
-    
+
     # Get total logs in the last 24 hours
     logs_query = {
         "query": {
             "range": {
                 "timestamp": {
-                    "gte": time_24h_ago.isoformat(),
-                    "lte": current_time.isoformat()
+                    "gte": "now-24h",
+                    "lte": "now"
                 }
             }
         },
-        "size": 0
+        "size": 0,
+        "track_total_hits": True
     }
-    
+
     alerts_results = es.search(index="siem-alerts", body=alerts_query)
-    logs_results = es.search(index="*", body=logs_query)
-    
-    stats = {
+    logs_results = es.search(index=log_indices("now-24h"), body=logs_query)
+
+    return {
         "total_alerts": alerts_results["hits"]["total"]["value"],
         "total_logs": logs_results["hits"]["total"]["value"],
         "severity_breakdown": {
-            bucket["key"]: bucket["doc_count"] 
+            bucket["key"]: bucket["doc_count"]
             for bucket in alerts_results["aggregations"]["severity_breakdown"]["buckets"]
         }
     }
-    
-    return jsonify(stats)
+
+
+def seed_rollups():
+    """Load per-minute counts for the last 24h so live updates start from truth"""
+    logs_query = {
+        "query": {"range": {"ingest_timestamp": {"gte": "now-24h", "lte": "now"}}},
+        "size": 0,
+        "aggs": {
+            "per_minute": {
+                "date_histogram": {"field": "ingest_timestamp", "fixed_interval": "1m"}
+            }
+        }
+    }
+    alerts_query = {
+        "query": {"range": {"timestamp": {"gte": "now-24h", "lte": "now"}}},
+        "size": 0,
+        "aggs": {
+            "per_minute": {
+                "date_histogram": {"field": "timestamp", "fixed_interval": "1m"},
+                "aggs": {"severity": {"terms": {"field": keyword_field("severity")}}}
+            }
+        }
+    }
+
+    # Ingest time can be far ahead of event time (backfills), so this
+    # ingest_timestamp histogram can't be narrowed to recent partitions
+    logs_results = es.search(index=LOG_INDEX_PATTERN, body=logs_query)
+    alerts_results = es.search(index="siem-alerts", body=alerts_query)
+
+    log_buckets = [
+        (bucket["key"] // 60000, bucket["doc_count"])
+        for bucket in logs_results["aggregations"]["per_minute"]["buckets"]
+    ]
+    alert_buckets = [
+        (bucket["key"] // 60000, severity["key"].lower(), severity["doc_count"])
+        for bucket in alerts_results["aggregations"]["per_minute"]["buckets"]
+        for severity in bucket["severity"]["buckets"]
+    ]
+
+    rollups.seed(log_buckets, alert_buckets, query_logs(), query_alerts())
+    return True
+
+
+def current_rollups():
+    # Seeds on first use and resyncs once per refresh period; concurrent
+    # requests share a single refresh
+    rollup_refresh.get("rollups", seed_rollups)
+    return rollups
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = getattr(g, "started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                request.endpoint or "unknown", response.status_code)
+    return response
+
+@app.route('/')
+def index():
+    return render_template('dashboard.html')
+
+@app.route('/api/alerts')
+def get_alerts():
+    # Get the most recent alerts; match details are fetched per alert
+    try:
+        size = page_size("alerts")
+        if wants_rollups(size, "alerts"):
+            alerts = [compact_alert(alert) for alert in current_rollups().latest_alerts(size)]
+            page = rollup_page(alerts, size)
+            if page is not None:
+                return jsonify(page)
+
+        return jsonify(cached_page(size, "alerts", "siem-alerts", "now-24h", default_excludes=("matches",)))
+    except Exception as e:
+        return page_error(e)
+
+@app.route('/api/alerts/<alert_id>/matches')
+def get_alert_matches(alert_id):
+    try:
+        result = es.get(index="siem-alerts", id=alert_id, source_includes=["matches"])
+    except Exception:
+        return jsonify({"error": "alert not found"}), 404
+
+    return jsonify({"id": alert_id, "matches": result["_source"].get("matches", [])})
+
+@app.route('/api/stats')
+def get_stats():
+    # Get statistics for the dashboard
+    if live_feed["enabled"]:
+        return jsonify(current_rollups().stats())
+
+    return jsonify(response_cache.get("stats", query_stats))
 
 @app.route('/api/logs')
 def get_logs():
     # Get recent logs
-    query = {
-        "query": {
-            "range": {
-                "timestamp": {
-                    "gte": (datetime.now() - timedelta(hours=1)).isoformat(),
-                    "lte": datetime.now().isoformat()
-                }
-            }
-        },
-        "sort": [
-            {
-                "timestamp": {
-                    "order": "desc"
-                }
-            }
-        ],
-        "size": 100
+    try:
+        size = page_size("logs")
+        if wants_rollups(size, "logs"):
+            page = rollup_page(current_rollups().latest_logs(size), size)
+            if page is not None:
+                return jsonify(page)
+
+        return jsonify(cached_page(size, "logs", LOG_INDEX_PATTERN, "now-1h"))
+    except Exception as e:
+        return page_error(e)
+
+@app.route('/api/stream')
+def stream():
+    # Server-Sent Events: ?topics=alerts,logs plus optional filters such as
+    # ?severity=critical,high or ?log_type=firewall
+    topics = request.args.get("topics", "alerts,logs").split(",")
+    filters = {
+        field: set(request.args[field].split(","))
+        for field in STREAM_FILTERS if request.args.get(field)
     }
-    
-    results = es.search(index="*", body=query)
-    logs = [hit["_source"] for hit in results["hits"]["hits"]]
-    
-    return jsonify(logs)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription = event_bus.subscribe(topics, filters, last_event_id)
+    if subscription is None:
+        return jsonify({"error": "too many stream clients"}), 503
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            reported_drops = 0
+
+            while True:
+                events = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+
+                if subscription.dropped > reported_drops:
+                    # Tell the client it fell behind so it can refetch
+                    reported_drops = subscription.dropped
+                    yield f"event: lagged\ndata: {json.dumps({'dropped': reported_drops})}\n\n"
+
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                for seq, topic, data in events:
+                    yield f"id: {seq}\nevent: {topic}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format; ?format=json for a readable summary
+    if request.args.get("format") == "json":
+        return jsonify(REGISTRY.snapshot())
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/debug/profiler', methods=['GET', 'POST'])
+def profiler():
+    # POST ?action=start|stop|reset toggles the sampling profiler at runtime;
+    # GET reports the hottest functions, ?format=collapsed for flame graphs
+    if request.method == 'POST':
+        action = request.args.get("action", "")
+        if action == "start":
+            try:
+                interval = float(request.args.get("interval", 0)) or None
+            except ValueError:
+                return jsonify({"error": "invalid interval"}), 400
+            PROFILER.start(interval)
+        elif action == "stop":
+            PROFILER.stop()
+        elif action == "reset":
+            PROFILER.reset()
+        else:
+            return jsonify({"error": "action must be start, stop or reset"}), 400
+
+    if request.args.get("format") == "collapsed":
+        return Response(PROFILER.collapsed(), mimetype="text/plain")
+
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "invalid limit"}), 400
+    return jsonify(PROFILER.report(limit))
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
+    app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,314 @@
+# src/event_batch.py
+import socket
+import struct
+from array import array
+from itertools import compress
+
+from src.timestamps import iso_utc
+
+
+# Integer fields and their array typecodes; each column uses the smallest
+# value of its type as the "missing" marker
+INTEGER_FIELDS = {
+    "timestamp_ms": "q",
+    "status_code": "h",
+    "source_port": "i",
+    "destination_port": "i",
+    "response_size": "q",
+}
+MISSING = {"h": -(1 << 15), "i": -(1 << 31), "q": -(1 << 63)}
+
+# IPv4 addresses are packed into unsigned 32-bit integers
+IP_FIELDS = ("ip_address", "source_ip", "destination_ip", "threat_ip")
+
+# Free text that rarely repeats within a batch and is not worth a dictionary
+TEXT_FIELDS = ("raw_log", "message")
+
+
+PACK_UINT32 = struct.Struct(">I").pack
+
+
+def pack_ipv4(value):
+    """Unsigned 32-bit integer of a dotted IPv4 address, or None"""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def unpack_ipv4(value):
+    return socket.inet_ntoa(PACK_UINT32(value))
+
+
+class IntegerColumn:
+    """Integers in a typed array; None is stored as the type's minimum"""
+
+    def __init__(self, values, typecode):
+        self.missing = MISSING[typecode]
+        data = array(typecode, [self.missing if value is None else value for value in values])
+        # A real value equal to the marker (or a bool, which would come back
+        # as an int) cannot be stored faithfully
+        if data.count(self.missing) != values.count(None) or (0 in data or 1 in data) and any(
+                type(value) is bool for value in values):
+            raise TypeError("values do not fit an integer column")
+        self.data = data
+
+    def get(self, row):
+        value = self.data[row]
+        return None if value == self.missing else value
+
+    def keys(self, rows=None):
+        return self.data if rows is None else [self.data[row] for row in rows]
+
+    def encode(self, values):
+        return {self.missing if value is None else value for value in values}
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+class AddressColumn:
+    """IPv4 addresses packed into uint32; anything else is kept aside by row
+
+    Zero marks a row whose value is missing or lives in `other` (IPv6,
+    malformed text, and 0.0.0.0 itself).
+    """
+
+    def __init__(self, values):
+        packed = {}
+        self.other = {}
+        data = array("I", bytes(4 * len(values)))
+        for row, value in enumerate(values):
+            if value is None:
+                continue
+            address = packed.get(value)
+            if address is None:
+                address = packed[value] = pack_ipv4(value) or 0
+            if address:
+                data[row] = address
+            else:
+                self.other[row] = value
+        self.data = data
+
+    def get(self, row):
+        value = self.data[row]
+        if value:
+            return unpack_ipv4(value)
+        return self.other.get(row)
+
+    def keys(self, rows=None):
+        if not self.other:
+            return self.data if rows is None else [self.data[row] for row in rows]
+        rows = range(len(self.data)) if rows is None else rows
+        return [self.data[row] or self.other.get(row, 0) for row in rows]
+
+    def encode(self, values):
+        wanted = set()
+        for value in values:
+            if value is None:
+                wanted.add(0)
+                continue
+            address = pack_ipv4(value) if isinstance(value, str) else None
+            wanted.add(address or value)
+        return wanted
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+class DictionaryColumn:
+    """Repeating values (log type, method, action, protocol...) as small integer codes
+
+    Codes index `values`, which holds each distinct value of the batch once.
+    Unhashable values (lists, nested objects) are kept aside by row.
+    """
+
+    UNHASHABLE = object()
+
+    def __init__(self, values):
+        index = {}
+        self.other = {}
+        if values.count(None) == len(values):
+            # A field this batch does not have at all
+            index = {None: 0} if values else {}
+            codes = bytes(2 * len(values))
+        else:
+            try:
+                codes = [index.setdefault(value, len(index)) for value in values]
+            except TypeError:
+                index = {}
+                codes = self._codes(values, index)
+
+        self.values = list(index)
+        self.codes = array("H" if len(index) <= 0x10000 else "I", codes)
+
+    def _codes(self, values, index):
+        # Slow path: some values are unhashable
+        codes = []
+        for row, value in enumerate(values):
+            try:
+                codes.append(index.setdefault(value, len(index)))
+            except TypeError:
+                self.other[row] = value
+                codes.append(index.setdefault(self.UNHASHABLE, len(index)))
+        return codes
+
+    def get(self, row):
+        value = self.values[self.codes[row]]
+        return self.other[row] if value is self.UNHASHABLE else value
+
+    def keys(self, rows=None):
+        return self.codes if rows is None else [self.codes[row] for row in rows]
+
+    def encode(self, values):
+        return {code for code, value in enumerate(self.values)
+                if value is not self.UNHASHABLE and value in values}
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes)
+
+
+class TextColumn:
+    """Plain list of strings, for text that is unique per event"""
+
+    def __init__(self, values):
+        self.data = values
+
+    def get(self, row):
+        return self.data[row]
+
+    def keys(self, rows=None):
+        return self.data if rows is None else [self.data[row] for row in rows]
+
+    def encode(self, values):
+        return set(values)
+
+    def nbytes(self):
+        return 8 * len(self.data)
+
+
+class TimestampColumn:
+    """The ISO "timestamp" text, rebuilt from timestamp_ms when it was derived from it
+
+    Only timestamps that differ from the normalized form of their epoch
+    millis (unparseable dates kept as written) are stored, by row.
+    """
+
+    def __init__(self, values, millis):
+        self.millis = millis
+        self.other = {}
+        for row, value in enumerate(values):
+            ms = millis.get(row)
+            if value is not None and (ms is None or iso_utc(ms) != value):
+                self.other[row] = value
+
+    def get(self, row):
+        value = self.other.get(row)
+        if value is not None:
+            return value
+        ms = self.millis.get(row)
+        return None if ms is None else iso_utc(ms)
+
+    def keys(self, rows=None):
+        rows = range(len(self.millis.data)) if rows is None else rows
+        return [self.get(row) for row in rows]
+
+    def encode(self, values):
+        return set(values)
+
+    def nbytes(self):
+        return 0
+
+
+def build_column(field, values):
+    typecode = INTEGER_FIELDS.get(field)
+    if typecode is not None:
+        try:
+            return IntegerColumn(values, typecode)
+        except (TypeError, OverflowError):
+            pass
+    elif field in IP_FIELDS:
+        return AddressColumn(values)
+    elif field in TEXT_FIELDS:
+        return TextColumn(values)
+    return DictionaryColumn(values)
+
+
+class EventBatch:
+    """Parsed events stored column by column in typed arrays
+
+    Epoch timestamps are int64, IPv4 addresses uint32, ports and status codes
+    small integers, and repeating strings (log type, method, action,
+    protocol, source file...) dictionary-encoded per batch, so an event costs
+    a few dozen bytes plus its raw line instead of a dict of boxed values.
+
+    Filters run over whole columns: a condition becomes a set of stored
+    codes tested with one pass over an array. Rows are positions in the
+    batch; methods that take `rows` restrict themselves to those positions,
+    so filters chain.
+    """
+
+    def __init__(self, size, columns):
+        self.size = size
+        self.columns = columns
+
+    @classmethod
+    def from_docs(cls, docs, fields=None):
+        """Encode `fields` (default: every field seen) of a list of parsed docs"""
+        if fields is None:
+            fields = list(dict.fromkeys(field for doc in docs for field in doc))
+
+        columns = {}
+        for field in fields:
+            if field != "timestamp":
+                columns[field] = build_column(field, [doc.get(field) for doc in docs])
+
+        if "timestamp" in fields:
+            millis = columns.get("timestamp_ms")
+            if not isinstance(millis, IntegerColumn):
+                columns["timestamp"] = build_column("timestamp", [doc.get("timestamp") for doc in docs])
+            else:
+                columns["timestamp"] = TimestampColumn([doc.get("timestamp") for doc in docs], millis)
+
+        return cls(len(docs), columns)
+
+    def __len__(self):
+        return self.size
+
+    def get(self, field, row):
+        column = self.columns.get(field)
+        return None if column is None else column.get(row)
+
+    def values(self, field, rows=None):
+        """Decoded values of one field, for every row or the given rows"""
+        column = self.columns.get(field)
+        rows = range(self.size) if rows is None else rows
+        if column is None:
+            return [None] * len(rows)
+        return [column.get(row) for row in rows]
+
+    def where(self, field, values, rows=None):
+        """Rows whose field equals any of `values` (None matches a missing field)"""
+        column = self.columns.get(field)
+        if column is None:
+            if None in values:
+                return list(range(self.size)) if rows is None else list(rows)
+            return []
+
+        wanted = column.encode(values)
+        if not wanted:
+            return []
+        keys = column.keys(rows)
+        return list(compress(range(self.size) if rows is None else rows, map(wanted.__contains__, keys)))
+
+    def filter(self, conditions, rows=None):
+        """Rows matching every {field: set of values} condition"""
+        for field, values in conditions.items():
+            rows = self.where(field, values, rows)
+            if not rows:
+                return []
+        return list(range(self.size)) if rows is None else rows
+
+    def nbytes(self):
+        """Bytes held by the typed arrays (dictionaries and text not included)"""
+        return sum(column.nbytes() for column in self.columns.values())
@@ -0,0 +1,108 @@
+# src/event_bus.py
+import threading
+from collections import deque
+
+
+class Subscription:
+    """One consumer's bounded view of the bus
+
+    Publishers only append to the queue; when a slow consumer falls more than
+    `max_queue` events behind, its oldest events are dropped (and counted)
+    rather than blocking ingest. Filters are applied on the consumer's side
+    so publishing costs the same no matter how selective clients are.
+    """
+
+    def __init__(self, topics, filters, max_queue):
+        self.topics = set(topics)
+        self.filters = filters or {}
+        self.queue = deque(maxlen=max_queue)
+        self.dropped = 0
+        self.closed = False
+        self._ready = threading.Condition()
+
+    def push(self, event):
+        with self._ready:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(event)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Wait for and return the pending events that pass the filters"""
+        with self._ready:
+            if not self.queue and not self.closed:
+                self._ready.wait(timeout)
+            events = list(self.queue)
+            self.queue.clear()
+
+        return [event for event in (self.apply_filters(e) for e in events) if event]
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+    def accepts(self, item):
+        for field, values in self.filters.items():
+            if field in item and str(item[field]) not in values:
+                return False
+        return True
+
+    def apply_filters(self, event):
+        seq, topic, data = event
+        if topic not in self.topics:
+            return None
+
+        if isinstance(data, list):
+            data = [item for item in data if self.accepts(item)]
+            return (seq, topic, data) if data else None
+
+        return event if self.accepts(data) else None
+
+
+class EventBus:
+    """In-process pub/sub with a bounded replay buffer
+
+    Every event gets a sequence number; the last `replay_size` events are
+    kept so a reconnecting client can resume from the last id it saw.
+    """
+
+    def __init__(self, replay_size=1000, max_queue=500, max_subscribers=1000):
+        self.replay = deque(maxlen=replay_size)
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, topic, data):
+        with self._lock:
+            self.seq += 1
+            event = (self.seq, topic, data)
+            self.replay.append(event)
+            subscribers = list(self.subscribers)
+
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, topics, filters=None, last_event_id=None):
+        """Register a consumer; returns None when the bus is at capacity"""
+        subscription = Subscription(topics, filters, self.max_queue)
+
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+
+            if last_event_id is not None:
+                for event in self.replay:
+                    if event[0] > last_event_id:
+                        subscription.push(event)
+
+            self.subscribers.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+        subscription.close()
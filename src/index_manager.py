@@ -0,0 +1,336 @@
+# src/index_manager.py
+import re
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+LOG_INDEX_PREFIX = "siem-logs"
+ALERT_INDEX = "siem-alerts"
+
+# Beyond this many daily partitions a range query just uses the wildcard
+MAX_PARTITIONS = 62
+
+PARTITION_FORMAT = "%Y.%m.%d"
+PARTITION_NAME = re.compile(r"-(\d{4}\.\d{2}\.\d{2})(?:-(\d{6}))?$")
+
+# Ingest pipeline stamping log documents with the time Elasticsearch indexed
+# them: spooled or retried documents keep an old ingest_timestamp but get a
+# current indexed_at, which is what incremental detection pages by
+INDEXED_AT_PIPELINE = "siem-indexed-at"
+INDEXED_AT_PROCESSORS = [{"set": {"field": "indexed_at", "value": "{{{_ingest.timestamp}}}"}}]
+
+DATE_MATH = re.compile(r"^now(?:-(\d+)([smhdw]))?(?:/[smhdw])?$")
+DATE_MATH_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+KEYWORD = {"type": "keyword", "ignore_above": 1024}
+
+# Strings not listed below (e.g. extra JSON log fields) are mapped as keywords
+STRINGS_AS_KEYWORDS = [{"strings_as_keywords": {
+    "match_mapping_type": "string",
+    "mapping": KEYWORD
+}}]
+
+LOG_MAPPINGS = {
+    "dynamic_templates": STRINGS_AS_KEYWORDS,
+    "properties": {
+        "timestamp": {"type": "date"},
+        "timestamp_ms": {"type": "date", "format": "epoch_millis"},
+        "ingest_timestamp": {"type": "date"},
+        "indexed_at": {"type": "date"},
+        "log_type": KEYWORD,
+        "source_file": KEYWORD,
+        "processed": {"type": "boolean"},
+        "raw_log": {"type": "text"},
+        "message": {"type": "text"},
+        "ip_address": {"type": "ip"},
+        "source_ip": {"type": "ip"},
+        "destination_ip": {"type": "ip"},
+        "source_port": {"type": "integer"},
+        "destination_port": {"type": "integer"},
+        "status_code": {"type": "integer"},
+        "response_size": {"type": "long"},
+        "method": KEYWORD,
+        "path": KEYWORD,
+        "protocol": KEYWORD,
+        "action": KEYWORD,
+        "user_agent": KEYWORD,
+        "computer": KEYWORD,
+        "source": KEYWORD,
+        "severity": KEYWORD,
+        "threat_match": {"type": "boolean"},
+        "threat_ip": {"type": "ip"},
+        "threat_field": KEYWORD,
+        "threat_lists": KEYWORD
+    }
+}
+
+ALERT_MAPPINGS = {
+    "dynamic_templates": STRINGS_AS_KEYWORDS,
+    "properties": {
+        "timestamp": {"type": "date"},
+        "rule_name": KEYWORD,
+        "description": {"type": "text"},
+        "severity": KEYWORD,
+        "count": {"type": "long"},
+        "key": KEYWORD,
+        # {field: value} for keyed rules; each field is searchable as a keyword
+        "group_by": {"type": "flattened"},
+        "distinct_field": KEYWORD,
+        # Stored for /api/alerts/<id>/matches but never searched
+        "matches": {"type": "object", "enabled": False},
+        "top_sources": {"type": "object", "enabled": False}
+    }
+}
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def partition_day(timestamp, today):
+    """UTC day (YYYY.MM.DD) of an ISO timestamp, capped at today
+
+    Timestamps that are missing or unparseable fall into today's partition,
+    as do ones from the future so a skewed clock can't create new indices.
+    """
+    if not isinstance(timestamp, str) or len(timestamp) < 10 \
+            or timestamp[4] != "-" or timestamp[7] != "-":
+        return today
+
+    offset = timestamp[19:].lstrip(".0123456789")
+    if offset in ("", "Z", "+00:00"):
+        day = f"{timestamp[:4]}.{timestamp[5:7]}.{timestamp[8:10]}"
+    else:
+        try:
+            dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+            day = dt.astimezone(timezone.utc).strftime(PARTITION_FORMAT)
+        except (ValueError, OverflowError):
+            # Unparseable, or shifted past year 9999 by its offset
+            return today
+
+    return min(day, today)
+
+
+def resolve_time(value, now):
+    """Turn `now`, `now-<n><unit>` or an ISO timestamp into a UTC datetime
+
+    Returns None for anything else, in which case callers don't prune.
+    """
+    if value is None:
+        return now
+
+    match = DATE_MATH.match(str(value))
+    if match:
+        amount, unit = match.groups()
+        return now - timedelta(seconds=int(amount or 0) * DATE_MATH_UNITS.get(unit, 0))
+
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def indices_for_range(prefix, start, end="now", now=None):
+    """Comma-separated index patterns for the daily partitions overlapping [start, end]
+
+    Each day is matched with a trailing wildcard so its rollover generations
+    are included. Falls back to `<prefix>-*` when the range can't be resolved
+    or is too wide to be worth listing.
+    """
+    now = now or utc_now()
+    start = resolve_time(start, now)
+    end = resolve_time(end, now)
+    if start is None or end is None:
+        return f"{prefix}-*"
+
+    first = start.astimezone(timezone.utc).date()
+    last = min(end, now).astimezone(timezone.utc).date()
+    days = (last - first).days + 1
+    if days > MAX_PARTITIONS:
+        return f"{prefix}-*"
+
+    return ",".join(
+        f"{prefix}-{(first + timedelta(days=n)).strftime(PARTITION_FORMAT)}*"
+        for n in range(max(days, 1))
+    )
+
+
+class IndexManager:
+    """Templates, rollover and retention for the time-partitioned log indices
+
+    Log documents go to one index per UTC day of their event time
+    (`siem-logs-YYYY.MM.DD`), so age-based rollover happens at the day
+    boundary and retention deletes whole indices. When the day's partition
+    outgrows `max_size_bytes` or `max_docs`, writes continue in a new
+    generation (`siem-logs-YYYY.MM.DD-000002`).
+    """
+
+    def __init__(self, es_client, prefix=LOG_INDEX_PREFIX, max_docs=None,
+                 max_size_bytes=10 * 1024 ** 3, retention_days=30, check_interval=60,
+                 shards=1, refresh_interval="5s"):
+        self.es_client = es_client
+        self.prefix = prefix
+        self.max_docs = max_docs
+        self.max_size_bytes = max_size_bytes
+        self.retention_days = retention_days
+        self.check_interval = check_interval
+        self.shards = shards
+        self.refresh_interval = refresh_interval
+
+        # (prefix, day) -> current write generation
+        self.generations = {}
+        self.prefixes = {prefix}
+        self.last_check = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, es_client, config):
+        """Build a manager from the "indices" section of log_sources.json"""
+        config = config or {}
+        max_size_mb = config.get("max_size_mb", 10240)
+        return cls(
+            es_client,
+            prefix=config.get("prefix", LOG_INDEX_PREFIX),
+            max_docs=config.get("max_docs"),
+            max_size_bytes=max_size_mb * 1024 * 1024 if max_size_mb else None,
+            retention_days=config.get("retention_days", 30),
+            check_interval=config.get("check_interval", 60),
+            shards=config.get("shards", 1),
+            refresh_interval=config.get("refresh_interval", "5s")
+        )
+
+    def install_templates(self, prefixes=None):
+        """Create or update the index templates; applies to indices created afterwards
+
+        The indexed_at pipeline is also switched on for log indices that
+        already exist, so today's partition is stamped without waiting for
+        the next one.
+        """
+        self.es_client.ingest.put_pipeline(
+            id=INDEXED_AT_PIPELINE,
+            description="Stamp log documents with the time they were indexed",
+            processors=INDEXED_AT_PROCESSORS
+        )
+
+        settings = {
+            "number_of_shards": self.shards,
+            "refresh_interval": self.refresh_interval,
+            "default_pipeline": INDEXED_AT_PIPELINE,
+            # A JSON log with e.g. a hostname in source_ip keeps its other fields
+            "mapping.ignore_malformed": True
+        }
+
+        for prefix in prefixes or self.prefixes:
+            self.prefixes.add(prefix)
+            self.es_client.indices.put_index_template(
+                name=prefix,
+                index_patterns=[f"{prefix}-*"],
+                template={"settings": settings, "mappings": LOG_MAPPINGS},
+                priority=100
+            )
+            self.es_client.indices.put_mapping(
+                index=f"{prefix}-*",
+                properties={"indexed_at": LOG_MAPPINGS["properties"]["indexed_at"]},
+                allow_no_indices=True
+            )
+            self.es_client.indices.put_settings(
+                index=f"{prefix}-*",
+                settings={"index.default_pipeline": INDEXED_AT_PIPELINE},
+                allow_no_indices=True
+            )
+
+        self.es_client.indices.put_index_template(
+            name=ALERT_INDEX,
+            index_patterns=[f"{ALERT_INDEX}*"],
+            template={"settings": {"number_of_shards": 1}, "mappings": ALERT_MAPPINGS},
+            priority=100
+        )
+
+    def write_index(self, prefix, day):
+        generation = self.generations.get((prefix, day))
+        if generation is None:
+            self.prefixes.add(prefix)
+            generation = 1
+        if generation == 1:
+            return f"{prefix}-{day}"
+        return f"{prefix}-{day}-{generation:06d}"
+
+    def partitions(self, prefix):
+        """[(index name, day, generation)] for the existing partitions of a prefix"""
+        names = self.es_client.indices.get(
+            index=f"{prefix}-*", allow_no_indices=True, expand_wildcards="open"
+        )
+
+        result = []
+        for name in names:
+            match = PARTITION_NAME.search(name)
+            if match and name.startswith(f"{prefix}-"):
+                day, generation = match.groups()
+                result.append((name, day, int(generation or 1)))
+        return result
+
+    def discover(self):
+        """Resume writing to the latest generation of each existing partition"""
+        for prefix in list(self.prefixes):
+            for name, day, generation in self.partitions(prefix):
+                key = (prefix, day)
+                self.generations[key] = max(generation, self.generations.get(key, 1))
+
+    def check_rollover(self, prefix, day):
+        index_name = self.write_index(prefix, day)
+        try:
+            stats = self.es_client.indices.stats(index=index_name, metric="docs,store")
+        except Exception:
+            # Not created yet
+            return False
+
+        primaries = stats["_all"]["primaries"]
+        docs = primaries["docs"]["count"]
+        size = primaries["store"]["size_in_bytes"]
+
+        if (self.max_docs and docs >= self.max_docs) or \
+                (self.max_size_bytes and size >= self.max_size_bytes):
+            with self._lock:
+                key = (prefix, day)
+                self.generations[key] = self.generations.get(key, 1) + 1
+            print(f"🔄 Rolled over {index_name} ({docs} docs, {size} bytes)")
+            return True
+
+        return False
+
+    def apply_retention(self, prefix, now=None):
+        """Delete partitions whose whole day is older than retention_days"""
+        if not self.retention_days:
+            return []
+
+        now = now or utc_now()
+        cutoff = (now - timedelta(days=self.retention_days)).strftime(PARTITION_FORMAT)
+        expired = [name for name, day, _ in self.partitions(prefix) if day < cutoff]
+
+        for name in expired:
+            self.es_client.indices.delete(index=name)
+            print(f"🗑️ Deleted expired index {name}")
+
+        with self._lock:
+            for key in [key for key in self.generations if key[0] == prefix and key[1] < cutoff]:
+                del self.generations[key]
+
+        return expired
+
+    def maintain(self, now=None):
+        """Rollover and retention checks; call often, runs every check_interval"""
+        if time.monotonic() - self.last_check < self.check_interval:
+            return
+        self.last_check = time.monotonic()
+
+        now = now or utc_now()
+        today = now.strftime(PARTITION_FORMAT)
+
+        for prefix in list(self.prefixes):
+            try:
+                self.check_rollover(prefix, today)
+                self.apply_retention(prefix, now)
+            except Exception as e:
+                print(f"❌ Index maintenance failed for {prefix}: {e}")
@@ -0,0 +1,1272 @@
+# src/local_store.py
+import os
+import re
+import json
+import time
+import sqlite3
+import fnmatch
+import threading
+
+from src.index_manager import resolve_time, utc_now
+from src.timestamps import PARSE_ERRORS, iso_utc, parse_iso
+
+
+# Document fields copied into indexed columns of every partition table.
+# Queries on these are answered by SQLite; everything else is read from the
+# stored JSON source and checked in Python.
+DATE_COLUMNS = {"timestamp": "ts", "timestamp_ms": "ts", "ingest_timestamp": "ingest_ts",
+                "indexed_at": "indexed_ts"}
+KEYWORD_COLUMNS = ("log_type", "ip_address", "source_ip", "destination_ip", "severity", "rule_name")
+INDEXED_COLUMNS = ("ts", "ingest_ts", "indexed_ts") + KEYWORD_COLUMNS
+ROW_COLUMNS = "seq, id, ts, ingest_ts, indexed_ts, " + ", ".join(KEYWORD_COLUMNS) + ", source"
+
+TABLE_PREFIX = "idx:"
+
+# Reader connections kept open per store
+READERS = 4
+
+DURATION = re.compile(r"^(\d+)([smhd])$")
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+CALENDAR_INTERVALS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400, "week": 604800}
+SELECTOR_SCRIPT = re.compile(r"^\s*params\.(\w+)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$")
+COMPARISONS = {
+    ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b, "==": lambda a, b: a == b, "!=": lambda a, b: a != b
+}
+WORD = re.compile(r"\w+")
+
+
+class NotFoundError(Exception):
+    # Same as the elasticsearch client's NotFoundError
+    status_code = 404
+
+
+def duration_seconds(value, default=60):
+    match = DURATION.match(str(value or "").strip())
+    if not match:
+        return default
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def epoch_ms(value):
+    """Epoch millis of a date value (ISO string or number), or None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return parse_iso(value)
+    except PARSE_ERRORS:
+        return None
+
+
+def bound_ms(value, now):
+    """Epoch millis of a range bound: date math, ISO or epoch millis"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    resolved = resolve_time(value, now)
+    if resolved is None:
+        raise ValueError(f"Unsupported date value: {value}")
+    return int(resolved.timestamp() * 1000)
+
+
+def term_key(value):
+    """Comparable form of a term, so 404 matches "404" and True matches "true\""""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def field_values(doc, field):
+    """Values of a (possibly dotted or .keyword) field as a list"""
+    if field.endswith(".keyword"):
+        field = field[:-len(".keyword")]
+
+    value = doc.get(field)
+    if value is None and "." in field:
+        value = doc
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def project_source(doc, source):
+    """Apply a _source spec (False, a list, or includes/excludes)"""
+    if source is None or source is True:
+        return doc
+    if source is False:
+        return {}
+    if isinstance(source, (str, list)):
+        source = {"includes": [source] if isinstance(source, str) else source}
+
+    includes = source.get("includes") or []
+    excludes = source.get("excludes") or []
+    keys = [key for key in doc if not includes or any(fnmatch.fnmatchcase(key, p) for p in includes)]
+    return {key: doc[key] for key in keys if not any(fnmatch.fnmatchcase(key, p) for p in excludes)}
+
+
+class Query:
+    """One query DSL tree, split into SQL pushdown and a Python predicate
+
+    Range filters on timestamp/ingest_timestamp and term(s) filters on the
+    keyword columns that every conjunct must satisfy become SQL; `exact`
+    says whether that SQL alone decides the query. Supported clauses:
+    match_all, bool, term, terms, range, exists, prefix, wildcard, match
+    and match_phrase (text matching is a case-insensitive word match, not
+    full analysis).
+    """
+
+    def __init__(self, query, now):
+        self.now = now
+        self.query = query or {"match_all": {}}
+        self.sql = []
+        self.params = []
+        self.exact = self._push(self.query)
+        self.predicate = self._compile(self.query)
+
+    def where(self):
+        return " AND ".join(self.sql) if self.sql else "1"
+
+    def matches(self, doc):
+        return self.predicate(doc)
+
+    # --- SQL pushdown -------------------------------------------------------
+
+    def _push(self, query):
+        """Add SQL for the conjunctive parts of query; True when nothing is left over"""
+        (kind, spec), = query.items()
+
+        if kind == "match_all":
+            return True
+
+        if kind == "bool":
+            exact = not spec.get("should") and not spec.get("must_not")
+            for clause in self._clauses(spec.get("filter")) + self._clauses(spec.get("must")):
+                exact = self._push(clause) and exact
+            return exact
+
+        if kind == "range":
+            (field, bounds), = spec.items()
+            column = DATE_COLUMNS.get(field)
+            if column is None:
+                return False
+            for op, symbol in (("gte", ">="), ("gt", ">"), ("lte", "<="), ("lt", "<")):
+                if op in bounds:
+                    self.sql.append(f"{column} {symbol} ?")
+                    self.params.append(bound_ms(bounds[op], self.now))
+            return True
+
+        if kind in ("term", "terms"):
+            (field, value), = spec.items()
+            if kind == "term" and isinstance(value, dict):
+                value = value.get("value")
+            values = value if isinstance(value, list) else [value]
+            field = field[:-len(".keyword")] if field.endswith(".keyword") else field
+            if field not in KEYWORD_COLUMNS or not all(isinstance(v, str) for v in values):
+                return False
+            if not values:
+                self.sql.append("0")
+            else:
+                self.sql.append(f"{field} IN ({', '.join('?' * len(values))})")
+                self.params.extend(values)
+            return True
+
+        return False
+
+    @staticmethod
+    def _clauses(value):
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    # --- Python predicate ---------------------------------------------------
+
+    def _compile(self, query):
+        (kind, spec), = query.items()
+        compile_clause = getattr(self, f"_compile_{kind}", None)
+        if compile_clause is None:
+            raise ValueError(f"Unsupported query clause: {kind}")
+        return compile_clause(spec)
+
+    def _compile_match_all(self, spec):
+        return lambda doc: True
+
+    def _compile_bool(self, spec):
+        required = [self._compile(c) for c in self._clauses(spec.get("filter")) + self._clauses(spec.get("must"))]
+        excluded = [self._compile(c) for c in self._clauses(spec.get("must_not"))]
+        should = [self._compile(c) for c in self._clauses(spec.get("should"))]
+        minimum = int(spec.get("minimum_should_match", 0 if required else 1)) if should else 0
+
+        def predicate(doc):
+            if not all(p(doc) for p in required) or any(p(doc) for p in excluded):
+                return False
+            return not minimum or sum(1 for p in should if p(doc)) >= minimum
+        return predicate
+
+    def _compile_term(self, spec):
+        (field, value), = spec.items()
+        if isinstance(value, dict):
+            value = value.get("value")
+        return self._compile_terms({field: [value]})
+
+    def _compile_terms(self, spec):
+        (field, values), = spec.items()
+        wanted = {term_key(value) for value in values}
+        return lambda doc: any(term_key(v) in wanted for v in field_values(doc, field))
+
+    def _compile_exists(self, spec):
+        field = spec["field"]
+        return lambda doc: bool(field_values(doc, field))
+
+    def _compile_prefix(self, spec):
+        (field, value), = spec.items()
+        prefix = value.get("value") if isinstance(value, dict) else value
+        return lambda doc: any(str(v).startswith(prefix) for v in field_values(doc, field))
+
+    def _compile_wildcard(self, spec):
+        (field, value), = spec.items()
+        pattern = value.get("value") if isinstance(value, dict) else value
+        return lambda doc: any(fnmatch.fnmatchcase(str(v), pattern) for v in field_values(doc, field))
+
+    def _compile_range(self, spec):
+        (field, bounds), = spec.items()
+        tests = []
+        is_date = field in DATE_COLUMNS or bounds.get("format") == "epoch_millis"
+
+        for op in ("gte", "gt", "lte", "lt"):
+            if op not in bounds:
+                continue
+            bound = bound_ms(bounds[op], self.now) if is_date else bounds[op]
+            tests.append((COMPARISONS[{"gte": ">=", "gt": ">", "lte": "<=", "lt": "<"}[op]], bound))
+
+        def predicate(doc):
+            for value in field_values(doc, field):
+                value = epoch_ms(value) if is_date else value
+                try:
+                    if value is not None and all(test(value, bound) for test, bound in tests):
+                        return True
+                except TypeError:
+                    continue
+            return False
+        return predicate
+
+    def _compile_match_phrase(self, spec):
+        (field, value), = spec.items()
+        phrase = (value.get("query") if isinstance(value, dict) else value).lower()
+        return lambda doc: any(phrase in str(v).lower() for v in field_values(doc, field))
+
+    def _compile_match(self, spec):
+        (field, value), = spec.items()
+        if isinstance(value, dict):
+            text, operator = value.get("query", ""), value.get("operator", "or").lower()
+        else:
+            text, operator = value, "or"
+        words = set(WORD.findall(str(text).lower()))
+        combine = all if operator == "and" else any
+
+        def predicate(doc):
+            for v in field_values(doc, field):
+                present = set(WORD.findall(str(v).lower()))
+                if words and combine(word in present for word in words):
+                    return True
+            return False
+        return predicate
+
+
+class SortSpec:
+    """Parsed sort clause; the tiebreaker (_shard_doc) is (index name, row)"""
+
+    def __init__(self, sort):
+        self.keys = []
+        for item in sort or []:
+            if isinstance(item, str):
+                field, order = item, "asc"
+            else:
+                (field, order), = item.items()
+                if isinstance(order, dict):
+                    order = order.get("order", "asc")
+            if field == "_score":
+                continue
+            self.keys.append((field, order == "desc"))
+
+    def __bool__(self):
+        return bool(self.keys)
+
+    def values(self, index_name, seq, dates, doc):
+        """Sort values of one row; `dates` maps date column -> epoch millis"""
+        values = []
+        for field, _ in self.keys:
+            if field in ("_shard_doc", "_doc"):
+                values.append([index_name, seq])
+            elif field in DATE_COLUMNS:
+                values.append(dates[DATE_COLUMNS[field]])
+            else:
+                found = field_values(doc, field)
+                values.append(found[0] if found else None)
+        return values
+
+    def sort(self, hits):
+        """Sort (values, ...) tuples in place; missing values always go last"""
+        for position in reversed(range(len(self.keys))):
+            descending = self.keys[position][1]
+            present, missing = (1, 0) if descending else (0, 1)
+
+            def key(hit, position=position, present=present, missing=missing):
+                value = hit[0][position]
+                return (missing,) if value is None else (present, value)
+            hits.sort(key=key, reverse=descending)
+
+    def after(self, values, marker):
+        """Whether a hit with these sort values comes after search_after `marker`"""
+        for (field, descending), value, mark in zip(self.keys, values, marker):
+            if value == mark:
+                continue
+            if value is None:
+                return True
+            if mark is None:
+                return False
+            return value < mark if descending else value > mark
+        return False
+
+    def sql_order(self):
+        """ORDER BY for sorts SQLite can do itself (date columns plus tiebreaker), else None"""
+        terms = []
+        for position, (field, descending) in enumerate(self.keys):
+            direction = "DESC" if descending else "ASC"
+            if field in DATE_COLUMNS and position == 0:
+                # NULLs sort first in SQLite; ES puts missing values last
+                column = DATE_COLUMNS[field]
+                terms.append(f"{column} DESC" if descending else f"{column} ASC NULLS LAST")
+            elif field in ("_shard_doc", "_doc") and position == len(self.keys) - 1:
+                terms.append(f"seq {direction}")
+            else:
+                return None
+        return ", ".join(terms)
+
+
+class LocalIndices:
+    """The indices.* calls IndexManager makes, against the local store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def put_index_template(self, name, **body):
+        self.store.write(
+            "INSERT OR REPLACE INTO templates (name, body) VALUES (?, ?)",
+            (name, json.dumps(body, default=str))
+        )
+        return {"acknowledged": True}
+
+    def put_settings(self, index=None, settings=None, **kwargs):
+        # Only the ingest pipeline is set on live indices, and the store
+        # stamps indexed_at itself
+        return {"acknowledged": True}
+
+    def put_mapping(self, index=None, **kwargs):
+        return {"acknowledged": True}
+
+    def create(self, index, **kwargs):
+        self.store.ensure_index(index)
+        return {"acknowledged": True, "index": index}
+
+    def exists(self, index, **kwargs):
+        return bool(self.store.resolve(index))
+
+    def get(self, index, allow_no_indices=True, **kwargs):
+        names = self.store.resolve(index)
+        if not names and not allow_no_indices:
+            raise NotFoundError(f"no such index [{index}]")
+        return {name: {"aliases": {}, "mappings": {}, "settings": {}} for name in names}
+
+    def stats(self, index=None, metric=None, **kwargs):
+        names = self.store.resolve(index)
+        if index and not names:
+            raise NotFoundError(f"no such index [{index}]")
+
+        docs = size = 0
+        for name in names:
+            count, length = self.store.read(
+                f"SELECT COUNT(*), COALESCE(SUM(LENGTH(source)), 0) FROM {self.store.table(name)}"
+            ).fetchone()
+            docs += count
+            size += length
+        totals = {"docs": {"count": docs}, "store": {"size_in_bytes": size}}
+        return {"_all": {"primaries": totals, "total": totals}}
+
+    def delete(self, index, **kwargs):
+        for name in self.store.resolve(index):
+            self.store.drop_index(name)
+        return {"acknowledged": True}
+
+    def refresh(self, index=None, **kwargs):
+        return {"_shards": {"failed": 0}}
+
+
+class LocalIngest:
+    """ingest.put_pipeline for IndexManager; the only pipeline it installs is done by the store"""
+
+    def put_pipeline(self, id, **body):
+        return {"acknowledged": True}
+
+
+class LocalStore:
+    """Embedded SQLite backend answering the subset of the Elasticsearch API this tool uses
+
+    Every index (so every daily partition) is its own table holding the JSON
+    source plus indexed columns for the timestamps, IP fields, log type,
+    severity and rule name, and the time the row was written (indexed_at,
+    which the Elasticsearch ingest pipeline adds to the source instead).
+    Index patterns resolve to tables, so queries are
+    pruned by day exactly as they are in ES, and retention drops a table.
+    Filters on the indexed columns, counts, date-sorted pages and simple
+    terms/date_histogram aggregations run in SQLite; anything else is
+    evaluated in Python over the rows that pass the SQL part.
+
+    Supports bulk (index/create/update/delete), index, get, search (query,
+    sort, search_after, point-in-time, _source, aggregations), count,
+    indices.* and ping. Meant for small single-node deployments, offline
+    benchmarks and tests.
+    """
+
+    def __init__(self, path, readers=READERS):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # One writer plus at most `readers` reader connections, however many
+        # threads (e.g. a threaded Flask server) share the store
+        self._connections = []
+        self._writer = None
+        self._idle = []
+        self._readers = threading.BoundedSemaphore(readers)
+        self._write_lock = threading.RLock()
+        self._known = set()
+        self._pits = {}
+        self._pit_lock = threading.Lock()
+        # Bumped by every write transaction; a PIT sees the superseded rows
+        # kept in an index's history table that were replaced after it opened
+        self._version = 0
+        self._history = set()
+        # Epoch millis of the current write transaction, never decreasing
+        self._indexed_at = 0
+        self.indices = LocalIndices(self)
+        self.ingest = LocalIngest()
+
+        # An in-memory database exists per connection, so it gets exactly one
+        self._shared = self._connect() if path == ":memory:" else None
+
+        self.write(
+            "CREATE TABLE IF NOT EXISTS catalog (name TEXT PRIMARY KEY, created REAL)"
+        )
+        self.write(
+            "CREATE TABLE IF NOT EXISTS templates (name TEXT PRIMARY KEY, body TEXT)"
+        )
+        self._migrate()
+
+    # --- connections --------------------------------------------------------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._connections.append(conn)
+        return conn
+
+    def _conn(self):
+        """The writer connection; only used under _write_lock"""
+        if self._shared is not None:
+            return self._shared
+        if self._writer is None:
+            self._writer = self._connect()
+        return self._writer
+
+    def read(self, sql, params=()):
+        if self._shared is not None:
+            with self._write_lock:
+                return ListCursor(self._shared.execute(sql, params).fetchall())
+        # Rows are fetched before the connection goes back to the pool
+        with self._readers:
+            try:
+                conn = self._idle.pop()
+            except IndexError:
+                conn = self._connect()
+            try:
+                return ListCursor(conn.execute(sql, params).fetchall())
+            finally:
+                self._idle.append(conn)
+
+    def write(self, sql, params=()):
+        with self._write_lock:
+            return self._conn().execute(sql, params)
+
+    def close(self):
+        with self._write_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+            self._writer = None
+            self._idle = []
+
+    def ping(self, **kwargs):
+        return True
+
+    def info(self, **kwargs):
+        return {"name": "local", "version": {"number": "local", "sqlite": sqlite3.sqlite_version}}
+
+    # --- catalog ------------------------------------------------------------
+
+    @staticmethod
+    def table(name):
+        return '"' + (TABLE_PREFIX + name).replace('"', '""') + '"'
+
+    def index_names(self):
+        return [row[0] for row in self.read("SELECT name FROM catalog ORDER BY name")]
+
+    def resolve(self, index):
+        """Index names matching a comma-separated list of names and wildcard patterns"""
+        names = self.index_names()
+        if not index or index in ("_all", "*"):
+            return names
+
+        patterns = index.split(",") if isinstance(index, str) else list(index)
+        return [name for name in names if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+
+    def ensure_index(self, name):
+        if name in self._known:
+            return
+        table = self.table(name)
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, ts INTEGER, ingest_ts INTEGER, "
+                    "indexed_ts INTEGER, "
+                    + ", ".join(f"{column} TEXT" for column in KEYWORD_COLUMNS)
+                    + ", source TEXT NOT NULL)"
+                )
+                for column in INDEXED_COLUMNS:
+                    index_name = self.table(f"{name}:{column}")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})")
+                conn.execute("INSERT OR IGNORE INTO catalog (name, created) VALUES (?, ?)",
+                             (name, time.time()))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._known.add(name)
+
+    def ensure_history(self, name):
+        """Table keeping the versions of an index's rows that open PITs still see"""
+        if name in self._history:
+            return
+        with self._write_lock:
+            self._conn().execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table(name + ':history')} ("
+                "seq INTEGER, id TEXT, ts INTEGER, ingest_ts INTEGER, indexed_ts INTEGER, "
+                + ", ".join(f"{column} TEXT" for column in KEYWORD_COLUMNS)
+                + ", source TEXT NOT NULL, replaced INTEGER)"
+            )
+            self._add_indexed_ts(self._conn(), self.table(name + ':history'))
+            self._history.add(name)
+
+    @staticmethod
+    def _add_indexed_ts(conn, table):
+        # Tables from before indexed_at existed; their rows keep it NULL
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "indexed_ts" in columns:
+            return False
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN indexed_ts INTEGER")
+        return True
+
+    def _migrate(self):
+        """Bring partitions written by older versions up to the current columns"""
+        with self._write_lock:
+            conn = self._conn()
+            for name, in conn.execute("SELECT name FROM catalog").fetchall():
+                table = self.table(name)
+                if self._add_indexed_ts(conn, table):
+                    index_name = self.table(f"{name}:indexed_ts")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} (indexed_ts)")
+
+    def drop_index(self, name):
+        with self._write_lock:
+            self._conn().execute(f"DROP TABLE IF EXISTS {self.table(name)}")
+            self._conn().execute(f"DROP TABLE IF EXISTS {self.table(name + ':history')}")
+            self._conn().execute("DELETE FROM catalog WHERE name = ?", (name,))
+            self._known.discard(name)
+            self._history.discard(name)
+
+    # --- writes -------------------------------------------------------------
+
+    @staticmethod
+    def new_id():
+        return os.urandom(10).hex()
+
+    @staticmethod
+    def row(doc_id, doc, text, dates=None):
+        """Column values for one document; `dates` caches parsed date strings within a bulk"""
+        dates = {} if dates is None else dates
+        ts = doc.get("timestamp_ms")
+        if not isinstance(ts, int):
+            value = doc.get("timestamp")
+            ts = dates.get(value) if isinstance(value, str) else None
+            if ts is None:
+                ts = epoch_ms(value)
+                if isinstance(value, str):
+                    dates[value] = ts
+
+        # One batch shares a single ingest timestamp
+        ingest = doc.get("ingest_timestamp")
+        ingest_ts = dates.get(ingest) if isinstance(ingest, str) else None
+        if ingest_ts is None:
+            ingest_ts = epoch_ms(ingest)
+            if isinstance(ingest, str):
+                dates[ingest] = ingest_ts
+
+        keywords = []
+        for column in KEYWORD_COLUMNS:
+            value = doc.get(column)
+            keywords.append(value if isinstance(value, (str, int, float)) else None)
+        return (doc_id, ts, ingest_ts, *keywords, text)
+
+    def _insert(self, conn, name, rows, replace=True):
+        verb = "INSERT OR REPLACE" if replace else "INSERT"
+        if replace:
+            self._keep_versions(conn, name, [row[0] for row in rows])
+        conn.executemany(
+            f"{verb} INTO {self.table(name)} (id, ts, ingest_ts, {', '.join(KEYWORD_COLUMNS)}, source, indexed_ts) "
+            f"VALUES ({', '.join('?' * (len(KEYWORD_COLUMNS) + 4))}, {self._indexed_at})",
+            rows
+        )
+
+    def _keep_versions(self, conn, name, doc_ids):
+        """Copy rows about to be replaced or deleted to history if an open PIT can see them"""
+        now = time.monotonic()
+        with self._pit_lock:
+            horizon = max([pit["snapshot"][name][0] for pit in self._pits.values()
+                           if name in pit["snapshot"] and pit["expires"] >= now], default=0)
+        if not horizon:
+            return
+        conn.executemany(
+            f"INSERT INTO {self.table(name + ':history')} ({ROW_COLUMNS}, replaced) SELECT {ROW_COLUMNS}, ? "
+            f"FROM {self.table(name)} WHERE id = ? AND seq <= ?",
+            [(self._version, doc_id, horizon) for doc_id in doc_ids]
+        )
+
+    def _get_source(self, conn, name, doc_id):
+        row = conn.execute(f"SELECT source FROM {self.table(name)} WHERE id = ?", (doc_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def bulk(self, operations=None, body=None, index=None, **kwargs):
+        """Apply bulk actions in one transaction; mirrors the ES response shape"""
+        operations = iter(operations if operations is not None else body)
+        actions = []
+        # Action lines repeat (same index, no id) across a batch
+        parsed_actions = {}
+        for action in operations:
+            if isinstance(action, (str, bytes)):
+                parsed = parsed_actions.get(action)
+                if parsed is None:
+                    parsed = parsed_actions[action] = json.loads(action)
+                action = parsed
+            (op, meta), = action.items()
+            meta = dict(meta)
+            meta.setdefault("_index", index)
+            if op == "delete":
+                actions.append((op, meta, None, None))
+                continue
+            source = next(operations)
+            text = source if isinstance(source, str) else (
+                source.decode("utf-8") if isinstance(source, bytes) else json.dumps(source, default=str)
+            )
+            doc = json.loads(text) if not isinstance(source, dict) else source
+            actions.append((op, meta, doc, text))
+
+        for name in {meta["_index"] for _, meta, _, _ in actions}:
+            self.ensure_index(name)
+
+        items = []
+        errors = False
+        with self._write_lock:
+            self._version += 1
+            self._indexed_at = max(self._indexed_at, int(time.time() * 1000))
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = {}
+                dates = {}
+                for op, meta, doc, text in actions:
+                    name = meta["_index"]
+                    doc_id = meta.get("_id")
+                    status, result = self._apply(conn, pending, dates, op, name, doc_id, doc, text)
+                    if status >= 300:
+                        errors = True
+                        items.append({op: {"_index": name, "_id": doc_id, "status": status,
+                                           "error": {"type": result}}})
+                    else:
+                        items.append({op: {"_index": name, "_id": result[0], "status": status,
+                                           "result": result[1]}})
+                for name, rows in pending.items():
+                    self._insert(conn, name, rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return {"took": 0, "errors": errors, "items": items}
+
+    def _apply(self, conn, pending, dates, op, name, doc_id, doc, text):
+        # Plain index actions are batched into one executemany; anything that
+        # reads existing documents flushes that batch first
+        if op == "index":
+            doc_id = doc_id or self.new_id()
+            pending.setdefault(name, []).append(self.row(doc_id, doc, text, dates))
+            return 201, (doc_id, "created")
+
+        rows = pending.pop(name, None)
+        if rows:
+            self._insert(conn, name, rows)
+
+        if op == "create":
+            doc_id = doc_id or self.new_id()
+            if self._get_source(conn, name, doc_id) is not None:
+                return 409, "version_conflict_engine_exception"
+            self._insert(conn, name, [self.row(doc_id, doc, text)])
+            return 201, (doc_id, "created")
+
+        if op == "delete":
+            self._keep_versions(conn, name, [doc_id])
+            deleted = conn.execute(f"DELETE FROM {self.table(name)} WHERE id = ?", (doc_id,)).rowcount
+            return (200, (doc_id, "deleted")) if deleted else (404, "not_found")
+
+        if op == "update":
+            existing = self._get_source(conn, name, doc_id)
+            if existing is None:
+                if doc.get("doc_as_upsert"):
+                    merged = doc.get("doc", {})
+                elif "upsert" in doc:
+                    merged = doc["upsert"]
+                else:
+                    return 404, "document_missing_exception"
+                result = "created"
+            else:
+                if "doc" not in doc:
+                    return 400, "script updates are not supported by the local store"
+                merged = dict(existing, **doc["doc"])
+                result = "updated"
+            self._insert(conn, name, [self.row(doc_id, merged, json.dumps(merged, default=str))])
+            return (201 if result == "created" else 200), (doc_id, result)
+
+        return 400, f"unsupported bulk action {op}"
+
+    def index(self, index, document=None, body=None, id=None, **kwargs):
+        response = self.bulk([{"index": {"_index": index, "_id": id}}, document if document is not None else body])
+        item = response["items"][0]["index"]
+        return {"_index": index, "_id": item["_id"], "result": item.get("result", "created")}
+
+    # --- reads --------------------------------------------------------------
+
+    def get(self, index, id, source_includes=None, source_excludes=None, _source=None, **kwargs):
+        for name in self.resolve(index):
+            row = self.read(f"SELECT source, indexed_ts FROM {self.table(name)} WHERE id = ?", (id,)).fetchone()
+            if row is not None:
+                source = _source
+                if source_includes or source_excludes:
+                    source = {"includes": source_includes or [], "excludes": source_excludes or []}
+                return {"_index": name, "_id": id, "found": True,
+                        "_source": project_source(self._source(*row), source)}
+        raise NotFoundError(f"document [{id}] not found in [{index}]")
+
+    def open_point_in_time(self, index, keep_alive="1m", **kwargs):
+        """Freeze the current rows of the matching indices for consistent paging
+
+        The snapshot is {index: (highest seq, write version)}: rows added
+        later have a higher seq, and the rows replaced or deleted later are
+        read back from the index's history table.
+        """
+        now = time.monotonic()
+        snapshot = {}
+        names = self.resolve(index)
+        for name in names:
+            self.ensure_history(name)
+        with self._write_lock:
+            for name in names:
+                seq = self.read(f"SELECT COALESCE(MAX(seq), 0) FROM {self.table(name)}").fetchone()[0]
+                snapshot[name] = (seq, self._version)
+
+            pit_id = self.new_id()
+            with self._pit_lock:
+                self._pits[pit_id] = {"snapshot": snapshot, "expires": now + duration_seconds(keep_alive)}
+        self._prune_history()
+        return {"id": pit_id}
+
+    def close_point_in_time(self, id=None, body=None, **kwargs):
+        pit_id = id or (body or {}).get("id")
+        with self._pit_lock:
+            found = self._pits.pop(pit_id, None) is not None
+        self._prune_history()
+        return {"succeeded": True, "num_freed": int(found)}
+
+    def _prune_history(self):
+        """Drop expired PITs, and the kept versions no remaining PIT can see"""
+        now = time.monotonic()
+        with self._write_lock:
+            with self._pit_lock:
+                for expired in [key for key, pit in self._pits.items() if pit["expires"] < now]:
+                    del self._pits[expired]
+                oldest = {}
+                for pit in self._pits.values():
+                    for name, (_, version) in pit["snapshot"].items():
+                        oldest[name] = min(version, oldest.get(name, version))
+            for name in self._history:
+                self._conn().execute(f"DELETE FROM {self.table(name + ':history')} WHERE replaced <= ?",
+                                     (oldest.get(name, self._version),))
+
+    def count(self, index=None, body=None, query=None, **kwargs):
+        body = dict(body or {})
+        if query is not None:
+            body["query"] = query
+        body.update(size=0, track_total_hits=True)
+        return {"count": self.search(index=index, body=body)["hits"]["total"]["value"]}
+
+    def search(self, index=None, body=None, **kwargs):
+        body = dict(body or {})
+        for key in ("query", "size", "from_", "sort", "aggs", "aggregations", "search_after",
+                    "pit", "track_total_hits", "_source", "source"):
+            if key in kwargs:
+                body[key.rstrip("_") if key == "from_" else key] = kwargs[key]
+        if "source" in body and "_source" not in body:
+            body["_source"] = body.pop("source")
+
+        started = time.perf_counter()
+        now = utc_now()
+        pit = body.get("pit")
+        if pit:
+            with self._pit_lock:
+                state = self._pits.get(pit["id"])
+                if state is None:
+                    raise NotFoundError(f"point in time [{pit['id']}] not found or expired")
+                state["expires"] = time.monotonic() + duration_seconds(pit.get("keep_alive"))
+            snapshot = state["snapshot"]
+            names = [name for name in snapshot if name in set(self.index_names())]
+        else:
+            snapshot = None
+            names = self.resolve(index)
+
+        query = Query(body.get("query"), now)
+        size = int(body.get("size", 10))
+        offset = int(body.get("from", 0))
+        sort = SortSpec(body.get("sort"))
+        search_after = body.get("search_after")
+        aggs = body.get("aggs") or body.get("aggregations")
+
+        response = {"took": 0, "timed_out": False, "hits": {"total": {"value": 0, "relation": "eq"},
+                                                            "max_score": None, "hits": []}}
+        if pit:
+            response["pit_id"] = pit["id"]
+
+        total, hits, docs = self._execute(names, snapshot, query, size, offset, sort, search_after,
+                                          aggs, body.get("track_total_hits"))
+        response["hits"]["total"] = total
+        response["hits"]["hits"] = [
+            self._hit(hit, sort, body.get("_source")) for hit in hits
+        ]
+        if aggs:
+            pushed = self._sql_aggregations(names, snapshot, query, aggs) if docs is None else None
+            response["aggregations"] = pushed if pushed is not None else Aggregations(now).run(aggs, docs)[0]
+
+        response["took"] = int((time.perf_counter() - started) * 1000)
+        return response
+
+    def _hit(self, hit, sort, source):
+        values, name, seq, doc_id, doc = hit
+        result = {"_index": name, "_id": doc_id, "_score": None, "_source": project_source(doc, source)}
+        if sort:
+            result["sort"] = values
+        return result
+
+    def _where(self, query, snapshot, name):
+        where = query.where()
+        params = list(query.params)
+        if snapshot is not None:
+            where += " AND seq <= ?"
+            params.append(snapshot.get(name, (0, 0))[0])
+        return where, params
+
+    def _rows(self, snapshot, name):
+        """What to select an index's rows from: its table, or with a PIT also the versions it still sees"""
+        if snapshot is None or name not in self._history:
+            return self.table(name)
+        version = int(snapshot.get(name, (0, 0))[1])
+        return (f"(SELECT {ROW_COLUMNS} FROM {self.table(name)} UNION ALL "
+                f"SELECT {ROW_COLUMNS} FROM {self.table(name + ':history')} WHERE replaced > {version})")
+
+    @staticmethod
+    def _source(source, indexed_ts):
+        """Stored source plus indexed_at, as the ES ingest pipeline would have written it"""
+        doc = json.loads(source)
+        if indexed_ts is not None:
+            doc["indexed_at"] = iso_utc(indexed_ts)
+        return doc
+
+    def _execute(self, names, snapshot, query, size, offset, sort, search_after, aggs, track_total_hits):
+        """(total, hits, docs); docs is None when no Python-side document list was built"""
+        wanted = offset + size
+
+        # Count only (plus aggregations SQLite can answer on its own)
+        if query.exact and size == 0 and (not aggs or self._sql_aggregations_supported(aggs)):
+            total = 0
+            for name in names:
+                where, params = self._where(query, snapshot, name)
+                total += self.read(f"SELECT COUNT(*) FROM {self._rows(snapshot, name)} WHERE {where}", params).fetchone()[0]
+            return {"value": total, "relation": "eq"}, [], None
+
+        # Date-sorted page straight from the indexes
+        order = sort.sql_order() if sort else None
+        if query.exact and order is not None and not (search_after and None in search_after) and (
+                not aggs or self._sql_aggregations_supported(aggs)):
+            hits = []
+            for name in names:
+                where, params = self._where(query, snapshot, name)
+                if search_after:
+                    where, params = self._after_sql(where, params, name, sort, search_after)
+                rows = self.read(
+                    f"SELECT seq, id, ts, ingest_ts, indexed_ts, source FROM {self._rows(snapshot, name)} "
+                    f"WHERE {where} ORDER BY {order} LIMIT ?", params + [wanted]
+                ).fetchall()
+                for seq, doc_id, ts, ingest_ts, indexed_ts, source in rows:
+                    doc = self._source(source, indexed_ts)
+                    dates = {"ts": ts, "ingest_ts": ingest_ts, "indexed_ts": indexed_ts}
+                    hits.append((sort.values(name, seq, dates, doc), name, seq, doc_id, doc))
+            sort.sort(hits)
+            hits = hits[offset:wanted]
+
+            total = {"value": len(hits), "relation": "gte"}
+            if track_total_hits:
+                total = self._execute(names, snapshot, query, 0, 0, SortSpec(None), None, None, True)[0]
+            return total, hits, None
+
+        # General case: SQL narrows, Python decides, sorts and aggregates
+        hits = []
+        for name in names:
+            where, params = self._where(query, snapshot, name)
+            rows = self.read(
+                f"SELECT seq, id, ts, ingest_ts, indexed_ts, source FROM {self._rows(snapshot, name)} "
+                f"WHERE {where} ORDER BY seq",
+                params
+            )
+            for seq, doc_id, ts, ingest_ts, indexed_ts, source in rows:
+                doc = self._source(source, indexed_ts)
+                if query.exact or query.matches(doc):
+                    dates = {"ts": ts, "ingest_ts": ingest_ts, "indexed_ts": indexed_ts}
+                    hits.append((sort.values(name, seq, dates, doc), name, seq, doc_id, doc))
+
+        docs = [hit[4] for hit in hits]
+        total = {"value": len(hits), "relation": "eq"}
+        if sort:
+            sort.sort(hits)
+            if search_after:
+                hits = [hit for hit in hits if sort.after(hit[0], search_after)]
+        return total, hits[offset:wanted], docs
+
+    @staticmethod
+    def _after_sql(where, params, name, sort, search_after):
+        # Sort keys here are a date column, optionally followed by the tiebreaker
+        (field, descending), = sort.keys[:1]
+        column = DATE_COLUMNS[field]
+        mark = search_after[0]
+        beyond = "<" if descending else ">"
+
+        if len(sort.keys) == 1:
+            return f"{where} AND {column} {beyond} ?", params + [mark]
+
+        mark_name, mark_seq = search_after[1]
+        tiebreak_descending = sort.keys[1][1]
+        if name == mark_name:
+            clause = f"({column} {beyond} ? OR ({column} = ? AND seq {'<' if tiebreak_descending else '>'} ?))"
+            return f"{where} AND {clause}", params + [mark, mark, mark_seq]
+
+        # Ties with the marker's timestamp continue into tables on the far side of it
+        tie_follows = name < mark_name if tiebreak_descending else name > mark_name
+        op = f"{beyond}=" if tie_follows else beyond
+        return f"{where} AND {column} {op} ?", params + [mark]
+
+    # --- aggregations in SQL -----------------------------------------------
+
+    @staticmethod
+    def _sql_aggregations_supported(aggs):
+        for spec in aggs.values():
+            if spec.get("aggs") or spec.get("aggregations"):
+                return False
+            if "terms" in spec:
+                field = spec["terms"].get("field", "")
+                if field not in KEYWORD_COLUMNS or "order" in spec["terms"]:
+                    return False
+            elif "date_histogram" in spec:
+                field = spec["date_histogram"].get("field")
+                if field not in DATE_COLUMNS or Aggregations.interval_ms(spec["date_histogram"]) is None:
+                    return False
+            elif "cardinality" in spec:
+                if spec["cardinality"].get("field") not in KEYWORD_COLUMNS:
+                    return False
+            else:
+                return False
+        return True
+
+    def _sql_aggregations(self, names, snapshot, query, aggs):
+        if not query.exact or not self._sql_aggregations_supported(aggs):
+            return None
+
+        result = {}
+        for agg_name, spec in aggs.items():
+            if "cardinality" in spec:
+                column = spec["cardinality"]["field"]
+                values = set()
+                for name in names:
+                    where, params = self._where(query, snapshot, name)
+                    values.update(row[0] for row in self.read(
+                        f"SELECT DISTINCT {column} FROM {self._rows(snapshot, name)} "
+                        f"WHERE {where} AND {column} IS NOT NULL", params))
+                result[agg_name] = {"value": len(values)}
+                continue
+
+            if "terms" in spec:
+                settings = spec["terms"]
+                expression = settings["field"]
+            else:
+                settings = spec["date_histogram"]
+                interval = Aggregations.interval_ms(settings)
+                column = DATE_COLUMNS[settings["field"]]
+                expression = f"({column} - ({column} % {interval}))"
+
+            counts = {}
+            for name in names:
+                where, params = self._where(query, snapshot, name)
+                for key, count in self.read(
+                        f"SELECT {expression}, COUNT(*) FROM {self._rows(snapshot, name)} "
+                        f"WHERE {where} AND {expression} IS NOT NULL GROUP BY 1", params):
+                    counts[key] = counts.get(key, 0) + count
+
+            if "terms" in spec:
+                result[agg_name] = Aggregations.terms_buckets(
+                    [({"key": key, "doc_count": count}, key) for key, count in counts.items()],
+                    settings, sum(counts.values())
+                )
+            else:
+                result[agg_name] = {"buckets": Aggregations.histogram_buckets(
+                    [({"key": key, "doc_count": count}, key) for key, count in counts.items()],
+                    interval, settings.get("min_doc_count", 0)
+                )}
+        return result
+
+
+class ListCursor:
+    """Materialized rows with the cursor methods callers use"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class Aggregations:
+    """The aggregations the dashboard and detector use, over decoded documents"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def run(self, aggs, docs):
+        result = {}
+        selectors = {}
+        for name, spec in aggs.items():
+            if "bucket_selector" in spec:
+                selectors[name] = spec["bucket_selector"]
+                continue
+            sub = spec.get("aggs") or spec.get("aggregations") or {}
+            kinds = [key for key in spec if key not in ("aggs", "aggregations", "meta")]
+            if len(kinds) != 1 or not hasattr(self, f"agg_{kinds[0]}"):
+                raise ValueError(f"Unsupported aggregation: {kinds}")
+            result[name] = getattr(self, f"agg_{kinds[0]}")(spec[kinds[0]], docs, sub)
+        return result, selectors
+
+    def run_buckets(self, groups, sub):
+        """[(bucket, key)] with sub-aggregations filled in and bucket selectors applied"""
+        buckets = []
+        for key, (bucket, members) in groups.items():
+            if sub:
+                results, selectors = self.run(sub, members)
+                bucket.update(results)
+                if not all(self.select(bucket, selector) for selector in selectors.values()):
+                    continue
+            buckets.append((bucket, key))
+        return buckets
+
+    @staticmethod
+    def select(bucket, selector):
+        script = selector.get("script")
+        if isinstance(script, dict):
+            script = script.get("source", "")
+        match = SELECTOR_SCRIPT.match(script or "")
+        if not match:
+            raise ValueError(f"Unsupported bucket_selector script: {script}")
+
+        variable, op, number = match.groups()
+        path = selector.get("buckets_path", {}).get(variable, variable)
+        if path == "_count":
+            value = bucket["doc_count"]
+        else:
+            value = bucket.get(path.split(".")[0], {}).get("value")
+        return value is not None and COMPARISONS[op](value, float(number))
+
+    @staticmethod
+    def terms_buckets(buckets, settings, total):
+        minimum = settings.get("min_doc_count", 1)
+        size = settings.get("size", 10)
+        order = settings.get("order", {"_count": "desc"})
+        if isinstance(order, list):
+            order = order[0] if order else {"_count": "desc"}
+        (order_key, direction), = order.items()
+
+        buckets = [(bucket, key) for bucket, key in buckets if bucket["doc_count"] >= minimum]
+        buckets.sort(key=lambda item: term_key(item[0]["key"]))
+        if order_key == "_key":
+            buckets.sort(key=lambda item: term_key(item[0]["key"]), reverse=direction == "desc")
+        else:
+            buckets.sort(key=lambda item: item[0]["doc_count"], reverse=direction == "desc")
+
+        kept = [bucket for bucket, _ in buckets[:size]]
+        return {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": total - sum(bucket["doc_count"] for bucket in kept),
+            "buckets": kept
+        }
+
+    @staticmethod
+    def interval_ms(settings):
+        interval = settings.get("fixed_interval") or settings.get("calendar_interval") or settings.get("interval")
+        if interval in CALENDAR_INTERVALS:
+            return CALENDAR_INTERVALS[interval] * 1000
+        match = DURATION.match(str(interval or ""))
+        if match is None:
+            match = re.match(r"^1([smhdw])$", str(interval or ""))
+            return {"w": 604800000}.get(match.group(1)) if match else None
+        return int(match.group(1)) * DURATION_UNITS[match.group(2)] * 1000
+
+    @staticmethod
+    def histogram_buckets(buckets, interval, min_doc_count=0):
+        buckets = sorted(buckets, key=lambda item: item[1])
+        if min_doc_count == 0 and buckets and (buckets[-1][1] - buckets[0][1]) // interval < 100000:
+            # ES fills the gaps between the first and last bucket with empty ones
+            present = {key: bucket for bucket, key in buckets}
+            buckets = [
+                (present.get(key) or {"key": key, "doc_count": 0}, key)
+                for key in range(buckets[0][1], buckets[-1][1] + interval, interval)
+            ]
+        result = []
+        for bucket, key in buckets:
+            if bucket["doc_count"] >= min_doc_count:
+                bucket["key_as_string"] = iso_utc(key)
+                result.append(bucket)
+        return result
+
+    def agg_terms(self, settings, docs, sub):
+        field = settings["field"]
+        groups = {}
+        for doc in docs:
+            for key, value in {term_key(v): v for v in field_values(doc, field)}.items():
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = ({"key": value, "doc_count": 0}, [])
+                group[0]["doc_count"] += 1
+                group[1].append(doc)
+        return self.terms_buckets(self.run_buckets(groups, sub), settings, len(docs))
+
+    def agg_multi_terms(self, settings, docs, sub):
+        fields = [term["field"] for term in settings["terms"]]
+        groups = {}
+        for doc in docs:
+            values = [field_values(doc, field) for field in fields]
+            if not all(values):
+                continue
+            key = tuple(value[0] for value in values)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = ({"key": list(key), "key_as_string": "|".join(map(term_key, key)),
+                                        "doc_count": 0}, [])
+            group[0]["doc_count"] += 1
+            group[1].append(doc)
+        return self.terms_buckets(self.run_buckets(groups, sub), settings, len(docs))
+
+    def agg_date_histogram(self, settings, docs, sub):
+        interval = self.interval_ms(settings)
+        if interval is None:
+            raise ValueError(f"Unsupported date_histogram interval: {settings}")
+        groups = {}
+        for doc in docs:
+            for value in field_values(doc, settings["field"]):
+                ms = epoch_ms(value)
+                if ms is None:
+                    continue
+                key = ms - ms % interval
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = ({"key": key, "doc_count": 0}, [])
+                group[0]["doc_count"] += 1
+                group[1].append(doc)
+        buckets = self.run_buckets(groups, sub)
+        return {"buckets": self.histogram_buckets(buckets, interval, settings.get("min_doc_count", 0))}
+
+    def agg_filter(self, settings, docs, sub):
+        query = Query(settings, self.now)
+        members = [doc for doc in docs if query.matches(doc)]
+        result = {"doc_count": len(members)}
+        if sub:
+            result.update(self.run(sub, members)[0])
+        return result
+
+    def agg_cardinality(self, settings, docs, sub):
+        return {"value": len({term_key(v) for doc in docs for v in field_values(doc, settings["field"])})}
+
+    def _numbers(self, settings, docs):
+        numbers = []
+        for doc in docs:
+            for value in field_values(doc, settings["field"]):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numbers.append(value)
+        return numbers
+
+    def agg_value_count(self, settings, docs, sub):
+        return {"value": sum(len(field_values(doc, settings["field"])) for doc in docs)}
+
+    def agg_min(self, settings, docs, sub):
+        numbers = self._numbers(settings, docs)
+        return {"value": min(numbers) if numbers else None}
+
+    def agg_max(self, settings, docs, sub):
+        numbers = self._numbers(settings, docs)
+        return {"value": max(numbers) if numbers else None}
+
+    def agg_sum(self, settings, docs, sub):
+        return {"value": sum(self._numbers(settings, docs))}
+
+    def agg_avg(self, settings, docs, sub):
+        numbers = self._numbers(settings, docs)
+        return {"value": sum(numbers) / len(numbers) if numbers else None}
@@ -3,75 +3,184 @@
 import os
 import time
 import json
-from datetime import datetime
+import threading
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from elasticsearch import Elasticsearch
+
+from src.bulk_indexer import BulkIndexer
+from src.index_manager import IndexManager
+from src.log_parser import LogParser
+from src.network_input import start_network_inputs
+from src.parse_pool import create_parser
+from src.pipeline import IngestPipeline
+from src.spool import Spool, SpoolDrainer
+from src.storage import get_client
+from src.tailer import CheckpointStore, FileTailer
+from src.threat_intel import ThreatIntel
 
 
 # Project base directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+DEFAULT_CHECKPOINT_PATH = os.path.join("data", "checkpoints.json")
+
+
+def source_path(source):
+    """Absolute path of a log_sources entry; relative paths are under the project root"""
+    log_path = source["path"]
+    if not os.path.isabs(log_path):
+        log_path = os.path.join(BASE_DIR, log_path)
+    return log_path
+
+
+def restart_sections(old, new):
+    """Top-level config sections besides log_sources that differ (they need a restart)"""
+    return sorted(key for key in set(old) | set(new)
+                  if key != "log_sources" and old.get(key) != new.get(key))
+
 
 class LogFileHandler(FileSystemEventHandler):
 
-    def __init__(self, es_client, index_prefix):
+    def __init__(self, es_client, index_prefix, indexer=None, checkpoints=None,
+                 start_position="beginning", chunk_size=64 * 1024, pipeline=None):
         self.es_client = es_client
         self.index_prefix = index_prefix
-        self.last_position = {}
+        self.indexer = indexer or BulkIndexer(es_client)
+        self.pipeline = pipeline or IngestPipeline(self.indexer, LogParser(), index_prefix)
+        self.checkpoints = checkpoints or CheckpointStore(
+            os.path.join(BASE_DIR, DEFAULT_CHECKPOINT_PATH)
+        )
+        self.start_position = start_position
+        self.chunk_size = chunk_size
+        self.tailers = {}
 
     def on_modified(self, event):
         if not event.is_directory:
-            print("📄 File changed:", event.src_path)
             self.process_log_file(event.src_path)
 
-    def process_log_file(self, file_path):
+    def on_created(self, event):
+        if not event.is_directory:
+            self.process_log_file(event.src_path)
 
-        try:
-            last_pos = self.last_position.get(file_path, 0)
+    def on_moved(self, event):
+        # The open handle still points at the renamed file; keep following it
+        # under its new name and let the next event pick up the replacement.
+        if not event.is_directory and event.src_path in self.tailers:
+            tailer = self.tailers.pop(event.src_path)
+            tailer.path = event.dest_path
+            self.tailers[event.dest_path] = tailer
+            self.process_log_file(event.dest_path)
+
+    def on_deleted(self, event):
+        tailer = self.tailers.pop(event.src_path, None)
+        if tailer is not None:
+            tailer.close()
+
+    def get_tailer(self, file_path):
+        tailer = self.tailers.get(file_path)
+
+        if tailer is None:
+            tailer = FileTailer(
+                file_path,
+                self.checkpoints,
+                chunk_size=self.chunk_size,
+                start_at_end=self.start_position == "end"
+            )
+            self.tailers[file_path] = tailer
 
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        return tailer
 
-                f.seek(last_pos)
-                new_lines = f.readlines()
+    def process_log_file(self, file_path):
 
-                self.last_position[file_path] = f.tell()
+        try:
+            tailer = self.get_tailer(file_path)
 
-                for line in new_lines:
-                    if line.strip():
-                        self.index_log_entry(file_path, line.strip())
+            for lines in tailer.read_batches():
+                self.pipeline.process_lines(file_path, lines, self.index_prefix)
+                tailer.commit()
 
         except Exception as e:
             print(f"❌ Error reading {file_path}: {e}")
 
-    def index_log_entry(self, file_path, log_line):
+    def catch_up(self, log_path, recursive=False):
+        """Read whatever was written while we were not running"""
+        if os.path.isfile(log_path):
+            self.process_log_file(log_path)
+            return
 
-        doc = {
-            "timestamp": datetime.now().isoformat(),
-            "source_file": file_path,
-            "raw_log": log_line,
-            "processed": False
-        }
+        for root, dirs, files in os.walk(log_path):
+            for name in sorted(files):
+                self.process_log_file(os.path.join(root, name))
 
-        index_name = f"{self.index_prefix}-{datetime.now().strftime('%Y.%m.%d')}"
+            if not recursive:
+                break
 
-        self.es_client.index(index=index_name, document=doc)
+    def close(self):
+        for tailer in self.tailers.values():
+            tailer.close()
+
+    def index_log_entry(self, file_path, log_line):
+        self.pipeline.process_lines(file_path, [log_line], self.index_prefix)
 
 
 class LogCollector:
 
-    def __init__(self, config_path="config/log_sources.json"):
+    def __init__(self, config_path="config/log_sources.json", parser=None):
 
+        self.config_path = os.path.join(BASE_DIR, config_path)
         self.config = self.load_config(config_path)
 
-        self.es_client = Elasticsearch(
-            "http://localhost:9200",
-            request_timeout=30
+        # Shared with the parser, detector and dashboard (see src/storage.py)
+        self.es_client = get_client(self.config.get("storage"))
+
+        spool_config = self.config.get("spool", {})
+        if spool_config.get("enabled"):
+            # Reads are acknowledged once spooled to disk; a drainer thread
+            # replays the spool into ES whenever it is reachable
+            self.spool = Spool.from_config(spool_config, BASE_DIR)
+            self.drainer = SpoolDrainer.from_config(self.es_client, self.spool, self.config.get("bulk"))
+            self.indexer = self.spool
+        else:
+            self.spool = self.drainer = None
+
+            # One shared indexer so every watched source feeds the same bulk batches
+            self.indexer = BulkIndexer.from_config(
+                self.es_client,
+                self.config.get("bulk")
+            )
+
+        # "inline" parses in the collector thread, "process" in a worker pool
+        self.parser = create_parser(self.config.get("parsing"), parser)
+
+        # Daily log partitions: templates, size rollover and retention
+        self.indices = IndexManager.from_config(self.es_client, self.config.get("indices"))
+        self.pipeline = IngestPipeline(self.indexer, self.parser, indices=self.indices)
+
+        # IP reputation tags are added before detection and indexing
+        self.threat_intel = ThreatIntel.from_config(self.config.get("threat_intel"), BASE_DIR)
+        if self.threat_intel is not None:
+            self.pipeline.add_enricher(self.threat_intel.enrich)
+
+        self.checkpoints = CheckpointStore(
+            os.path.join(BASE_DIR, self.config.get("checkpoint_path", DEFAULT_CHECKPOINT_PATH))
         )
 
         self.observer = Observer()
-        self.handlers = []
+        # log path -> (source entry, handler, watch); changed on config reload
+        self.sources = {}
+        self._sources_lock = threading.Lock()
+        self.listeners = []
+
+    def add_sink(self, sink):
+        self.pipeline.add_sink(sink)
+
+    def backfill(self, paths, workers=None):
+        """Index historical files (plain, .gz, .bz2, .xz) in parallel; resumable per file"""
+        from src.backfill import Backfill
+
+        options = {"workers": workers} if workers else {}
+        return Backfill.from_config(self.config, **options).run(paths)
 
     def load_config(self, config_path):
 
@@ -80,34 +189,99 @@ class LogCollector:
         with open(full_path, "r", encoding="utf-8") as f:
             return json.load(f)
 
-    def start_collection(self):
-
-        for source in self.config["log_sources"]:
+    def setup_indices(self):
+        prefixes = {source.get("index_prefix", "siem-logs") for source in self.config["log_sources"]}
 
-            log_path = source["path"]
+        try:
+            self.indices.install_templates(prefixes)
+            self.indices.discover()
+            print("✅ Index templates installed")
+        except Exception as e:
+            print(f"❌ Failed to set up index templates: {e}")
+
+    def add_source(self, source):
+        """Read what the source has (from its checkpoint) and start watching it"""
+        log_path = source_path(source)
+
+        if not os.path.exists(log_path):
+            print(f"❌ Path not found: {log_path}")
+            return False
+
+        print(f"✅ Watching: {log_path}")
+
+        handler = LogFileHandler(
+            self.es_client,
+            source.get("index_prefix", "siem-logs"),
+            self.indexer,
+            self.checkpoints,
+            start_position=source.get("start_position", "beginning"),
+            chunk_size=self.config.get("read_chunk_size", 64 * 1024),
+            pipeline=self.pipeline
+        )
 
-            # Make absolute path
-            if not os.path.isabs(log_path):
-                log_path = os.path.join(BASE_DIR, log_path)
+        handler.catch_up(log_path, source.get("recursive", False))
 
-            if not os.path.exists(log_path):
-                print(f"❌ Path not found: {log_path}")
-                continue
+        watch = self.observer.schedule(
+            handler,
+            log_path,
+            recursive=source.get("recursive", False)
+        )
+        self.sources[log_path] = (source, handler, watch)
+        return True
+
+    def remove_source(self, log_path):
+        source, handler, watch = self.sources.pop(log_path)
+        self.observer.unschedule(watch)
+        # Offsets are checkpointed, so adding the source back resumes here
+        handler.close()
+        print(f"🗑️ Stopped watching: {log_path}")
+
+    def reload_config(self, config):
+        """Apply a changed log_sources.json without a restart
+
+        Sources are matched by path: removed or changed entries stop being
+        watched and new or changed ones start, resuming from their
+        checkpoints; untouched sources are left running. Other sections are
+        only read at startup.
+        """
+        wanted = {source_path(source): source for source in config.get("log_sources", [])}
+
+        with self._sources_lock:
+            for log_path, (source, handler, watch) in list(self.sources.items()):
+                if wanted.get(log_path) != source:
+                    self.remove_source(log_path)
+
+            added = [source for log_path, source in wanted.items() if log_path not in self.sources]
+            prefixes = {source.get("index_prefix", "siem-logs") for source in added}
+            if prefixes:
+                try:
+                    self.indices.install_templates(prefixes)
+                except Exception as e:
+                    print(f"❌ Failed to set up index templates: {e}")
+
+            for source in added:
+                self.add_source(source)
+
+            pending = restart_sections(self.config, config)
+            self.config = dict(self.config, log_sources=config.get("log_sources", []))
+
+        if pending:
+            print(f"⚠️ Changes to {', '.join(pending)} take effect after a restart")
 
-            print(f"✅ Watching: {log_path}")
+    def start_collection(self):
+        if self.threat_intel is not None:
+            self.threat_intel.start()
 
-            handler = LogFileHandler(
-                self.es_client,
-                source.get("index_prefix", "siem-logs")
-            )
+        self.setup_indices()
 
-            self.handlers.append(handler)
+        with self._sources_lock:
+            for source in self.config["log_sources"]:
+                # A config reload may have got here first
+                if source_path(source) not in self.sources:
+                    self.add_source(source)
 
-            self.observer.schedule(
-                handler,
-                log_path,
-                recursive=source.get("recursive", False)
-            )
+        # Syslog / JSON senders feed the same pipeline without touching disk
+        self.listeners = start_network_inputs(self.pipeline, self.config.get("network_inputs"))
 
         self.observer.start()
         print("🚀 Log collection started...")
@@ -115,6 +289,7 @@ class LogCollector:
         try:
             while True:
                 time.sleep(1)
+                self.indices.maintain()
 
         except KeyboardInterrupt:
             print("\n🛑 Stopping collector...")
@@ -122,8 +297,37 @@ class LogCollector:
 
         self.observer.join()
 
+        for listener in self.listeners:
+            listener.close()
+
+        if self.threat_intel is not None:
+            self.threat_intel.close()
+
+        for source, handler, watch in self.sources.values():
+            handler.close()
+
+        if self.drainer is not None:
+            self.drainer.close()
+        self.indexer.close()
+        self.checkpoints.close()
+
+        if hasattr(self.parser, "close"):
+            self.parser.close()
+
+
+def create_collector(config_path="config/log_sources.json", parser=None):
+    """Build the collector selected by "collector_mode" in the config"""
+    with open(os.path.join(BASE_DIR, config_path), "r", encoding="utf-8") as f:
+        mode = json.load(f).get("collector_mode", "watchdog")
+
+    if mode == "async":
+        from src.async_collector import AsyncLogCollector
+        return AsyncLogCollector(config_path, parser)
+
+    return LogCollector(config_path, parser)
+
 
 if __name__ == "__main__":
 
-    collector = LogCollector()
+    collector = create_collector()
     collector.start_collection()
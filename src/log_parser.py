@@ -1,11 +1,33 @@
 # src/log_parser.py
 import re
 import json
-from datetime import datetime
-from elasticsearch import Elasticsearch
+
+from src.timestamps import TimestampNormalizer
+
+# Patterns are compiled once at import instead of on every parsed line
+APACHE_PATTERN = re.compile(
+    r'(\S+) \S+ \S+ \[([\w:/]+\s[+\-]\d{4})\] "(\S+) (\S+) (\S+)" (\d{3}) (\d+|-) "([^"]*)" "([^"]*)"'
+)
+# Example: 2023-01-15 10:15:30 DENY TCP 192.168.1.1:12345 -> 10.0.0.1:80
+FIREWALL_PATTERN = re.compile(
+    r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) (\S+) (\S+) (\S+:\d+) -> (\S+:\d+)'
+)
+WINDOWS_PATTERN = re.compile(
+    r'(\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2} [AP]M) (\S+) (\S+) (.*)'
+)
+
+# Single-pass classifier: one anchored match whose named group is the log type
+LOG_TYPE_PATTERN = re.compile(
+    r'\s*(?:'
+    r'(?P<json>\{)'
+    r'|(?P<firewall>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} (?:DENY|ALLOW|ACCEPT)\b)'
+    r'|(?P<windows>\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2} [AP]M)'
+    r'|(?P<apache>\S+ \S+ \S+ \[\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})'
+    r')'
+)
 
 class LogParser:
-    def __init__(self, es_client):
+    def __init__(self, es_client=None):
         self.es_client = es_client
         self.parsers = {
             'apache': self.parse_apache_log,
@@ -13,55 +35,43 @@ class LogParser:
             'json': self.parse_json_log,
             'windows': self.parse_windows_log
         }
+        # Remembers each log type's timestamp format after the first line
+        self.timestamps = TimestampNormalizer()
         
     def parse_apache_log(self, log_line):
         """Parse Apache access log format"""
         # Common Apache Log Format
-        pattern = r'(\S+) \S+ \S+ $$([\w:/]+\s[+\-]\d{4})$$ "(\S+) (\S+) (\S+)" (\d{3}) (\d+) "([^"]*)" "([^"]*)"'
-        match = re.match(pattern, log_line)
+        match = APACHE_PATTERN.match(log_line)
         
         if match:
             ip, timestamp, method, path, protocol, status, size, referer, user_agent = match.groups()
             
-            # Convert timestamp to ISO format
-            try:
-                dt = datetime.strptime(timestamp, '%d/%b/%Y:%H:%M:%S %z')
-                iso_timestamp = dt.isoformat()
-            except ValueError:
-                iso_timestamp = timestamp
-            
-            return {
-                'timestamp': iso_timestamp,
+            doc = {
                 'ip_address': ip,
                 'method': method,
                 'path': path,
                 'protocol': protocol,
                 'status_code': int(status),
-                'response_size': int(size),
+                'response_size': int(size) if size != '-' else 0,
                 'user_agent': user_agent,
                 'raw_log': log_line
             }
+            return self.timestamps.normalize(doc, timestamp, 'apache')
         
         return None
     
     def parse_firewall_log(self, log_line):
         """Parse firewall log format"""
-        # Example: 2023-01-15 10:15:30 DENY TCP 192.168.1.1:12345 -> 10.0.0.1:80
-        pattern = r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) (\S+) (\S+) (\S+:\d+) -> (\S+:\d+)'
-        match = re.match(pattern, log_line)
+        match = FIREWALL_PATTERN.match(log_line)
         
         if match:
             timestamp, action, protocol, source, destination = match.groups()
             
-            # Convert timestamp to ISO format
-            iso_timestamp = f"{timestamp}Z"
-            
             # Parse IP and port
             source_ip, source_port = source.split(':')
             dest_ip, dest_port = destination.split(':')
             
-            return {
-                'timestamp': iso_timestamp,
+            doc = {
                 'action': action,
                 'protocol': protocol,
                 'source_ip': source_ip,
@@ -70,6 +80,8 @@ class LogParser:
                 'destination_port': int(dest_port),
                 'raw_log': log_line
             }
+            # Firewall timestamps carry no zone and are taken as UTC
+            return self.timestamps.normalize(doc, timestamp, 'firewall')
         
         return None
     
@@ -78,15 +90,9 @@ class LogParser:
         try:
             log_data = json.loads(log_line)
             
-            # Ensure timestamp is in ISO format
+            # JSON producers disagree on timestamp formats; normalize to UTC
             if 'timestamp' in log_data:
-                timestamp = log_data['timestamp']
-                # If timestamp is not in ISO format, convert it
-                if not timestamp.endswith('Z') and '+' not in timestamp:
-                    iso_timestamp = f"{timestamp}Z"
-                else:
-                    iso_timestamp = timestamp
-                log_data['timestamp'] = iso_timestamp
+                self.timestamps.normalize(log_data, log_data['timestamp'], 'json')
             
             # Add raw log
             log_data['raw_log'] = log_line
@@ -99,26 +105,18 @@ class LogParser:
         """Parse Windows Event Log format"""
         # This is a simplified parser for Windows logs
         # You may need to adjust it based on your specific log format
-        pattern = r'(\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2} [AP]M) (\S+) (\S+) (.*)'
-        match = re.match(pattern, log_line)
+        match = WINDOWS_PATTERN.match(log_line)
         
         if match:
             timestamp, computer, source, message = match.groups()
             
-            # Convert timestamp to ISO format
-            try:
-                dt = datetime.strptime(timestamp, '%m/%d/%Y %I:%M:%S %p')
-                iso_timestamp = dt.isoformat()
-            except ValueError:
-                iso_timestamp = timestamp
-            
-            return {
-                'timestamp': iso_timestamp,
+            doc = {
                 'computer': computer,
                 'source': source,
                 'message': message,
                 'raw_log': log_line
             }
+            return self.timestamps.normalize(doc, timestamp, 'windows')
         
         return None
     
@@ -138,14 +136,24 @@ class LogParser:
     
     def get_log_type(self, log_line):
         """Determine the type of log based on its content"""
-        if log_line.strip().startswith('{') and log_line.strip().endswith('}'):
-            return 'json'
-        elif re.search(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', log_line):
-            if 'DENY' in log_line or 'ALLOW' in log_line or 'ACCEPT' in log_line:
-                return 'firewall'
-            else:
-                return 'windows'
-        elif re.search(r'\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}', log_line):
-            return 'apache'
-        else:
-            return 'unknown'
\ No newline at end of file
+        match = LOG_TYPE_PATTERN.match(log_line)
+        if match is None:
+            return 'unknown'
+
+        log_type = match.lastgroup
+        if log_type == 'json' and not log_line.rstrip().endswith('}'):
+            return 'unknown'
+        return log_type
+
+    def parse_line(self, log_line):
+        """Classify and parse a line, tagging the result with its log type"""
+        log_type = self.get_log_type(log_line)
+        parsed = self.parse_log(log_line, log_type)
+
+        if parsed is not None:
+            parsed['log_type'] = log_type
+        return parsed
+
+    def parse_lines(self, log_lines):
+        """Parse a batch of lines; unparseable lines come back as None"""
+        return [self.parse_line(line) for line in log_lines]
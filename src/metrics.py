@@ -0,0 +1,333 @@
+# src/metrics.py
+import os
+import sys
+import time
+import functools
+import threading
+from bisect import bisect_left
+from collections import Counter as Tally
+
+
+# Seconds; spans a fast bulk request up to a stuck detection cycle
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Seconds between an event happening and it being ingested
+LAG_BUCKETS = (1, 5, 15, 60, 300, 900, 3600, 21600, 86400)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """Monotonic count per label combination
+
+    Instrumented code adds once per batch rather than once per line, so the
+    lock is taken a handful of times per batch at most.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def current(self):
+        with self._lock:
+            return dict(self.values)
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self.current().items()):
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}")
+        return lines
+
+    def snapshot(self):
+        return {"|".join(map(str, labels)) or "total": value for labels, value in self.current().items()}
+
+
+class Gauge(Metric):
+    """Current value per label combination, or read from a function when rendered"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.functions = {}
+
+    def set(self, value, *labels):
+        with self._lock:
+            self.values[labels] = value
+
+    def set_function(self, function, *labels):
+        self.functions[labels] = function
+
+    def current(self):
+        with self._lock:
+            values = dict(self.values)
+        for labels, function in list(self.functions.items()):
+            try:
+                values[labels] = function()
+            except Exception:
+                continue
+        return values
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self.current().items()):
+            lines.append(f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}")
+        return lines
+
+    def snapshot(self):
+        return {"|".join(map(str, labels)) or "total": value for labels, value in self.current().items()}
+
+
+class Histogram(Metric):
+    """Bucketed observations (Prometheus style) per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        return Timer(self, labels)
+
+    def timed(self, *labels):
+        """Decorator observing each call's duration"""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, *labels)
+            return wrapper
+        return decorate
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count) in self.values.items())
+
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = format_labels(self.labels, labels, ("le", format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{plain} {format_value(total)}")
+            lines.append(f"{self.name}_count{plain} {count}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            series = [(labels, total, count) for labels, (_, total, count) in self.values.items()]
+        return {
+            "|".join(map(str, labels)) or "total": {"count": count, "sum": total,
+                                                    "mean": total / count if count else 0.0}
+            for labels, total, count in series
+        }
+
+
+class Timer:
+    """Context manager observing elapsed seconds into a histogram"""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Named metrics shared by the collector, parser, detector and dashboard
+
+    Asking for a name that already exists returns the existing metric, so
+    modules can declare what they record at import time.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in sorted(self.metrics.items())}
+
+
+REGISTRY = MetricsRegistry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+gauge("siem_process_uptime_seconds", "Seconds since the process started").set_function(
+    lambda: time.time() - REGISTRY.started
+)
+
+
+class SamplingProfiler:
+    """Statistical profiler: samples every thread's stack at a fixed interval
+
+    Nothing runs until start() is called, and it can be started, stopped and
+    reset at runtime (see /debug/profiler). Stacks are tallied in collapsed
+    form ("outer;inner;leaf"), which flame graph tools read directly. The
+    cost while running is one stack walk per thread per interval, in a
+    thread of its own.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Tally()
+        self.samples = 0
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        with self._lock:
+            if self.running:
+                return False
+            if interval:
+                self.interval = interval
+            self._stop.clear()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        print(f"🔄 Sampling profiler started (every {self.interval * 1000:.0f} ms)")
+        return True
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return False
+            self._stop.set()
+            self._thread.join()
+        print(f"🔄 Sampling profiler stopped after {self.samples} samples")
+        return True
+
+    def reset(self):
+        self.stacks = Tally()
+        self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                self.stacks[self.collapse(frame)] += 1
+            self.samples += 1
+
+    def collapse(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def report(self, limit=20):
+        """Status plus the functions most often on top of a stack"""
+        leaves = Tally()
+        for stack, count in list(self.stacks.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "started_at": self.started_at,
+            "top": [
+                {"function": leaf, "samples": count, "share": count / total}
+                for leaf, count in leaves.most_common(limit)
+            ]
+        }
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,306 @@
+# src/network_input.py
+import re
+import time
+import socket
+import selectors
+import threading
+
+
+# RFC 5424 ("<PRI>1 TIMESTAMP HOST APP PROCID MSGID SD ") or RFC 3164
+# ("<PRI>Mmm dd hh:mm:ss HOST TAG: ") header in front of the actual message
+SYSLOG_HEADER = re.compile(
+    r"<\d{1,3}>(?:"
+    r"1 \S+ \S+ \S+ \S+ \S+ (?:-|(?:\[(?:[^\]\\]|\\.)*\])+) ?"
+    r"|\w{3} [ \d]\d \d{2}:\d{2}:\d{2} \S+ (?:[^:\s]+: )?"
+    r")?"
+)
+
+# Largest single recv() on a TCP connection
+RECV_BYTES = 256 * 1024
+
+
+def strip_syslog(line):
+    """Drop the syslog header so the message parses like it would from a file"""
+    match = SYSLOG_HEADER.match(line)
+    return line[match.end():] if match else line
+
+
+class SourceRates:
+    """Message and byte counts per sending host, plus rates since the last snapshot
+
+    Only the first `max_sources` hosts are tracked individually; the rest are
+    counted together under "other" so spoofed UDP senders can't grow it.
+    """
+
+    def __init__(self, max_sources=10000):
+        self.max_sources = max_sources
+        self.totals = {}
+        self._last = {}
+        self._last_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, source, messages, size):
+        with self._lock:
+            counts = self.totals.get(source)
+            if counts is None:
+                if len(self.totals) >= self.max_sources:
+                    source = "other"
+                counts = self.totals.setdefault(source, [0, 0])
+            counts[0] += messages
+            counts[1] += size
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            elapsed = max(now - self._last_time, 1e-9)
+            result = {}
+            for source, (messages, size) in self.totals.items():
+                last_messages, last_size = self._last.get(source, (0, 0))
+                result[source] = {
+                    "messages": messages,
+                    "bytes": size,
+                    "messages_per_sec": (messages - last_messages) / elapsed,
+                    "bytes_per_sec": (size - last_size) / elapsed
+                }
+            self._last = {source: tuple(counts) for source, counts in self.totals.items()}
+            self._last_time = now
+        return result
+
+
+class NetworkListener:
+    """UDP or TCP listener for syslog or newline-delimited JSON
+
+    Each wakeup drains everything the socket has ready (up to `batch_size`
+    datagrams or reads) before doing any work, and received lines are handed
+    to the pipeline per sending host in batches of up to `batch_size` lines
+    or every `flush_interval` seconds. A large `recv_buffer` lets the kernel
+    absorb bursts while a batch is being parsed and indexed. TCP streams are
+    newline framed, and each connection is read for at most `max_read_bytes`
+    per wakeup; overlong lines are cut at `max_line_bytes` and the rest of
+    such a line is dropped as it arrives.
+    """
+
+    def __init__(self, pipeline, protocol="udp", host="0.0.0.0", port=5514, format="syslog",
+                 index_prefix="siem-logs", recv_buffer=8 * 1024 * 1024, batch_size=1000,
+                 flush_interval=0.2, max_line_bytes=64 * 1024, max_read_bytes=1024 * 1024,
+                 name=None):
+        if protocol not in ("udp", "tcp"):
+            raise ValueError(f"Unsupported protocol: {protocol}")
+
+        self.pipeline = pipeline
+        self.protocol = protocol
+        self.host = host
+        self.port = port
+        self.format = format
+        self.index_prefix = index_prefix
+        self.recv_buffer = recv_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_line_bytes = max_line_bytes
+        self.max_read_bytes = max_read_bytes
+        self.name = name or f"{protocol}:{port}"
+
+        self.rates = SourceRates()
+        self.pending = {}
+        self.pending_count = 0
+        self.pending_since = None
+
+        self.sock = None
+        self.address = None
+        self.selector = None
+        self.buffers = {}
+        self.peers = {}
+        # Connections in the middle of an overlong line, dropping until its newline
+        self.skipping = set()
+        self._closed = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, pipeline, config):
+        """Build a listener from one entry of "network_inputs" in log_sources.json"""
+        return cls(
+            pipeline,
+            protocol=config.get("protocol", "udp"),
+            host=config.get("host", "0.0.0.0"),
+            port=config.get("port", 5514),
+            format=config.get("format", "syslog"),
+            index_prefix=config.get("index_prefix", "siem-logs"),
+            recv_buffer=config.get("recv_buffer", 8 * 1024 * 1024),
+            batch_size=config.get("batch_size", 1000),
+            flush_interval=config.get("flush_interval", 0.2),
+            max_line_bytes=config.get("max_line_bytes", 64 * 1024),
+            max_read_bytes=config.get("max_read_bytes", 1024 * 1024),
+            name=config.get("name")
+        )
+
+    def start(self):
+        kind = socket.SOCK_DGRAM if self.protocol == "udp" else socket.SOCK_STREAM
+        self.sock = socket.socket(socket.AF_INET, kind)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+
+        # The kernel silently caps this at net.core.rmem_max
+        granted = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if granted < self.recv_buffer:
+            print(f"⚠️ {self.name}: receive buffer capped at {granted} bytes "
+                  f"(raise net.core.rmem_max for {self.recv_buffer})")
+
+        self.sock.bind((self.host, self.port))
+        if self.protocol == "tcp":
+            self.sock.listen(128)
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        print(f"✅ Listening for {self.format} on {self.protocol}://{self.address[0]}:{self.address[1]}")
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._closed.is_set():
+                for key, _ in self.selector.select(self.flush_interval):
+                    if key.fileobj is self.sock:
+                        if self.protocol == "udp":
+                            self._read_datagrams()
+                        else:
+                            self._accept()
+                    else:
+                        self._read_stream(key.fileobj)
+
+                if self.pending_count >= self.batch_size or (
+                        self.pending_since is not None
+                        and time.monotonic() - self.pending_since >= self.flush_interval):
+                    self.flush()
+        finally:
+            for conn in list(self.buffers):
+                self._disconnect(conn)
+            self.flush()
+            self.selector.close()
+            self.sock.close()
+
+    def _read_datagrams(self):
+        for _ in range(self.batch_size):
+            try:
+                data, (address, _) = self.sock.recvfrom(65535)
+            except BlockingIOError:
+                return
+            self._receive(address, data.decode("utf-8", errors="ignore").split("\n"), len(data))
+
+    def _accept(self):
+        for _ in range(self.batch_size):
+            try:
+                conn, (address, _) = self.sock.accept()
+            except BlockingIOError:
+                return
+            self.peers[conn] = address
+            conn.setblocking(False)
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+            self.buffers[conn] = b""
+            self.selector.register(conn, selectors.EVENT_READ)
+
+    def _read_stream(self, conn):
+        # Bounded per wakeup so one busy sender neither buffers without limit
+        # nor starves the other connections; the selector wakes up again for
+        # whatever is left in the socket
+        chunks = []
+        received = 0
+        while received < self.max_read_bytes:
+            try:
+                data = conn.recv(min(RECV_BYTES, self.max_read_bytes - received))
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+
+            if not data:
+                self._disconnect(conn, b"".join(chunks))
+                return
+            chunks.append(data)
+            received += len(data)
+
+        lines, size = self._frame(conn, b"".join(chunks))
+        if lines:
+            self._receive(self.peers[conn], lines, size)
+
+    def _frame(self, conn, data, final=False):
+        """(complete lines, their size in bytes) from what conn sent; a trailing partial line stays buffered"""
+        if conn in self.skipping:
+            end = data.find(b"\n")
+            if end < 0:
+                return [], 0
+            self.skipping.discard(conn)
+            data = data[end + 1:]
+
+        data = self.buffers.get(conn, b"") + data
+        lines = data.split(b"\n")
+        partial = lines.pop()
+        if final:
+            # Whatever is left when the sender hangs up is a final line
+            if partial:
+                lines.append(partial)
+            partial = b""
+        elif len(partial) > self.max_line_bytes:
+            lines.append(partial)
+            partial = b""
+            self.skipping.add(conn)
+        self.buffers[conn] = partial
+
+        size = len(data) - len(partial)
+        return [line[:self.max_line_bytes].decode("utf-8", errors="ignore") for line in lines], size
+
+    def _disconnect(self, conn, data=b""):
+        lines, size = self._frame(conn, data, final=True)
+        address = self.peers.pop(conn, "unknown")
+        if lines:
+            self._receive(address, lines, size)
+
+        self.buffers.pop(conn, None)
+        self.skipping.discard(conn)
+        self.selector.unregister(conn)
+        conn.close()
+
+    def _receive(self, address, lines, size):
+        if self.format == "syslog":
+            lines = [strip_syslog(line) for line in lines]
+
+        self.rates.record(address, len(lines), size)
+
+        self.pending.setdefault(address, []).extend(lines)
+        self.pending_count += len(lines)
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+
+    def flush(self):
+        pending = self.pending
+        self.pending = {}
+        self.pending_count = 0
+        self.pending_since = None
+
+        for address, lines in pending.items():
+            try:
+                self.pipeline.process_lines(f"{self.protocol}://{address}", lines, self.index_prefix)
+            except Exception as e:
+                print(f"❌ Error processing input from {address} on {self.name}: {e}")
+
+
+def start_network_inputs(pipeline, configs):
+    """Start a listener for every enabled network_inputs entry"""
+    listeners = []
+    for config in configs or []:
+        if not config.get("enabled", True):
+            continue
+        try:
+            listener = NetworkListener.from_config(pipeline, config)
+            listener.start()
+            listeners.append(listener)
+        except (OSError, ValueError) as e:
+            print(f"❌ Failed to start network input {config}: {e}")
+    return listeners
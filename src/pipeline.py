@@ -0,0 +1,143 @@
+# src/pipeline.py
+import time
+import threading
+
+from src.index_manager import partition_day
+from src.log_parser import LogParser
+from src.metrics import LAG_BUCKETS, counter, histogram
+from src.timestamps import iso_utc, partition_for_ms
+
+
+LINES_READ = counter("siem_lines_read_total", "Non-empty lines handed to the pipeline", ("input",))
+LINES_PARSED = counter("siem_lines_parsed_total", "Parsed lines by log type and outcome",
+                       ("log_type", "result"))
+PARSE_SECONDS = histogram("siem_parse_batch_seconds", "Time to parse one batch of lines")
+INGEST_LAG = histogram("siem_ingest_lag_seconds",
+                       "Age of the newest event in each batch when it was ingested",
+                       buckets=LAG_BUCKETS)
+
+
+def input_kind(source_file):
+    """Input a source came from: file, or the scheme of a network source (udp, tcp)"""
+    scheme, separator, _ = source_file.partition("://")
+    return scheme if separator else "file"
+
+
+class IngestPipeline:
+    """Parse raw lines and hand the resulting documents to the indexer
+
+    Documents are routed to the daily partition of their event timestamp;
+    an IndexManager, when given, picks the current rollover generation.
+    """
+
+    def __init__(self, indexer, parser=None, index_prefix="siem-logs", indices=None):
+        self.indexer = indexer
+        self.parser = parser or LogParser()
+        self.index_prefix = index_prefix
+        self.indices = indices
+        self.enrichers = []
+        self.sinks = []
+        self._sink_lock = threading.Lock()
+
+    def add_enricher(self, enricher):
+        """Register a callable that adds fields to every batch before the sinks see it"""
+        self.enrichers.append(enricher)
+
+    def add_sink(self, sink):
+        """Register a callable that receives every batch of parsed documents"""
+        self.sinks.append(sink)
+
+    def build_doc(self, source_file, log_line, ingest_timestamp, ingest_ms, doc):
+        if doc is None:
+            # Keep lines we can't parse searchable by their raw text
+            doc = {
+                "timestamp": ingest_timestamp,
+                "timestamp_ms": ingest_ms,
+                "log_type": "unknown",
+                "raw_log": log_line,
+                "processed": False
+            }
+        else:
+            doc["processed"] = True
+
+        doc["source_file"] = source_file
+        doc["ingest_timestamp"] = ingest_timestamp
+        return doc
+
+    def index_name(self, prefix, day):
+        if self.indices is not None:
+            return self.indices.write_index(prefix, day)
+        return f"{prefix}-{day}"
+
+    def build_batch(self, source_file, log_lines, index_prefix=None):
+        """Parse lines and run the sinks; returns [(index name, doc)] to index"""
+        # One clock read per batch, not per line
+        ingest_ms = int(time.time() * 1000)
+        ingest_timestamp = iso_utc(ingest_ms)
+        today = partition_for_ms(ingest_ms)
+        prefix = index_prefix or self.index_prefix
+
+        lines = [line.strip() for line in log_lines]
+        lines = [line for line in lines if line]
+
+        started = time.perf_counter()
+        docs = [
+            self.build_doc(source_file, line, ingest_timestamp, ingest_ms, parsed)
+            for line, parsed in zip(lines, self.parser.parse_lines(lines))
+        ]
+        PARSE_SECONDS.observe(time.perf_counter() - started)
+
+        for enricher in self.enrichers:
+            try:
+                enricher(docs)
+            except Exception as e:
+                print(f"❌ Error in pipeline enricher {enricher}: {e}")
+
+        # Sinks (e.g. streaming detection) see events before they are indexed.
+        # Several reader threads may share the pipeline; sinks get one batch
+        # at a time.
+        with self._sink_lock:
+            for sink in self.sinks:
+                try:
+                    sink(docs)
+                except Exception as e:
+                    print(f"❌ Error in pipeline sink {sink}: {e}")
+
+        index_names = {}
+        batch = []
+        parsed = {}
+        newest = None
+        for doc in docs:
+            ms = doc.get("timestamp_ms")
+            if ms is not None:
+                day = min(partition_for_ms(ms), today)
+            else:
+                day = partition_day(doc.get("timestamp"), today)
+            index_name = index_names.get(day)
+            if index_name is None:
+                index_name = index_names[day] = self.index_name(prefix, day)
+            batch.append((index_name, doc))
+
+            # Tallied here and recorded once per batch to keep metrics cheap
+            key = (doc.get("log_type"), doc["processed"])
+            parsed[key] = parsed.get(key, 0) + 1
+            if ms is not None and doc["processed"] and (newest is None or ms > newest):
+                newest = ms
+
+        self.record_metrics(source_file, len(docs), parsed, newest, ingest_ms)
+        return batch
+
+    def record_metrics(self, source_file, lines, parsed, newest, ingest_ms):
+        LINES_READ.inc(lines, input_kind(source_file))
+        for (log_type, processed), count in parsed.items():
+            LINES_PARSED.inc(count, log_type, "parsed" if processed else "failed")
+        if newest is not None:
+            INGEST_LAG.observe(max(0.0, (ingest_ms - newest) / 1000.0))
+
+    def process_lines(self, source_file, log_lines, index_prefix=None):
+        batch = self.build_batch(source_file, log_lines, index_prefix)
+
+        # With a spool as the indexer this returns once the batch is on disk
+        self.indexer.add_batch(batch)
+
+        return [doc for _, doc in batch]
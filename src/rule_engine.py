@@ -0,0 +1,258 @@
+# src/rule_engine.py
+import time
+import json
+from collections import deque
+from datetime import datetime, timezone
+
+from src.event_batch import EventBatch
+from src.metrics import counter
+from src.rule_matcher import RuleMatcher
+from src.state_store import KeyedWindowStore
+
+
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Rule settings that shape a rule's window state; a reloaded rule that
+# changes none of them keeps its windows
+STATE_FIELDS = ("pattern", "filter", "group_by", "distinct", "time_window", "threshold", "max_keys")
+
+RULE_MATCHES = counter("siem_rule_matches_total", "Events matched by each streaming rule", ("rule",))
+
+
+def parse_time_window(value):
+    """Convert a rule time_window such as "5m" or "30s" into seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    value = str(value).strip().lower()
+    if value and value[-1] in TIME_UNITS:
+        return float(value[:-1]) * TIME_UNITS[value[-1]]
+    return float(value)
+
+
+def event_time(doc):
+    """Epoch seconds of an event, falling back to now for unparseable timestamps"""
+    ms = doc.get("timestamp_ms")
+    if ms is not None:
+        return ms / 1000.0
+
+    timestamp = doc.get("timestamp")
+    if timestamp:
+        try:
+            return datetime.fromisoformat(timestamp).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return time.time()
+
+
+class SlidingWindow:
+    """Last `threshold` event times for one rule, plus a few sample matches
+
+    Only the newest `threshold` timestamps are needed to decide whether the
+    threshold was crossed inside the window, so memory per window is fixed.
+    """
+
+    __slots__ = ("size", "threshold", "times", "samples")
+
+    def __init__(self, size, threshold, max_samples):
+        self.size = size
+        self.threshold = threshold
+        self.times = deque(maxlen=threshold)
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, ts, sample):
+        self.times.append(ts)
+        self.samples.append(sample)
+        return len(self.times) >= self.threshold and ts - self.times[0] <= self.size
+
+    def reset(self):
+        self.times.clear()
+        self.samples.clear()
+
+
+def state_key(rule):
+    """Identity of a rule's detection logic, ignoring its name, description and severity"""
+    return json.dumps({field: rule.get(field) for field in STATE_FIELDS}, sort_keys=True, default=str)
+
+
+class CompiledRule:
+
+    def __init__(self, rule, max_samples):
+        self.rule = rule
+        self.name = rule["name"]
+        self.state_key = state_key(rule)
+        self.threshold = max(1, int(rule.get("threshold", 1)))
+        self.window_seconds = parse_time_window(rule.get("time_window", "5m"))
+
+        # Field equality conditions; a list means "any of these values"
+        self.filter = {
+            field: set(value) if isinstance(value, list) else {value}
+            for field, value in rule.get("filter", {}).items()
+        }
+
+        group_by = rule.get("group_by") or []
+        self.group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        self.distinct = rule.get("distinct")
+
+        if self.group_by or self.distinct:
+            self.window = None
+            self.store = KeyedWindowStore(
+                self.window_seconds,
+                self.threshold,
+                distinct=bool(self.distinct),
+                max_keys=rule.get("max_keys", 100000),
+                max_samples=max_samples
+            )
+        else:
+            self.window = SlidingWindow(self.window_seconds, self.threshold, max_samples)
+            self.store = None
+
+    def select(self, batch, rows=None):
+        """Rows of an EventBatch (all, or of `rows`) that pass the filter"""
+        return batch.filter(self.filter, rows)
+
+    def key(self, doc):
+        if not self.group_by:
+            return "*"
+
+        values = [doc.get(field) for field in self.group_by]
+        if None in values:
+            return None
+        if len(values) == 1:
+            return values[0]
+        return "|".join(str(value) for value in values)
+
+    def observe(self, doc, ts, sample):
+        """Count the event; returns (count, samples, key) when the rule fires"""
+        if self.window is not None:
+            if not self.window.add(ts, sample):
+                return None
+            fired = (len(self.window.times), list(self.window.samples), None)
+            self.window.reset()
+            return fired
+
+        key = self.key(doc)
+        if key is None:
+            return None
+
+        value = doc.get(self.distinct) if self.distinct else None
+        if self.distinct and value is None:
+            return None
+
+        count, state = self.store.observe(key, ts, value, sample)
+        if count < self.threshold:
+            return None
+
+        fired = (count, list(state.samples), key)
+        self.store.reset(key)
+        return fired
+
+
+class StreamingRuleEngine:
+    """Evaluate threat rules against events as they are ingested
+
+    Each rule keeps a sliding window sized by its time_window; an alert fires
+    on the event that brings the count within the window up to the rule's
+    threshold, after which the window starts over. Rules with group_by keep
+    one window per key (e.g. per source IP), and rules with distinct count
+    distinct values of that field instead of events.
+    """
+
+    def __init__(self, rules, max_samples=10, previous=None):
+        self.max_samples = max_samples
+        self.rules = [CompiledRule(rule, max_samples) for rule in rules]
+
+        # Rebuilt from reloaded rules: unchanged rules take over the windows
+        # counted so far by the engine being replaced
+        self.kept = 0
+        if previous is not None and previous.max_samples == max_samples:
+            carried = {}
+            for compiled in previous.rules:
+                carried.setdefault(compiled.state_key, []).append(compiled)
+            for i, compiled in enumerate(self.rules):
+                candidates = carried.get(compiled.state_key)
+                if candidates:
+                    old = candidates.pop(0)
+                    compiled.window, compiled.store = old.window, old.store
+                    self.kept += 1
+
+        # All rule patterns merged into one matcher, scanned once per batch;
+        # rules without a pattern are decided by their filter alone.
+        self.pattern_rule_ids = [i for i, rule in enumerate(rules) if rule.get("pattern")]
+        self.unconditional_rule_ids = [i for i, rule in enumerate(rules) if not rule.get("pattern")]
+        self.matcher = RuleMatcher([rules[i]["pattern"] for i in self.pattern_rule_ids])
+
+        # Columns a batch needs: the raw line for patterns, the filtered fields
+        self.batch_fields = ["raw_log"] + sorted({field for rule in self.rules for field in rule.filter})
+
+        # Matches per rule since the last batch, recorded to metrics per batch
+        self.match_counts = [0] * len(self.rules)
+
+    def process_batch(self, docs):
+        """Run a batch of events through every rule, in event order
+
+        Patterns are matched over all lines of the batch at once and filters
+        are evaluated column-wise on an EventBatch, so only the events some
+        rule accepts are touched individually (to update its window).
+        """
+        batch = EventBatch.from_docs(docs, self.batch_fields)
+
+        rows_by_rule = {}
+        if self.pattern_rule_ids:
+            texts = [text or "" for text in batch.values("raw_log")]
+            for row, matched in self.matcher.match_batch(texts).items():
+                for i in matched:
+                    rows_by_rule.setdefault(self.pattern_rule_ids[i], []).append(row)
+
+        hits = []
+        for rule_id, rule in enumerate(self.rules):
+            if rule_id in rows_by_rule:
+                rows = rule.select(batch, sorted(rows_by_rule[rule_id]))
+            elif rule_id in self.unconditional_rule_ids:
+                rows = rule.select(batch)
+            else:
+                continue
+            self.match_counts[rule_id] += len(rows)
+            hits.extend((row, rule_id) for row in rows)
+        hits.sort()
+
+        alerts = []
+        last_row = None
+        for row, rule_id in hits:
+            if row != last_row:
+                doc = docs[row]
+                ts = event_time(doc)
+                sample = {
+                    "timestamp": doc.get("timestamp"),
+                    "source": doc.get("source_file"),
+                    "raw_log": doc.get("raw_log", "")
+                }
+                last_row = row
+            rule = self.rules[rule_id]
+            fired = rule.observe(doc, ts, sample)
+            if fired:
+                alerts.append(self.build_alert(rule, *fired))
+
+        for rule_id, count in enumerate(self.match_counts):
+            if count:
+                RULE_MATCHES.inc(count, self.rules[rule_id].name)
+                self.match_counts[rule_id] = 0
+        return alerts
+
+    def build_alert(self, rule, count, samples, key):
+        alert = {
+            "rule_name": rule.name,
+            "description": rule.rule.get("description", ""),
+            "severity": rule.rule.get("severity", "medium"),
+            "count": count,
+            "matches": samples,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+
+        if rule.group_by:
+            alert["group_by"] = dict(zip(rule.group_by, str(key).split("|")))
+            alert["key"] = key
+        if rule.distinct:
+            alert["distinct_field"] = rule.distinct
+
+        return alert
@@ -0,0 +1,270 @@
+# src/rule_matcher.py
+import re
+from bisect import bisect_right
+from itertools import accumulate
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+
+# Literals shorter than this filter too little to be worth indexing
+MIN_LITERAL_LENGTH = 3
+GRAM = MIN_LITERAL_LENGTH
+
+# Up to this many literals a batch is searched literal by literal across all
+# its lines at once; beyond it the per-line trigram lookup is cheaper
+BATCH_SCAN_LITERALS = 256
+
+
+def required_literals(pattern):
+    """Lowercase strings of which at least one must occur in every match
+
+    Returns None when no useful set can be derived (the rule then has to be
+    checked against every line).
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+
+    literals = _sequence_literals(list(parsed))
+    if not literals or min(len(literal) for literal in literals) < MIN_LITERAL_LENGTH:
+        return None
+    return literals
+
+
+def _score(literals):
+    # Prefer the set whose shortest member is longest, then the smallest set
+    return min(len(literal) for literal in literals), -len(literals)
+
+
+def _sequence_literals(items):
+    best = None
+    run = []
+
+    def consider(candidates):
+        nonlocal best
+        if candidates and (best is None or _score(candidates) > _score(best)):
+            best = candidates
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+
+        if run:
+            consider({"".join(run).lower()})
+            run = []
+
+        if op is sre_constants.SUBPATTERN:
+            consider(_sequence_literals(list(av[-1])))
+        elif op is sre_constants.BRANCH:
+            consider(_branch_literals(av[1]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, sub = av
+            if low >= 1:
+                consider(_sequence_literals(list(sub)))
+
+    if run:
+        consider({"".join(run).lower()})
+
+    return best
+
+
+def _branch_literals(alternatives):
+    literals = set()
+    for alternative in alternatives:
+        found = _sequence_literals(list(alternative))
+        if not found:
+            return None
+        literals |= found
+    return literals
+
+
+# Where a literal can only sit next to whitespace or the ends of the line,
+# the tokens an analyzer makes of it are the tokens it makes of the line there
+LINE_STARTS = (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)
+LINE_ENDS = (sre_constants.AT_END, sre_constants.AT_END_STRING)
+SPACE_CLASS = [(sre_constants.CATEGORY, sre_constants.CATEGORY_SPACE)]
+
+
+def phrase_alternatives(pattern):
+    """Per top-level alternative, the literals every match of it contains as whole words
+
+    A literal only counts when the pattern puts whitespace or a line end on
+    both sides of it, so a phrase query on an analyzed field finds every
+    line the alternative can match (a plain substring like "fail" would
+    also match inside "failed", which a phrase query would miss). Returns
+    None when some alternative has no such literal.
+    """
+    try:
+        parsed = list(sre_parse.parse(pattern))
+    except re.error:
+        return None
+
+    if len(parsed) == 1 and parsed[0][0] is sre_constants.BRANCH:
+        alternatives = [list(alternative) for alternative in parsed[0][1][1]]
+    else:
+        alternatives = [parsed]
+
+    result = []
+    for items in alternatives:
+        phrases = _word_literals(_flatten(items))
+        if not phrases:
+            return None
+        result.append(phrases)
+    return result
+
+
+def _flatten(items):
+    # Groups without alternation are just part of the sequence
+    flat = []
+    for op, av in items:
+        if op is sre_constants.SUBPATTERN and not any(
+                sub_op is sre_constants.BRANCH for sub_op, _ in av[-1]):
+            flat.extend(_flatten(list(av[-1])))
+        else:
+            flat.append((op, av))
+    return flat
+
+
+def _bounded(item, anchors):
+    if item is None:
+        return False
+    op, av = item
+    return ((op is sre_constants.AT and av in anchors)
+            or (op is sre_constants.IN and av == SPACE_CLASS)
+            or (op is sre_constants.LITERAL and chr(av).isspace()))
+
+
+def _word_literals(items):
+    phrases = []
+    start = None
+    for i, (op, av) in enumerate(items + [(None, None)]):
+        if op is sre_constants.LITERAL:
+            if start is None:
+                start = i
+            continue
+        if start is not None:
+            text = "".join(chr(av) for _, av in items[start:i])
+            before = items[start - 1] if start else None
+            after = items[i] if i < len(items) else None
+            if ((text[0].isspace() or _bounded(before, LINE_STARTS))
+                    and (text[-1].isspace() or _bounded(after, LINE_ENDS))
+                    and re.search(r"\w", text)):
+                phrases.append(text.strip().lower())
+            start = None
+    return phrases
+
+
+class RuleMatcher:
+    """Match a line against many rule patterns in a single scan
+
+    Every pattern is reduced to a set of required literals. The literals are
+    indexed by their first three characters, so one pass over the line's
+    trigrams finds the handful of rules that could possibly match; only those
+    rules run their full regex. Lines containing none of the literals (the
+    vast majority) never touch a rule regex at all.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+        # trigram -> {literal: [rule ids]}
+        self.grams = {}
+        # literal -> [rule ids]
+        self.literals = {}
+        # Rules without usable literals must always be verified
+        self.unfiltered = []
+
+        for rule_id, pattern in enumerate(patterns):
+            literals = required_literals(pattern)
+
+            if literals is None:
+                self.unfiltered.append(rule_id)
+                continue
+
+            for literal in literals:
+                self.grams.setdefault(literal[:GRAM], {}).setdefault(literal, []).append(rule_id)
+                self.literals.setdefault(literal, []).append(rule_id)
+
+        self.gram_keys = frozenset(self.grams)
+
+    def candidates(self, text):
+        """Rule ids whose required literals occur in text"""
+        lower = text.lower()
+        hits = {lower[i:i + GRAM] for i in range(len(lower) - GRAM + 1)} & self.gram_keys
+
+        candidates = set()
+        for gram in hits:
+            for literal, rule_ids in self.grams[gram].items():
+                if literal in lower:
+                    candidates.update(rule_ids)
+        return candidates
+
+    def match(self, text):
+        """Return the set of rule ids whose pattern matches text"""
+        matched = set()
+
+        if self.gram_keys:
+            for rule_id in self.candidates(text):
+                if self.patterns[rule_id].search(text):
+                    matched.add(rule_id)
+
+        for rule_id in self.unfiltered:
+            if self.patterns[rule_id].search(text):
+                matched.add(rule_id)
+
+        return matched
+
+    def batch_candidates(self, texts):
+        """{row: rule ids whose required literals occur in texts[row]}, rows with any only
+
+        The lowercased lines are joined and every literal is located with
+        str.find over the whole batch, jumping to the next line after a hit,
+        so lines without any literal cost a lower() and nothing more.
+        """
+        lowered = [text.lower() for text in texts]
+        if len(self.literals) > BATCH_SCAN_LITERALS:
+            candidates = {}
+            for row, lower in enumerate(lowered):
+                hits = {lower[i:i + GRAM] for i in range(len(lower) - GRAM + 1)} & self.gram_keys
+                for gram in hits:
+                    for literal, rule_ids in self.grams[gram].items():
+                        if literal in lower:
+                            candidates.setdefault(row, set()).update(rule_ids)
+            return candidates
+
+        joined = "\n".join(lowered)
+        starts = list(accumulate((len(lower) + 1 for lower in lowered), initial=0))
+        candidates = {}
+        for literal, rule_ids in self.literals.items():
+            position = joined.find(literal)
+            while position != -1:
+                row = bisect_right(starts, position) - 1
+                candidates.setdefault(row, set()).update(rule_ids)
+                position = joined.find(literal, starts[row + 1])
+        return candidates
+
+    def match_batch(self, texts):
+        """{row: set of matching rule ids} for the lines of texts that match any rule"""
+        matched = {}
+
+        if self.gram_keys:
+            for row, rule_ids in self.batch_candidates(texts).items():
+                text = texts[row]
+                hits = {rule_id for rule_id in rule_ids if self.patterns[rule_id].search(text)}
+                if hits:
+                    matched[row] = hits
+
+        if self.unfiltered:
+            for row, text in enumerate(texts):
+                hits = {rule_id for rule_id in self.unfiltered if self.patterns[rule_id].search(text)}
+                if hits:
+                    matched.setdefault(row, set()).update(hits)
+
+        return matched
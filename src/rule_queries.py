@@ -0,0 +1,214 @@
+# src/rule_queries.py
+import re
+
+from src.index_manager import LOG_INDEX_PREFIX, indices_for_range
+from src.rule_engine import parse_time_window
+from src.rule_matcher import phrase_alternatives
+
+
+# Parsed log documents only; never fan out over siem-alerts or system indices
+LOG_INDEX_PATTERN = "siem-logs-*"
+
+# The index templates (src/index_manager.py) map strings as keyword fields
+# directly; use ".keyword" for indices created with dynamic mappings
+KEYWORD_SUFFIX = ""
+
+# Fields LogParser emits as numbers; these are aggregatable as-is
+NUMERIC_FIELDS = {"status_code", "response_size", "source_port", "destination_port"}
+
+# Upper bound on buckets returned per rule
+MAX_BUCKETS = 1000
+
+
+def keyword_field(field):
+    if field in NUMERIC_FIELDS:
+        return field
+    return f"{field}{KEYWORD_SUFFIX}"
+
+
+def log_indices(start, end="now"):
+    """Only the daily log partitions that can hold events in [start, end]"""
+    return indices_for_range(LOG_INDEX_PREFIX, start, end)
+
+
+def time_range(seconds, field="timestamp"):
+    return {"range": {field: {"gte": f"now-{int(seconds)}s", "lte": "now"}}}
+
+
+def pattern_query(pattern):
+    """Phrase prefilter for a rule regex: per alternative all of its word literals, ORed
+
+    Every line the regex matches passes it, but not only those, so hits
+    still have to be checked against the regex. Returns None when some
+    alternative has no literal a phrase query can stand in for.
+    """
+    alternatives = phrase_alternatives(pattern)
+    if not alternatives:
+        return None
+
+    clauses = [
+        {"bool": {"must": [{"match_phrase": {"raw_log": phrase}} for phrase in phrases]}}
+        for phrases in alternatives
+    ]
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"bool": {"should": clauses, "minimum_should_match": 1}}
+
+
+def rule_filters(rule):
+    window = parse_time_window(rule.get("time_window", "5m"))
+    filters = [time_range(window)]
+
+    for field, value in rule.get("filter", {}).items():
+        if isinstance(value, list):
+            filters.append({"terms": {keyword_field(field): value}})
+        else:
+            filters.append({"term": {keyword_field(field): value}})
+    return filters
+
+
+def compile_rule_query(rule):
+    """Build a size-0 aggregation search for a rule, or None if it can't be expressed
+
+    Rules with a pattern can't: ES has no way to run the rule's regex, so
+    those are counted client-side (see candidate_query and PatternCounter).
+    """
+    if rule.get("pattern"):
+        return None
+
+    threshold = max(1, int(rule.get("threshold", 1)))
+    filters = rule_filters(rule)
+
+    body = {
+        "size": 0,
+        "track_total_hits": True,
+        "query": {"bool": {"filter": filters}}
+    }
+
+    group_by = rule.get("group_by") or []
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+    distinct = rule.get("distinct")
+
+    if not group_by and not distinct:
+        return body
+
+    if len(group_by) > 1:
+        keys = {"multi_terms": {
+            "terms": [{"field": keyword_field(field)} for field in group_by],
+            "size": MAX_BUCKETS
+        }}
+    elif group_by:
+        keys = {"terms": {"field": keyword_field(group_by[0]), "size": MAX_BUCKETS}}
+    else:
+        # distinct without group_by: a single overall bucket
+        keys = {"filter": {"match_all": {}}}
+
+    if distinct:
+        keys["aggs"] = {
+            "distinct": {"cardinality": {"field": keyword_field(distinct)}}
+        }
+        if "filter" not in keys:
+            keys["aggs"]["over_threshold"] = {
+                "bucket_selector": {
+                    "buckets_path": {"distinct": "distinct"},
+                    "script": f"params.distinct >= {threshold}"
+                }
+            }
+    elif "terms" in keys:
+        keys["terms"]["min_doc_count"] = threshold
+    else:
+        keys["multi_terms"]["min_doc_count"] = threshold
+
+    body["aggs"] = {"keys": keys}
+    return body
+
+
+def candidate_query(rule):
+    """Query for the documents a pattern rule has to check: its filters plus the phrase prefilter, if any"""
+    filters = rule_filters(rule)
+    prefilter = pattern_query(rule["pattern"])
+    if prefilter is not None:
+        filters.append(prefilter)
+    return {"bool": {"filter": filters}}
+
+
+def candidate_fields(rule):
+    group_by = rule.get("group_by") or []
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+    fields = ["raw_log"] + group_by
+    if rule.get("distinct"):
+        fields.append(rule["distinct"])
+    return fields
+
+
+class PatternCounter:
+    """Counts a pattern rule over candidate documents the way rule_counts reads buckets
+
+    The rule regex is checked on each document exactly as the streaming
+    engine checks it; keys are formed like the engine's (multi-field keys
+    joined with "|"), and documents missing a key or distinct field are
+    skipped, as terms aggregations skip them.
+    """
+
+    def __init__(self, rule):
+        self.pattern = re.compile(rule["pattern"], re.IGNORECASE)
+        group_by = rule.get("group_by") or []
+        self.group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        self.distinct = rule.get("distinct")
+        self.threshold = max(1, int(rule.get("threshold", 1)))
+        # key -> count, or key -> set of distinct values
+        self.counts = {}
+
+    def add(self, docs):
+        for doc in docs:
+            if not self.pattern.search(doc.get("raw_log") or ""):
+                continue
+
+            values = [doc.get(field) for field in self.group_by]
+            if None in values:
+                continue
+            if not values:
+                key = None
+            elif len(values) == 1:
+                key = values[0]
+            else:
+                key = "|".join(str(value) for value in values)
+
+            if self.distinct:
+                value = doc.get(self.distinct)
+                if value is not None:
+                    self.counts.setdefault(key, set()).add(value)
+            else:
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def results(self):
+        """[(key, count)] that meet the threshold"""
+        results = []
+        for key, count in self.counts.items():
+            count = len(count) if self.distinct else count
+            if count >= self.threshold:
+                results.append((key, count))
+        return results
+
+
+def rule_counts(rule, response):
+    """Turn an aggregation response into [(key, count)] that meet the threshold"""
+    threshold = max(1, int(rule.get("threshold", 1)))
+    distinct = rule.get("distinct")
+
+    if "aggregations" not in response:
+        total = response["hits"]["total"]["value"]
+        return [(None, total)] if total >= threshold else []
+
+    keys = response["aggregations"]["keys"]
+    buckets = keys.get("buckets")
+    if buckets is None:
+        buckets = [dict(keys, key=None)]
+
+    results = []
+    for bucket in buckets:
+        count = bucket["distinct"]["value"] if distinct else bucket["doc_count"]
+        if count >= threshold:
+            key = bucket.get("key_as_string", bucket["key"])
+            results.append((key, count))
+    return results
@@ -0,0 +1,418 @@
+# src/spool.py
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+
+from src.bulk_indexer import encode_item, failed_items, record_bulk
+from src.metrics import gauge
+
+
+# Each record: payload length and CRC32, then the payload (bulk NDJSON lines)
+RECORD_HEADER = struct.Struct(">II")
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor.json"
+
+SPOOL_PENDING = gauge("siem_spool_pending_bytes", "Bytes spooled but not yet indexed", ("path",))
+
+
+def segment_name(seq):
+    return f"{seq:012d}{SEGMENT_SUFFIX}"
+
+
+def fsync_dir(path):
+    dir_fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class Spool:
+    """Append-only write-ahead log of encoded bulk batches
+
+    Batches are appended as CRC-checked records to numbered segment files.
+    add_batch() returns only once the record is fsync'ed; concurrent writers
+    share fsyncs (group commit). A drainer reads records in order and acks
+    them once Elasticsearch has them; fully acked segments are deleted. When
+    more than `max_bytes` are waiting to be sent, writers block until the
+    drainer catches up, so a long outage fills the disk up to the cap and
+    then pauses reading instead of losing data or memory.
+    """
+
+    def __init__(self, path, segment_bytes=64 * 1024 * 1024, max_bytes=2 * 1024 ** 3,
+                 cursor_interval=1.0):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.cursor_interval = cursor_interval
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.closed = False
+
+        # Byte counters across all segments, for group commit
+        self.written = 0
+        self.synced = 0
+
+        # seq -> bytes in that segment
+        self.sizes = {}
+        for name in sorted(os.listdir(path)):
+            if name.endswith(SEGMENT_SUFFIX):
+                seq = int(name[:-len(SEGMENT_SUFFIX)])
+                self.sizes[seq] = os.path.getsize(os.path.join(path, name))
+
+        self.cursor = self._load_cursor()
+        if not self.sizes:
+            self.cursor = (self.cursor[0], 0)
+            self.sizes[self.cursor[0]] = 0
+            open(self._segment_path(self.cursor[0]), "ab").close()
+
+        first = min(self.sizes)
+        if self.cursor[0] < first:
+            self.cursor = (first, 0)
+        self._cursor_saved = time.monotonic()
+
+        self.write_seq = max(self.sizes)
+        self._recover(self.write_seq)
+        self.file = open(self._segment_path(self.write_seq), "ab")
+
+        SPOOL_PENDING.set_function(self.pending_bytes, path)
+
+        self.read_pos = self.cursor
+        self._reader = None
+        self._reader_seq = None
+
+        self.stats = {"appended": 0, "acked": 0, "corrupt": 0}
+
+    @classmethod
+    def from_config(cls, config, base_dir):
+        """Build a spool from the "spool" section of log_sources.json"""
+        path = config.get("path", os.path.join("data", "spool"))
+        return cls(
+            os.path.join(base_dir, path),
+            segment_bytes=config.get("segment_mb", 64) * 1024 * 1024,
+            max_bytes=config.get("max_mb", 2048) * 1024 * 1024
+        )
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, segment_name(seq))
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.path, CURSOR_FILE), "r", encoding="utf-8") as f:
+                cursor = json.load(f)
+            return (cursor["segment"], cursor["offset"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return (min(self.sizes) if self.sizes else 1, 0)
+
+    def _save_cursor(self):
+        tmp_path = os.path.join(self.path, f"{CURSOR_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment": self.cursor[0], "offset": self.cursor[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, CURSOR_FILE))
+        self._cursor_saved = time.monotonic()
+
+    def _recover(self, seq):
+        """Cut a torn record left at the end of the last segment by a crash"""
+        end = self._scan(seq)
+        if end < self.sizes[seq]:
+            print(f"⚠️ Spool segment {segment_name(seq)} had a torn tail, truncating")
+            with open(self._segment_path(seq), "r+b") as f:
+                f.truncate(end)
+                os.fsync(f.fileno())
+            self.sizes[seq] = end
+
+    def _scan(self, seq):
+        # Offset just past the last intact record
+        offset = 0
+        with open(self._segment_path(seq), "rb") as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return offset
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return offset
+                offset += RECORD_HEADER.size + length
+
+    def pending_bytes(self):
+        """Bytes spooled but not yet acked"""
+        with self._lock:
+            return self._pending_bytes()
+
+    def _pending_bytes(self):
+        seq, offset = self.cursor
+        return sum(size for s, size in self.sizes.items() if s >= seq) - offset
+
+    def _rotate(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.synced = self.written
+
+        self.write_seq += 1
+        self.sizes[self.write_seq] = 0
+        self.file = open(self._segment_path(self.write_seq), "ab")
+        fsync_dir(self.path)
+
+    def append(self, items):
+        """Durably append one batch of (action, source) pairs"""
+        payload = "\n".join(line for item in items for line in item).encode("utf-8")
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._changed:
+            # Over the cap: wait for the drainer, unless nothing is pending
+            # (a single oversized batch must still get through)
+            while (not self.closed and self._pending_bytes() > 0
+                   and self._pending_bytes() + len(record) > self.max_bytes):
+                self._changed.wait(1.0)
+
+            if self.closed:
+                raise RuntimeError("Spool is closed")
+
+            if self.sizes[self.write_seq] >= self.segment_bytes:
+                self._rotate()
+
+            self.file.write(record)
+            self.file.flush()
+            self.sizes[self.write_seq] += len(record)
+            self.written += len(record)
+            target = self.written
+            self.stats["appended"] += len(items)
+            self._changed.notify_all()
+
+        self.sync(target)
+
+    def sync(self, target=None):
+        """fsync up to `target` bytes; callers that arrive during an fsync share the next one"""
+        with self._sync_lock:
+            with self._lock:
+                target = self.written if target is None else target
+                if self.synced >= target:
+                    return
+                upto = self.written
+                # A duplicate stays valid if the segment rotates meanwhile
+                fd = os.dup(self.file.fileno())
+
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            with self._lock:
+                self.synced = max(self.synced, upto)
+
+    def add_batch(self, batch):
+        """Indexer interface used by IngestPipeline: [(index name, doc)]"""
+        if batch:
+            self.append([encode_item(index_name, doc) for index_name, doc in batch])
+
+    def _read_record(self, seq, offset):
+        if self._reader_seq != seq:
+            if self._reader is not None:
+                self._reader.close()
+            self._reader = open(self._segment_path(seq), "rb")
+            self._reader_seq = seq
+
+        self._reader.seek(offset)
+        header = self._reader.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        length, crc = RECORD_HEADER.unpack(header)
+        payload = self._reader.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return None
+        return payload
+
+    def read(self, max_docs=500, max_bytes=5 * 1024 * 1024, timeout=1.0):
+        """Next records after the read position, as ([(action, source)], end position)
+
+        Waits up to `timeout` for data. The position is passed to ack() once
+        the items are safely in Elasticsearch.
+        """
+        items = []
+        size = 0
+
+        with self._changed:
+            seq, offset = self.read_pos
+            if seq == self.write_seq and offset >= self.sizes[seq]:
+                self._changed.wait(timeout)
+            # Only the drainer deletes segments, so these stay readable
+            # after the lock is released
+            sizes = dict(self.sizes)
+            write_seq = self.write_seq
+
+        while len(items) < max_docs and size < max_bytes:
+            end = sizes.get(seq, 0)
+            if offset >= end:
+                if seq >= write_seq:
+                    break
+                seq, offset = seq + 1, 0
+                continue
+
+            payload = self._read_record(seq, offset)
+            if payload is None:
+                # Only possible after outside damage; skip the segment
+                print(f"❌ Corrupt record in spool segment {segment_name(seq)} at {offset}, skipping")
+                self.stats["corrupt"] += 1
+                offset = end
+                continue
+
+            lines = payload.decode("utf-8").split("\n")
+            items.extend(zip(lines[::2], lines[1::2]))
+            size += len(payload)
+            offset += RECORD_HEADER.size + len(payload)
+
+        with self._lock:
+            self.read_pos = (seq, offset)
+
+        return items, (seq, offset)
+
+    def rewind(self):
+        """Read again from the last ack, e.g. after a failed send"""
+        with self._lock:
+            self.read_pos = self.cursor
+
+    def ack(self, position, count=0):
+        """Everything before `position` is indexed; drop segments that are done"""
+        with self._changed:
+            self.cursor = position
+            self.stats["acked"] += count
+
+            for seq in [seq for seq in self.sizes if seq < position[0]]:
+                del self.sizes[seq]
+                if self._reader_seq == seq:
+                    self._reader.close()
+                    self._reader = None
+                    self._reader_seq = None
+                os.remove(self._segment_path(seq))
+
+            if time.monotonic() - self._cursor_saved >= self.cursor_interval:
+                self._save_cursor()
+
+            self._changed.notify_all()
+
+    def close(self):
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            if self._reader is not None:
+                self._reader.close()
+            self._save_cursor()
+
+
+class SpoolDrainer:
+    """Background thread that replays the spool into Elasticsearch in order
+
+    Failed sends are retried with backoff for as long as it takes; the
+    spool, not memory, holds everything that queues up behind them. Replay
+    is at-least-once: a crash between a bulk call and its ack resends it.
+    """
+
+    def __init__(self, es_client, spool, max_docs=500, max_bytes=5 * 1024 * 1024,
+                 backoff=0.5, max_backoff=30.0):
+        self.es_client = es_client
+        self.spool = spool
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.stats = {
+            "flushed": 0,
+            "retried": 0,
+            "dropped": 0,
+            "batches": 0
+        }
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, es_client, spool, config):
+        config = config or {}
+        return cls(
+            es_client,
+            spool,
+            max_docs=config.get("max_docs", 500),
+            max_bytes=config.get("max_bytes", 5 * 1024 * 1024),
+            backoff=config.get("backoff", 0.5),
+            max_backoff=config.get("max_backoff", 30.0)
+        )
+
+    def _run(self):
+        while not self._stop.is_set():
+            items, position = self.spool.read(self.max_docs, self.max_bytes, timeout=0.5)
+            if not items:
+                continue
+
+            if self._send(items):
+                self.spool.ack(position, len(items))
+            else:
+                # Stopped mid-retry; the batch is still in the spool
+                self.spool.rewind()
+
+    def _send(self, items):
+        pending = items
+        attempt = 0
+
+        while pending:
+            operations = []
+            for action, source in pending:
+                operations.append(action)
+                operations.append(source)
+
+            started = time.perf_counter()
+            try:
+                response = self.es_client.bulk(operations=operations)
+                failed, rejected = failed_items(pending, response)
+            except Exception as e:
+                if attempt == 0:
+                    print(f"❌ Bulk request failed, spooling until Elasticsearch is back: {e}")
+                failed, rejected = pending, 0
+            record_bulk("spool", started, len(pending), len(failed), rejected)
+
+            self.stats["batches"] += 1
+            self.stats["flushed"] += len(pending) - len(failed) - rejected
+            self.stats["dropped"] += rejected
+
+            if not failed:
+                if attempt:
+                    print("✅ Elasticsearch is back, replaying spool")
+                return True
+
+            delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+            if self._stop.wait(delay):
+                return False
+
+            attempt += 1
+            self.stats["retried"] += len(failed)
+            pending = failed
+
+        return True
+
+    def wait_idle(self, timeout=None):
+        """Block until everything spooled so far has been sent"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.spool.pending_bytes() > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
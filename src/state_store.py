@@ -0,0 +1,225 @@
+# src/state_store.py
+import math
+from array import array
+from collections import OrderedDict, deque
+
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _mix64(value):
+    # splitmix64 finalizer: Python's hash() of small ints is the int itself
+    h = hash(value) & MASK64
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & MASK64
+    return h ^ (h >> 31)
+
+
+class BucketCounter:
+    """Event count over a sliding window, kept as a ring of time buckets
+
+    The window is split into `buckets` slots; stale slots are zeroed as time
+    moves forward, so the count is exact to one bucket width and the memory
+    is a fixed-size integer array.
+    """
+
+    __slots__ = ("width", "counts", "head")
+
+    def __init__(self, window_seconds, buckets):
+        self.width = window_seconds / buckets
+        self.counts = array("I", bytes(4 * buckets))
+        self.head = None
+
+    def add(self, ts):
+        index = int(ts // self.width)
+        size = len(self.counts)
+
+        if self.head is None:
+            self.head = index
+        elif index > self.head:
+            # Zero every slot that fell out of the window
+            for stale in range(self.head + 1, min(index, self.head + size) + 1):
+                self.counts[stale % size] = 0
+            self.head = index
+        elif index <= self.head - size:
+            # Too late to count: older than the whole window
+            return sum(self.counts)
+
+        self.counts[index % size] += 1
+        return sum(self.counts)
+
+
+class DistinctSet:
+    """Exact distinct count over a window for small thresholds
+
+    Stores value -> last seen time and never holds more than `limit` values,
+    because the rule fires as soon as the limit is reached.
+    """
+
+    __slots__ = ("window", "limit", "seen")
+
+    def __init__(self, window_seconds, limit):
+        self.window = window_seconds
+        self.limit = limit
+        self.seen = {}
+
+    def add(self, value, ts):
+        self.seen[value] = ts
+
+        if len(self.seen) >= self.limit:
+            cutoff = ts - self.window
+            self.seen = {v: t for v, t in self.seen.items() if t >= cutoff}
+
+        return len(self.seen)
+
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch (about 1.04 / sqrt(2**precision) error)"""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision=7):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        h = _mix64(value)
+        index = h & ((1 << self.precision) - 1)
+        rest = h >> self.precision
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class WindowedSketch:
+    """Approximate distinct count over a window using one sketch per bucket"""
+
+    __slots__ = ("width", "precision", "sketches")
+
+    def __init__(self, window_seconds, buckets=4, precision=7):
+        self.width = window_seconds / buckets
+        self.precision = precision
+        # (bucket index, sketch), oldest first
+        self.sketches = deque(maxlen=buckets)
+
+    def add(self, value, ts):
+        index = int(ts // self.width)
+
+        if not self.sketches or self.sketches[-1][0] < index:
+            self.sketches.append((index, HyperLogLog(self.precision)))
+
+        oldest = index - self.sketches.maxlen + 1
+        while self.sketches[0][0] < oldest:
+            self.sketches.popleft()
+
+        self.sketches[-1][1].add(value)
+
+        merged = HyperLogLog(self.precision)
+        for _, sketch in self.sketches:
+            merged.merge(sketch)
+        return merged.count()
+
+
+class KeyState:
+
+    __slots__ = ("counter", "distinct", "samples", "last_seen")
+
+    def __init__(self, counter, distinct, max_samples):
+        self.counter = counter
+        self.distinct = distinct
+        self.samples = deque(maxlen=max_samples)
+        self.last_seen = 0.0
+
+
+class KeyedWindowStore:
+    """Per-key window state with LRU and idle-TTL eviction
+
+    At most `max_keys` keys are tracked; the least recently active key is
+    dropped when a new one arrives at capacity, and keys idle for longer than
+    `idle_ttl` seconds are swept out, so memory stays bounded no matter how
+    many distinct keys (e.g. source IPs) pass through.
+    """
+
+    # Distinct thresholds above this switch from exact sets to sketches
+    SKETCH_THRESHOLD = 64
+
+    def __init__(self, window_seconds, threshold, distinct=False, buckets=10,
+                 max_keys=100000, idle_ttl=None, max_samples=5):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.distinct = distinct
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl or 2 * window_seconds
+        self.max_samples = max_samples
+
+        self.states = OrderedDict()
+        self.evicted = 0
+        self._operations = 0
+
+    def _new_state(self):
+        if not self.distinct:
+            return KeyState(BucketCounter(self.window_seconds, self.buckets), None, self.max_samples)
+
+        if self.threshold <= self.SKETCH_THRESHOLD:
+            distinct = DistinctSet(self.window_seconds, self.threshold)
+        else:
+            distinct = WindowedSketch(self.window_seconds)
+        return KeyState(None, distinct, self.max_samples)
+
+    def observe(self, key, ts, value=None, sample=None):
+        """Record an event for key; returns (count in window, state)"""
+        state = self.states.get(key)
+
+        if state is None:
+            if len(self.states) >= self.max_keys:
+                self.states.popitem(last=False)
+                self.evicted += 1
+            state = self.states[key] = self._new_state()
+        else:
+            self.states.move_to_end(key)
+
+        state.last_seen = ts
+        if sample is not None:
+            state.samples.append(sample)
+
+        if state.distinct is not None:
+            count = state.distinct.add(value, ts)
+        else:
+            count = state.counter.add(ts)
+
+        self._operations += 1
+        if self._operations % 1024 == 0:
+            self.expire(ts)
+
+        return count, state
+
+    def expire(self, now):
+        """Drop keys that have been idle for longer than idle_ttl"""
+        cutoff = now - self.idle_ttl
+        while self.states:
+            key, state = next(iter(self.states.items()))
+            if state.last_seen >= cutoff:
+                break
+            self.states.popitem(last=False)
+            self.evicted += 1
+
+    def reset(self, key):
+        self.states.pop(key, None)
+
+    def __len__(self):
+        return len(self.states)
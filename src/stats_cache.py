@@ -0,0 +1,174 @@
+# src/stats_cache.py
+import time
+import threading
+from array import array
+from collections import deque
+
+
+SEVERITIES = ("critical", "high", "medium", "low")
+
+
+class TTLCache:
+    """Small TTL cache that runs one loader per key even under concurrent misses
+
+    Callers arriving while a value is being loaded wait for that load instead
+    of issuing their own identical query.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+
+                event = self._loading.get(key)
+                leader = event is None
+                if leader:
+                    event = self._loading[key] = threading.Event()
+
+            if not leader:
+                event.wait()
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is not None:
+                    return entry[1]
+                # The leader failed; try loading ourselves
+                continue
+
+            try:
+                value = loader()
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                return value
+            finally:
+                with self._lock:
+                    del self._loading[key]
+                event.set()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class MinuteRollups:
+    """Per-minute log and alert counts over a trailing window, updated in place
+
+    Counts live in fixed rings of `minutes` slots with running totals, so
+    reading the 24h totals is O(1) and recording is a couple of additions.
+    Logs are bucketed by the minute they were ingested, alerts by the minute
+    they were raised. The most recent logs and alerts are kept for the
+    dashboard lists.
+    """
+
+    def __init__(self, minutes=1440, recent_logs=100, recent_alerts=50):
+        self.minutes = minutes
+        self.logs = array("q", bytes(8 * minutes))
+        self.alerts = {severity: array("q", bytes(8 * minutes)) for severity in SEVERITIES}
+        self.log_total = 0
+        self.alert_totals = dict.fromkeys(SEVERITIES, 0)
+        self.head = int(time.time() // 60)
+
+        self.recent_logs = deque(maxlen=recent_logs)
+        self.recent_alerts = deque(maxlen=recent_alerts)
+        self.seeded_at = None
+        self._lock = threading.Lock()
+
+    def _advance(self, minute):
+        # Expire the slots that scrolled out of the window
+        if minute <= self.head:
+            return
+
+        for stale in range(self.head + 1, min(minute, self.head + self.minutes) + 1):
+            slot = stale % self.minutes
+            self.log_total -= self.logs[slot]
+            self.logs[slot] = 0
+            for severity, counts in self.alerts.items():
+                self.alert_totals[severity] -= counts[slot]
+                counts[slot] = 0
+
+        self.head = minute
+
+    def record_logs(self, docs):
+        if not docs:
+            return
+
+        minute = int(time.time() // 60)
+        with self._lock:
+            self._advance(minute)
+            self.logs[minute % self.minutes] += len(docs)
+            self.log_total += len(docs)
+            self.recent_logs.extend(docs[-self.recent_logs.maxlen:])
+
+    def record_alert(self, alert):
+        severity = str(alert.get("severity", "low")).lower()
+        if severity not in self.alerts:
+            severity = "low"
+
+        minute = int(time.time() // 60)
+        with self._lock:
+            self._advance(minute)
+            self.alerts[severity][minute % self.minutes] += 1
+            self.alert_totals[severity] += 1
+            self.recent_alerts.append(alert)
+
+    def seed(self, log_buckets, alert_buckets, recent_logs, recent_alerts):
+        """Replace the rollups with per-minute counts fetched from storage
+
+        log_buckets is [(epoch minute, count)], alert_buckets is
+        [(epoch minute, severity, count)]; recent lists are newest first.
+        """
+        minute = int(time.time() // 60)
+
+        with self._lock:
+            self.head = minute
+            self.logs = array("q", bytes(8 * self.minutes))
+            self.alerts = {severity: array("q", bytes(8 * self.minutes)) for severity in SEVERITIES}
+            self.log_total = 0
+            self.alert_totals = dict.fromkeys(SEVERITIES, 0)
+
+            oldest = minute - self.minutes
+            for bucket_minute, count in log_buckets:
+                if oldest < bucket_minute <= minute:
+                    self.logs[bucket_minute % self.minutes] += count
+                    self.log_total += count
+
+            for bucket_minute, severity, count in alert_buckets:
+                severity = severity if severity in self.alerts else "low"
+                if oldest < bucket_minute <= minute:
+                    self.alerts[severity][bucket_minute % self.minutes] += count
+                    self.alert_totals[severity] += count
+
+            self.recent_logs.clear()
+            self.recent_logs.extend(reversed(recent_logs))
+            self.recent_alerts.clear()
+            self.recent_alerts.extend(reversed(recent_alerts))
+            self.seeded_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            self._advance(int(time.time() // 60))
+            return {
+                "total_alerts": sum(self.alert_totals.values()),
+                "total_logs": self.log_total,
+                "severity_breakdown": {
+                    severity: count for severity, count in self.alert_totals.items() if count
+                }
+            }
+
+    def latest_logs(self, size):
+        with self._lock:
+            return list(self.recent_logs)[::-1][:size]
+
+    def latest_alerts(self, size):
+        with self._lock:
+            return list(self.recent_alerts)[::-1][:size]
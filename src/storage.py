@@ -0,0 +1,165 @@
+# src/storage.py
+import os
+import json
+import functools
+import threading
+
+
+# Project base directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_PATH = os.path.join(BASE_DIR, "config", "log_sources.json")
+
+# "elasticsearch" always uses the cluster (an outage is ridden out by the
+# bulk retries and the spool) and "local" always uses the embedded SQLite
+# store. "auto" uses the cluster when it answers a ping at startup and the
+# local store otherwise, for the rest of the process: meant for trying the
+# tool out, since a cluster that is only briefly down at startup leaves
+# events split across two stores
+DEFAULTS = {
+    "backend": "elasticsearch",
+    "url": "http://localhost:9200",
+    "request_timeout": 30,
+    "connections": 10,
+    "path": "data/siem.db"
+}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def load_config(config_path=CONFIG_PATH):
+    """The "storage" section of log_sources.json (empty if unreadable)"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("storage", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def settings(config=None):
+    return dict(DEFAULTS, **(config or {}))
+
+
+def elasticsearch_client(options):
+    from elasticsearch import Elasticsearch
+
+    return Elasticsearch(
+        options["url"],
+        request_timeout=options["request_timeout"],
+        connections_per_node=options["connections"]
+    )
+
+
+def local_client(options):
+    from src.local_store import LocalStore
+
+    path = options["path"]
+    if path != ":memory:" and not os.path.isabs(path):
+        path = os.path.join(BASE_DIR, path)
+    return LocalStore(path)
+
+
+def create_client(config=None):
+    """A new client for the configured backend
+
+    Most code should call get_client() instead; this is for processes that
+    need a client of their own (backfill workers) and for tools.
+    """
+    options = settings(config)
+    backend = options["backend"]
+
+    if backend == "local":
+        return local_client(options)
+    if backend not in ("elasticsearch", "auto"):
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    client = elasticsearch_client(options)
+    if backend == "auto":
+        try:
+            reachable = client.ping()
+        except Exception:
+            reachable = False
+
+        if not reachable:
+            print(f"⚠️ Elasticsearch not reachable at {options['url']}: storage backend \"auto\" "
+                  f"switches to the local store ({options['path']}) until restarted. "
+                  f"Events written now will NOT be in Elasticsearch; set \"backend\": "
+                  f"\"elasticsearch\" to wait for the cluster instead")
+            client.close()
+            return local_client(options)
+    return client
+
+
+def get_client(config=None):
+    """The process-wide client, created from `config` (or log_sources.json) on first use
+
+    The collector, parser, detector and dashboard all hold this one client,
+    so they share its connection pool instead of opening one each.
+    """
+    global _shared
+
+    with _shared_lock:
+        if _shared is None:
+            _shared = create_client(config if config is not None else load_config())
+        return _shared
+
+
+def set_client(client):
+    """Make `client` the process-wide client (benchmarks and embedding)"""
+    global _shared
+
+    with _shared_lock:
+        _shared = client
+
+
+def is_local(client):
+    from src.local_store import LocalStore
+
+    return isinstance(client, LocalStore)
+
+
+def backend_name(client):
+    return "local" if is_local(client) else "elasticsearch"
+
+
+class SharedClient:
+    """Stands in for the process-wide client until something actually uses it
+
+    Lets modules hold a client at import time without connecting (or
+    pinging) before the configuration has been read.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+
+class AsyncLocalClient:
+    """Async face of a LocalStore for the asyncio bulk sender; calls run in threads"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def bulk(self, **kwargs):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.store.bulk, **kwargs))
+
+    async def close(self):
+        pass
+
+
+def create_async_client(client, config=None, connections=None):
+    """Async client matching the backend `client` uses"""
+    if is_local(client):
+        return AsyncLocalClient(client)
+
+    from elasticsearch import AsyncElasticsearch
+
+    options = settings(config)
+    return AsyncElasticsearch(
+        options["url"],
+        request_timeout=options["request_timeout"],
+        connections_per_node=connections or options["connections"]
+    )
@@ -0,0 +1,247 @@
+# src/tailer.py
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+# Bytes at the start of a file used to tell a reused inode from the same file
+FINGERPRINT_BYTES = 64
+
+
+def checkpoint_key(stat_result):
+    """Identify a file by device and inode so renames keep their offset"""
+    return f"{stat_result.st_dev}:{stat_result.st_ino}"
+
+
+class CheckpointStore:
+    """Persisted read offsets keyed by device/inode
+
+    Updates are kept in memory and written out (atomically, with fsync) once
+    `sync_every` updates have accumulated or `sync_interval` seconds have
+    passed, so a busy tailer does not fsync on every batch.
+    """
+
+    def __init__(self, path, sync_every=100, sync_interval=1.0, max_age_days=30):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.max_age = max_age_days * 86400
+
+        self._lock = threading.Lock()
+        # Held across write, fsync and rename: syncs from several threads
+        # would otherwise share the temp file or land out of order
+        self._sync_lock = threading.Lock()
+        self._dirty = 0
+        self._last_sync = time.monotonic()
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"❌ Ignoring unreadable checkpoint file {self.path}: {e}")
+            return {}
+
+        # Forget files that have not been seen for a long time
+        cutoff = time.time() - self.max_age
+        return {
+            key: entry for key, entry in entries.items()
+            if entry.get("updated", 0) >= cutoff
+        }
+
+    def get(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def update(self, key, path, offset, fingerprint):
+        with self._lock:
+            self.entries[key] = {
+                "path": path,
+                "offset": offset,
+                "fingerprint": fingerprint,
+                "updated": time.time()
+            }
+            self._dirty += 1
+
+            due = (self._dirty >= self.sync_every
+                   or time.monotonic() - self._last_sync >= self.sync_interval)
+
+        if due:
+            self.sync()
+
+    def sync(self):
+        with self._sync_lock:
+            # Snapshot taken under the sync lock, so the file only moves forward
+            with self._lock:
+                if not self._dirty:
+                    return
+
+                snapshot = json.dumps(self.entries)
+                self._dirty = 0
+                self._last_sync = time.monotonic()
+
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.path)
+
+            # Make the rename itself durable
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def close(self):
+        self.sync()
+
+
+class FileTailer:
+    """Follow one log path in bounded-size chunks
+
+    Lines are read `chunk_size` bytes at a time from a file handle that stays
+    open between polls. A trailing line without its newline is held back until
+    the rest arrives, and the committed offset never includes it, so a restart
+    re-reads the partial line instead of losing it. Truncation (the file
+    shrinks below our position) restarts from byte 0; rotation (the path now
+    points at a different inode) drains the old file before switching over.
+    """
+
+    def __init__(self, path, checkpoints, chunk_size=64 * 1024,
+                 max_line_bytes=1024 * 1024, start_at_end=False):
+        self.path = path
+        self.checkpoints = checkpoints
+        self.chunk_size = chunk_size
+        self.max_line_bytes = max_line_bytes
+        self.start_at_end = start_at_end
+
+        self.file = None
+        self.key = None
+        self.fingerprint = None
+        self.offset = 0
+        self.read_offset = 0
+        self._pending_offset = 0
+        self._partial = b""
+
+    def _fingerprint(self):
+        head = os.pread(self.file.fileno(), FINGERPRINT_BYTES, 0)
+        return [len(head), hashlib.md5(head).hexdigest()]
+
+    def _matches_fingerprint(self, fingerprint, offset):
+        if not fingerprint:
+            return False
+        length, digest = fingerprint
+        # A fingerprint taken while the file was shorter can't vouch for the offset
+        if length < min(offset, FINGERPRINT_BYTES):
+            return False
+        head = os.pread(self.file.fileno(), length, 0)
+        return len(head) == length and hashlib.md5(head).hexdigest() == digest
+
+    def _open(self, rotated=False):
+        self.file = open(self.path, "rb", buffering=0)
+        stat = os.fstat(self.file.fileno())
+        self.key = checkpoint_key(stat)
+
+        entry = self.checkpoints.get(self.key)
+        if entry and self._matches_fingerprint(entry.get("fingerprint"), entry["offset"]):
+            offset = entry["offset"]
+        elif self.start_at_end and not rotated:
+            offset = stat.st_size
+        else:
+            offset = 0
+
+        if offset > stat.st_size:
+            print(f"⚠️ {self.path} shrank while we were away, reading from the start")
+            offset = 0
+
+        self.file.seek(offset)
+        self.fingerprint = self._fingerprint()
+        self.offset = self.read_offset = self._pending_offset = offset
+        self._partial = b""
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def read_batches(self):
+        """Yield lists of new complete lines; call commit() after each batch"""
+        if self.file is None:
+            if not os.path.exists(self.path):
+                return
+            self._open()
+
+        if os.fstat(self.file.fileno()).st_size < self.read_offset:
+            print(f"⚠️ {self.path} was truncated, reading from the start")
+            self.file.seek(0)
+            self.offset = self.read_offset = self._pending_offset = 0
+            self._partial = b""
+
+        yield from self._drain()
+
+        try:
+            current = checkpoint_key(os.stat(self.path))
+        except FileNotFoundError:
+            current = None
+
+        if current == self.key:
+            return
+
+        # Rotated or removed: whatever is left of the old file is final
+        if self._partial:
+            self._pending_offset = self.read_offset
+            yield [self._decode(self._partial)]
+            self._partial = b""
+
+        self.close()
+
+        if current is not None:
+            print(f"🔄 {self.path} was rotated, following the new file")
+            self._open(rotated=True)
+            yield from self._drain()
+
+    def _drain(self):
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                return
+
+            self.read_offset += len(chunk)
+
+            lines = (self._partial + chunk).split(b"\n")
+            self._partial = lines.pop()
+
+            # Don't let a runaway line without newlines grow without bound
+            if len(self._partial) > self.max_line_bytes:
+                lines.append(self._partial)
+                self._partial = b""
+
+            if lines:
+                self._pending_offset = self.read_offset - len(self._partial)
+                yield [self._decode(line) for line in lines]
+
+    def _decode(self, line):
+        return line.decode("utf-8", errors="ignore").rstrip("\r")
+
+    def commit(self):
+        """Record everything yielded so far as processed"""
+        if self.key is None or self._pending_offset == self.offset:
+            return
+
+        self.offset = self._pending_offset
+        # Taken at open, the fingerprint of a new or short file covers fewer
+        # bytes than it should; it grows with the file until it is complete
+        if self.fingerprint[0] < FINGERPRINT_BYTES and self.file is not None:
+            self.fingerprint = self._fingerprint()
+        self.checkpoints.update(self.key, self.path, self.offset, self.fingerprint)
@@ -1,26 +1,71 @@
 # src/threat_detector.py
+import os
 import re
 import json
-from datetime import datetime, timedelta
-from elasticsearch import Elasticsearch
-from collections import defaultdict
+import math
+import time
+import threading
+from datetime import datetime, timezone
+
+from src.alert_manager import AlertManager
+from src.metrics import histogram
+from src.rule_engine import StreamingRuleEngine, parse_time_window
+from src.rule_queries import (
+    LOG_INDEX_PATTERN, PatternCounter, candidate_fields, candidate_query, compile_rule_query,
+    keyword_field, log_indices, rule_counts, time_range
+)
+
+# Project base directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_STATE_PATH = os.path.join(BASE_DIR, "data", "detector_state.json")
+DEFAULT_RULES_PATH = os.path.join(BASE_DIR, "config", "threat_rules.json")
+
+DETECTION_SECONDS = histogram("siem_detection_seconds",
+                              "Duration of a detection cycle (streaming: one ingest batch)", ("mode",))
 
 class ThreatDetector:
-    def __init__(self, es_client):
+    def __init__(self, es_client, state_path=DEFAULT_STATE_PATH, rules_path=DEFAULT_RULES_PATH):
         self.es_client = es_client
-        self.rules = self.load_rules("config/threat_rules.json")
+        self.rules_path = os.path.join(BASE_DIR, rules_path)
+        self.rules = self.load_rules(rules_path)
         self.alert_thresholds = {
             "failed_login": 5,  # Alert after 5 failed logins
             "port_scan": 10,    # Alert after 10 port scan attempts
             "suspicious_ip": 3  # Alert after 3 events from suspicious IP
         }
+
+        # Streaming detection, fed directly by the ingest pipeline
+        self.engine = StreamingRuleEngine(self.rules["rules"])
+        self.engine_lock = threading.Lock()
+        self.alert_listeners = []
+        self.pattern_cache = {}
+
+        # "streaming" evaluates rules at ingest; "aggregate" polls ES with
+        # server-side aggregations (pattern rules check their regex on the
+        # documents ES preselects) and "incremental" pages through new
+        # documents every `interval` seconds
+        self.settings = self.rules.get("detection", {"mode": "streaming", "interval": 30})
+
+        # Incremental detection cursor: high-water mark on indexed_at (epoch
+        # millis, stamped by storage on write) plus the ids already seen at
+        # exactly that instant
+        self.state_path = state_path
+        self.cursor = self.load_cursor()
+
+        # Repeats of a rule and key are merged into one incident document
+        self.alerts = AlertManager.from_config(es_client, self.rules.get("alerts"), self.rules["rules"])
         
     def load_rules(self, rules_path):
+        # Relative paths are taken from the project root, not the working directory
+        if not os.path.isabs(rules_path):
+            rules_path = os.path.join(BASE_DIR, rules_path)
         try:
             with open(rules_path, 'r') as f:
                 return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+        except (FileNotFoundError, json.JSONDecodeError) as e:
             # Default rules if file doesn't exist
+            print(f"⚠️ Could not load {rules_path} ({e}); using the built-in default rules")
             return {
                 "rules": [
                     {
@@ -50,53 +95,168 @@ class ThreatDetector:
                 ]
             }
     
-    def detect_threats(self, time_window_minutes=10):
-        alerts = []
-        current_time = datetime.now()
-        time_window = current_time - timedelta(minutes=time_window_minutes)
-        
-        # Get recent logs from Elasticsearch
+    def reload_rules(self, rules):
+        """Swap in a new threat_rules.json without a restart
+
+        The new engine (and its combined matcher) is compiled without holding
+        the engine lock, then swapped in under it, so ingest is only paused
+        for the swap. Rules whose detection logic is unchanged keep their
+        windows; the detection mode and interval still need a restart.
+        """
+        engine = StreamingRuleEngine(rules["rules"], self.engine.max_samples, previous=self.engine)
+
+        with self.engine_lock:
+            # Carried-over windows are shared with the old engine, so events
+            # it counted while the new one was compiled are not lost
+            self.engine = engine
+            self.rules = rules
+        self.alerts.reconfigure(rules.get("alerts"), rules["rules"])
+
+        settings = rules.get("detection", {"mode": "streaming", "interval": 30})
+        if settings != self.settings:
+            print("⚠️ Detection mode and interval changes take effect after a restart")
+
+        print(f"✅ Loaded {len(engine.rules)} rules ({engine.kept} kept their window state)")
+        return engine
+
+    def add_alert_listener(self, listener):
+        self.alert_listeners.append(listener)
+
+    @DETECTION_SECONDS.timed("streaming")
+    def process_events(self, docs):
+        """Run freshly ingested events through the streaming rule engine"""
+        with self.engine_lock:
+            alerts = self.engine.process_batch(docs)
+
+        return self.emit_alerts(alerts)
+
+    def emit_alerts(self, alerts):
+        """Store alerts as incidents and announce the ones that opened a new incident"""
+        emitted = self.alerts.process(alerts)
+
+        for alert in emitted:
+            for listener in self.alert_listeners:
+                listener(alert)
+
+        return emitted
+
+    def close(self):
+        self.alerts.close()
+
+    def load_cursor(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Cursors saved before indexed_at existed were on ingest_timestamp
+        if "indexed_at" not in cursor:
+            cursor = {"indexed_at": cursor.get("ingest_timestamp", 0), "ids": []}
+        return cursor
+
+    def save_cursor(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cursor, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    @DETECTION_SECONDS.timed("incremental")
+    def detect_threats(self, time_window_minutes=10, page_size=1000, settle_seconds=10):
+        """Scan only documents written since the last run
+
+        Paging is by indexed_at, the time storage wrote the document, not
+        ingest_timestamp: a document replayed from the spool or retried by
+        the bulk indexer is written late with an old ingest_timestamp, but
+        its indexed_at is still ahead of the cursor. Documents written in the
+        last `settle_seconds` (longer than the indices' refresh_interval) are
+        left for the next cycle so ones not yet searchable are not skipped
+        past. On the first run the last `time_window_minutes` are scanned.
+        Window state carries over between cycles in the engine.
+        """
+        if self.cursor is None:
+            start = int((time.time() - time_window_minutes * 60) * 1000)
+            self.cursor = {"indexed_at": start, "ids": []}
+
+        seen_at_mark = set(self.cursor["ids"])
         query = {
-            "query": {
-                "range": {
-                    "timestamp": {
-                        "gte": time_window.isoformat(),
-                        "lte": current_time.isoformat()
-                    }
+            "range": {
+                "indexed_at": {
+                    "gte": self.cursor["indexed_at"],
+                    "lte": int((time.time() - settle_seconds) * 1000),
+                    "format": "epoch_millis"
                 }
             }
         }
-        
-        # Search across all indices
-        results = self.es_client.search(index="*", body=query)
-        
-        # Process each rule
-        for rule in self.rules["rules"]:
-            rule_matches = self.apply_rule(rule, results["hits"]["hits"])
-            if rule_matches:
-                alerts.append({
-                    "rule_name": rule["name"],
-                    "description": rule["description"],
-                    "severity": rule["severity"],
-                    "matches": rule_matches,
-                    "timestamp": current_time.isoformat()
-                })
-        
-        # Store alerts in Elasticsearch
-        for alert in alerts:
-            self.es_client.index(index="siem-alerts", document=alert)
-        
-        return alerts
-    
+
+        # Partitions are by event time, which says nothing about when a
+        # document was written, so every partition is searched here
+        pit = self.es_client.open_point_in_time(index=LOG_INDEX_PATTERN, keep_alive="1m")
+        pit_id = pit["id"]
+        alerts = []
+        search_after = None
+
+        try:
+            while True:
+                body = {
+                    "size": page_size,
+                    "query": query,
+                    "pit": {"id": pit_id, "keep_alive": "1m"},
+                    "sort": [{"indexed_at": "asc"}, {"_shard_doc": "asc"}]
+                }
+                if search_after is not None:
+                    body["search_after"] = search_after
+
+                results = self.es_client.search(body=body)
+                pit_id = results.get("pit_id", pit_id)
+                hits = results["hits"]["hits"]
+                if not hits:
+                    break
+
+                docs = []
+                for hit in hits:
+                    mark = hit["sort"][0]
+                    if mark == self.cursor["indexed_at"]:
+                        if hit["_id"] in seen_at_mark:
+                            continue
+                        seen_at_mark.add(hit["_id"])
+                    else:
+                        self.cursor["indexed_at"] = mark
+                        seen_at_mark = {hit["_id"]}
+                    docs.append(hit["_source"])
+
+                with self.engine_lock:
+                    alerts.extend(self.engine.process_batch(docs))
+
+                self.cursor["ids"] = sorted(seen_at_mark)
+                self.save_cursor()
+
+                search_after = hits[-1]["sort"]
+                if len(hits) < page_size:
+                    break
+        finally:
+            self.es_client.close_point_in_time(id=pit_id)
+
+        return self.emit_alerts(alerts)
+
+    def compiled_pattern(self, pattern):
+        compiled = self.pattern_cache.get(pattern)
+        if compiled is None:
+            compiled = self.pattern_cache[pattern] = re.compile(pattern, re.IGNORECASE)
+        return compiled
+
     def apply_rule(self, rule, log_entries):
-        pattern = re.compile(rule["pattern"], re.IGNORECASE)
+        pattern = self.compiled_pattern(rule["pattern"]) if rule.get("pattern") else None
         matches = []
         
         for entry in log_entries:
             log_data = entry["_source"]
             log_text = log_data.get("raw_log", "")
             
-            if pattern.search(log_text):
+            if pattern is None or pattern.search(log_text):
                 matches.append({
                     "timestamp": log_data.get("timestamp"),
                     "source": log_data.get("source_file"),
@@ -109,30 +269,113 @@ class ThreatDetector:
         
         return []
     
+    def pattern_counts(self, rule, index, page_size=1000):
+        """[(key, count)] for a pattern rule, checking its regex on the candidate documents"""
+        counter = PatternCounter(rule)
+        pit_id = self.es_client.open_point_in_time(index=index, keep_alive="1m")["id"]
+        search_after = None
+
+        try:
+            while True:
+                body = {
+                    "size": page_size,
+                    "query": candidate_query(rule),
+                    "_source": candidate_fields(rule),
+                    "pit": {"id": pit_id, "keep_alive": "1m"},
+                    "sort": [{"_shard_doc": "asc"}]
+                }
+                if search_after is not None:
+                    body["search_after"] = search_after
+
+                results = self.es_client.search(body=body)
+                pit_id = results.get("pit_id", pit_id)
+                hits = results["hits"]["hits"]
+                counter.add(hit["_source"] for hit in hits)
+
+                if len(hits) < page_size:
+                    break
+                search_after = hits[-1]["sort"]
+        finally:
+            self.es_client.close_point_in_time(id=pit_id)
+
+        return counter.results()
+
+    @DETECTION_SECONDS.timed("aggregate")
+    def detect_aggregated(self):
+        """Evaluate every rule in ES: as an aggregation that returns only counts,
+        or for pattern rules by checking the regex on the documents ES preselects"""
+        alerts = []
+        current_time = datetime.now(timezone.utc)
+
+        for rule in self.rules["rules"]:
+            window = parse_time_window(rule.get("time_window", "5m"))
+            index = log_indices(f"now-{math.ceil(window)}s")
+            body = compile_rule_query(rule)
+
+            try:
+                if body is not None:
+                    counts = rule_counts(rule, self.es_client.search(index=index, body=body))
+                else:
+                    counts = self.pattern_counts(rule, index)
+            except Exception as e:
+                print(f"❌ Aggregation query failed for {rule['name']}: {e}")
+                continue
+
+            for key, count in counts:
+                alert = {
+                    "rule_name": rule["name"],
+                    "description": rule.get("description", ""),
+                    "severity": rule.get("severity", "medium"),
+                    "count": count,
+                    "timestamp": current_time.isoformat()
+                }
+                if key is not None:
+                    alert["key"] = key
+                alerts.append(alert)
+
+        return self.emit_alerts(alerts)
+
     def check_failed_logins(self, time_window_minutes=5):
-        current_time = datetime.now()
-        time_window = current_time - timedelta(minutes=time_window_minutes)
+        current_time = datetime.now(timezone.utc)
         
         query = {
+            "size": 0,
+            "track_total_hits": True,
             "query": {
                 "bool": {
-                    "must": [
-                        {"range": {"timestamp": {"gte": time_window.isoformat(), "lte": current_time.isoformat()}}},
-                        {"regexp": {"raw_log": ".*failed.*login.*|.*authentication.*failed.*"}}
+                    "filter": [
+                        time_range(time_window_minutes * 60),
+                        {
+                            "bool": {
+                                "should": [
+                                    {"match": {"raw_log": {"query": "failed login", "operator": "and"}}},
+                                    {"match": {"raw_log": {"query": "authentication failed", "operator": "and"}}}
+                                ],
+                                "minimum_should_match": 1
+                            }
+                        }
                     ]
                 }
+            },
+            "aggs": {
+                "by_source": {"terms": {"field": keyword_field("ip_address"), "size": 10}}
             }
         }
         
-        results = self.es_client.search(index="*", body=query)
+        results = self.es_client.search(index=log_indices(f"now-{time_window_minutes}m"), body=query)
+        count = results["hits"]["total"]["value"]
         
-        if len(results["hits"]["hits"]) >= self.alert_thresholds["failed_login"]:
+        if count >= self.alert_thresholds["failed_login"]:
             alert = {
                 "rule_name": "Multiple Failed Logins",
-                "description": f"Detected {len(results['hits']['hits'])} failed login attempts",
+                "description": f"Detected {count} failed login attempts",
                 "severity": "medium",
                 "timestamp": current_time.isoformat(),
-                "matches": [{"timestamp": hit["_source"]["timestamp"], "raw_log": hit["_source"]["raw_log"]} for hit in results["hits"]["hits"]]
+                "count": count,
+                "top_sources": {
+                    bucket["key"]: bucket["doc_count"]
+                    for bucket in results["aggregations"]["by_source"]["buckets"]
+                }
             }
             
             self.es_client.index(index="siem-alerts", document=alert)
@@ -141,42 +384,51 @@ class ThreatDetector:
         return None
     
     def check_port_scans(self, time_window_minutes=2):
-        current_time = datetime.now()
-        time_window = current_time - timedelta(minutes=time_window_minutes)
+        current_time = datetime.now(timezone.utc)
+        threshold = self.alert_thresholds["port_scan"]
         
         query = {
+            "size": 0,
             "query": {
                 "bool": {
-                    "must": [
-                        {"range": {"timestamp": {"gte": time_window.isoformat(), "lte": current_time.isoformat()}}},
-                        {"term": {"log_type": "firewall"}},
-                        {"term": {"action": "DENY"}}
+                    "filter": [
+                        time_range(time_window_minutes * 60),
+                        {"term": {keyword_field("log_type"): "firewall"}},
+                        {"term": {keyword_field("action"): "DENY"}}
                     ]
                 }
+            },
+            "aggs": {
+                # Group by source IP; only sources over the threshold come back
+                "by_source": {
+                    "terms": {
+                        "field": keyword_field("source_ip"),
+                        "min_doc_count": threshold,
+                        "size": 100
+                    },
+                    "aggs": {
+                        "ports": {"cardinality": {"field": keyword_field("destination_port")}}
+                    }
+                }
             }
         }
         
-        results = self.es_client.search(index="*", body=query)
+        results = self.es_client.search(index=log_indices(f"now-{time_window_minutes}m"), body=query)
         
-        # Group by source IP
-        ip_counts = defaultdict(int)
-        for hit in results["hits"]["hits"]:
-            src_ip = hit["_source"].get("src_ip", "unknown")
-            ip_counts[src_ip] += 1
-        
-        # Check if any IP exceeds threshold
-        for ip, count in ip_counts.items():
-            if count >= self.alert_thresholds["port_scan"]:
-                alert = {
-                    "rule_name": "Port Scan Detection",
-                    "description": f"Detected port scan from IP {ip} with {count} denied connections",
-                    "severity": "high",
-                    "timestamp": current_time.isoformat(),
-                    "source_ip": ip,
-                    "count": count
-                }
-                
-                self.es_client.index(index="siem-alerts", document=alert)
-                return alert
+        for bucket in results["aggregations"]["by_source"]["buckets"]:
+            ip = bucket["key"]
+            count = bucket["doc_count"]
+            alert = {
+                "rule_name": "Port Scan Detection",
+                "description": f"Detected port scan from IP {ip} with {count} denied connections",
+                "severity": "high",
+                "timestamp": current_time.isoformat(),
+                "source_ip": ip,
+                "count": count,
+                "distinct_ports": bucket["ports"]["value"]
+            }
+            
+            self.es_client.index(index="siem-alerts", document=alert)
+            return alert
         
-        return None
\ No newline at end of file
+        return None
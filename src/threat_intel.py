@@ -0,0 +1,263 @@
+# src/threat_intel.py
+import os
+import time
+import socket
+import threading
+from array import array
+from bisect import bisect_right
+
+
+# Parsed fields that hold IP addresses, in the order they are checked
+IP_FIELDS = ("ip_address", "source_ip", "destination_ip")
+
+# Separators that may follow the address on a blocklist line
+# ("1.2.3.0/24 ; SBL123", "1.2.3.4,scanner", "1.2.3.4 # note")
+ENTRY_SEPARATORS = (";", ",", "#", " ", "\t")
+
+
+def parse_ip(value):
+    """(version, integer) for an IPv4 or IPv6 address; raises OSError/ValueError"""
+    if ":" in value:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, value), "big")
+    return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+
+
+def parse_entry(entry):
+    """(version, first, last) for an address or CIDR block"""
+    address, _, prefix = entry.partition("/")
+    version, first = parse_ip(address)
+    bits = 32 if version == 4 else 128
+
+    length = int(prefix) if prefix else bits
+    if not 0 <= length <= bits:
+        raise ValueError(f"bad prefix length: {entry}")
+
+    host_bits = bits - length
+    first = first >> host_bits << host_bits
+    return version, first, first | ((1 << host_bits) - 1)
+
+
+def merge_ranges(ranges, bits=32):
+    """Sort ranges packed as first << bits | last and merge overlapping or adjacent ones
+
+    Packing keeps each pending range a single int while millions are loaded.
+    The list is sorted in place.
+    """
+    mask = (1 << bits) - 1
+    merged_first = []
+    merged_last = []
+
+    ranges.sort()
+    for packed in ranges:
+        first = packed >> bits
+        last = packed & mask
+        if merged_last and first <= merged_last[-1] + 1:
+            if last > merged_last[-1]:
+                merged_last[-1] = last
+        else:
+            merged_first.append(first)
+            merged_last.append(last)
+    return merged_first, merged_last
+
+
+class RangeSet:
+    """Disjoint address ranges kept as two sorted arrays, searched with bisect
+
+    IPv4 ranges live in unsigned 32-bit arrays (8 bytes per range), so a
+    list of millions of addresses and blocks stays in the tens of MB. IPv6
+    lists are rarely large and use plain int lists.
+    """
+
+    __slots__ = ("first", "last")
+
+    def __init__(self, first, last):
+        self.first = first
+        self.last = last
+
+    @classmethod
+    def build(cls, ranges, version=4):
+        first, last = merge_ranges(ranges, 32 if version == 4 else 128)
+        if version == 4:
+            return cls(array("I", first), array("I", last))
+        return cls(first, last)
+
+    def __len__(self):
+        return len(self.first)
+
+    def __contains__(self, address):
+        i = bisect_right(self.first, address) - 1
+        return i >= 0 and self.last[i] >= address
+
+    def nbytes(self):
+        if isinstance(self.first, array):
+            return (len(self.first) + len(self.last)) * self.first.itemsize
+        return 0
+
+
+class Blocklist:
+    """One named list of addresses and CIDR blocks loaded from a text file"""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.v4 = RangeSet.build([])
+        self.v6 = RangeSet.build([], version=6)
+        self.mtime = None
+        self.entries = 0
+        self.skipped = 0
+
+    def load(self):
+        """Read the file into fresh range sets; returns the new Blocklist"""
+        v4 = []
+        v6 = []
+        skipped = 0
+        mtime = os.stat(self.path).st_mtime
+
+        with open(self.path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                entry = line.strip()
+                if not entry or entry[0] in "#;":
+                    continue
+                for separator in ENTRY_SEPARATORS:
+                    entry = entry.split(separator, 1)[0]
+
+                try:
+                    version, first, last = parse_entry(entry)
+                except (OSError, ValueError):
+                    skipped += 1
+                    continue
+                if version == 4:
+                    v4.append(first << 32 | last)
+                else:
+                    v6.append(first << 128 | last)
+
+        loaded = Blocklist(self.name, self.path)
+        loaded.entries = len(v4) + len(v6)
+        loaded.v4 = RangeSet.build(v4)
+        loaded.v6 = RangeSet.build(v6, version=6)
+        loaded.mtime = mtime
+        loaded.skipped = skipped
+        return loaded
+
+    def contains(self, version, address):
+        return address in (self.v4 if version == 4 else self.v6)
+
+
+class ThreatIntel:
+    """Tag parsed events whose IP fields appear on a local blocklist
+
+    Each list is turned into sorted, merged integer ranges; a lookup is one
+    binary search per list. Results are cached per address string since the
+    same handful of addresses make up most traffic. Lists are reloaded in the
+    background when their files change and swapped in whole, so lookups never
+    see a half-built list.
+
+    A matching event gets threat_match, threat_ip, threat_field and
+    threat_lists, which rules can filter and group on.
+    """
+
+    def __init__(self, lists, fields=IP_FIELDS, reload_interval=60.0, cache_size=100000):
+        self.blocklists = [Blocklist(name, path) for name, path in lists]
+        self.fields = tuple(fields)
+        self.reload_interval = reload_interval
+        self.cache_size = cache_size
+        self.cache = {}
+        self._closed = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, base_dir):
+        """Build from the "threat_intel" section of log_sources.json, or None if disabled"""
+        if not config or not config.get("enabled", True):
+            return None
+
+        lists = [
+            (entry.get("name") or os.path.basename(entry["path"]), os.path.join(base_dir, entry["path"]))
+            for entry in config.get("lists", [])
+        ]
+        return cls(
+            lists,
+            fields=config.get("fields", IP_FIELDS),
+            reload_interval=config.get("reload_interval", 60.0),
+            cache_size=config.get("cache_size", 100000)
+        )
+
+    def load(self, force=False):
+        """(Re)load lists whose file changed; returns the names reloaded"""
+        reloaded = []
+        blocklists = list(self.blocklists)
+
+        for i, blocklist in enumerate(blocklists):
+            try:
+                if not force and os.stat(blocklist.path).st_mtime == blocklist.mtime:
+                    continue
+                started = time.perf_counter()
+                blocklists[i] = blocklist.load()
+            except OSError as e:
+                print(f"❌ Failed to load threat intel list {blocklist.name}: {e}")
+                continue
+
+            loaded = blocklists[i]
+            reloaded.append(loaded.name)
+            print(f"✅ Threat intel list {loaded.name}: {loaded.entries:,} entries "
+                  f"({len(loaded.v4) + len(loaded.v6):,} ranges, {loaded.skipped:,} skipped) "
+                  f"in {time.perf_counter() - started:.2f}s")
+
+        if reloaded:
+            self.blocklists = blocklists
+            self.cache = {}
+        return reloaded
+
+    def start(self):
+        self.load(force=True)
+        if self.reload_interval:
+            self._thread = threading.Thread(target=self._watch, name="threat-intel", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _watch(self):
+        while not self._closed.wait(self.reload_interval):
+            self.load()
+
+    def lookup(self, value):
+        """Names of the lists containing an address (empty tuple if none)"""
+        cache = self.cache
+        lists = cache.get(value)
+        if lists is not None:
+            return lists
+
+        try:
+            version, address = parse_ip(value)
+        except (OSError, ValueError, TypeError):
+            lists = ()
+        else:
+            lists = tuple(
+                blocklist.name for blocklist in self.blocklists
+                if blocklist.contains(version, address)
+            )
+
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        cache[value] = lists
+        return lists
+
+    def enrich(self, docs):
+        """Tag docs in place; the first listed IP field wins"""
+        for doc in docs:
+            for field in self.fields:
+                value = doc.get(field)
+                # JSON logs can carry anything here, e.g. a list of addresses
+                if not value or not isinstance(value, str):
+                    continue
+                lists = self.lookup(value)
+                if lists:
+                    doc["threat_match"] = True
+                    doc["threat_ip"] = value
+                    doc["threat_field"] = field
+                    doc["threat_lists"] = list(lists)
+                    break
@@ -0,0 +1,241 @@
+# src/timestamps.py
+from datetime import date
+
+
+MONTHS = {
+    name: number for number, name in enumerate(
+        ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1
+    )
+}
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAY_MS = 86400 * 1000
+
+# Years 1-9999; iso_utc and partition_for_ms can't name a day outside them
+MIN_MS = (date.min.toordinal() - EPOCH_ORDINAL) * DAY_MS
+MAX_MS = (date.max.toordinal() + 1 - EPOCH_ORDINAL) * DAY_MS - 1
+
+# Logs span a handful of days, so the caches below stay small; the cap guards
+# against a source full of garbage dates
+MAX_CACHED = 10000
+
+# Anything that can go wrong slicing or converting a string in the wrong format
+PARSE_ERRORS = (ValueError, KeyError, IndexError, TypeError, AttributeError)
+
+_epoch_days = {}
+_day_names = {}
+_offsets = {}
+# Consecutive lines mostly share a minute, so that part is parsed and
+# formatted once: timestamp text up to the minute -> epoch millis, and
+# epoch minute -> "YYYY-MM-DDTHH:MM:"
+_minute_starts = {}
+_minute_prefixes = {}
+
+
+def epoch_day(year, month, day):
+    """Days since 1970-01-01, cached per calendar date"""
+    key = year * 10000 + month * 100 + day
+    days = _epoch_days.get(key)
+    if days is None:
+        days = date(year, month, day).toordinal() - EPOCH_ORDINAL
+        _remember(_epoch_days, key, days)
+    return days
+
+
+def day_names(days):
+    """("YYYY-MM-DD", "YYYY.MM.DD") for a day number, cached"""
+    names = _day_names.get(days)
+    if names is None:
+        iso = date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+        names = _remember(_day_names, days, (iso, iso.replace("-", ".")))
+    return names
+
+
+def _remember(cache, key, value):
+    if len(cache) >= MAX_CACHED:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def to_epoch_ms(year, month, day, hour, minute, second, millis=0, offset_minutes=0):
+    if hour > 23 or minute > 59 or second > 60:
+        raise ValueError("time out of range")
+    seconds = epoch_day(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+    return (seconds - offset_minutes * 60) * 1000 + millis
+
+
+def parse_offset(value):
+    """Minutes east of UTC for "", "Z", "+HH:MM", "+HHMM" or "+HH" (naive counts as UTC)"""
+    minutes = _offsets.get(value)
+    if minutes is None:
+        minutes = _remember(_offsets, value, _parse_offset(value))
+    return minutes
+
+
+def _parse_offset(value):
+    if value in ("", "Z", "z"):
+        return 0
+    sign = -1 if value[0] == "-" else 1
+    if value[0] not in "+-":
+        raise ValueError(f"bad offset: {value}")
+    digits = value[1:].replace(":", "")
+    if len(digits) not in (2, 4):
+        raise ValueError(f"bad offset: {value}")
+    return sign * (int(digits[:2]) * 60 + int(digits[2:] or 0))
+
+
+def parse_iso(value):
+    """2026-02-07T10:15:30[.123456][Z|+01:00], also with a space separator"""
+    if value[4] != "-" or value[7] != "-" or value[10] not in "T " \
+            or value[13] != ":" or value[16] != ":":
+        raise ValueError(f"not ISO 8601: {value}")
+
+    minute = value[:16]
+    start = _minute_starts.get(minute)
+    if start is None:
+        start = _remember(_minute_starts, minute, to_epoch_ms(
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), 0))
+
+    rest = value[19:]
+    millis = 0
+    if rest[:1] in (".", ","):
+        end = 1
+        while end < len(rest) and rest[end].isdigit():
+            end += 1
+        millis = int((rest[1:end] + "00")[:3])
+        rest = rest[end:]
+
+    return start + _seconds(value[17:19]) * 1000 + millis - parse_offset(rest) * 60000
+
+
+def _seconds(value):
+    second = int(value)
+    if not 0 <= second <= 60 or not value.isdigit():
+        raise ValueError(f"bad seconds: {value}")
+    return second
+
+
+def parse_clf(value):
+    """Apache common log format: 10/Oct/2000:13:55:36 -0700"""
+    if value[2] != "/" or value[6] != "/" or value[11] != ":" or len(value) != 26:
+        raise ValueError(f"not a CLF timestamp: {value}")
+
+    minute = value[:17]
+    start = _minute_starts.get(minute)
+    if start is None:
+        start = _remember(_minute_starts, minute, to_epoch_ms(
+            int(value[7:11]), MONTHS[value[3:6]], int(value[0:2]),
+            int(value[12:14]), int(value[15:17]), 0))
+
+    return start + _seconds(value[18:20]) * 1000 - parse_offset(value[21:]) * 60000
+
+
+def parse_windows(value):
+    """Windows event log: 1/15/2023 10:15:30 AM (local time, treated as UTC)"""
+    day_part, time_part, meridiem = value.split(" ")
+    month, day, year = day_part.split("/")
+    hour, minute, second = time_part.split(":")
+
+    hour = int(hour)
+    if not 1 <= hour <= 12 or meridiem not in ("AM", "PM"):
+        raise ValueError(f"not a Windows timestamp: {value}")
+    hour = hour % 12 + (12 if meridiem == "PM" else 0)
+
+    return to_epoch_ms(int(year), int(month), int(day), hour, int(minute), int(second))
+
+
+def parse_epoch(value):
+    """Unix time as a number or digit string: seconds, or millis past 1e11"""
+    if isinstance(value, bool):
+        raise TypeError("not a timestamp")
+    number = float(value)
+    if number != number or abs(number) > 1e15:
+        raise ValueError(f"not a Unix time: {value}")
+    return int(number if abs(number) >= 1e11 else number * 1000)
+
+
+FORMATS = {
+    "iso": parse_iso,
+    "clf": parse_clf,
+    "windows": parse_windows,
+    "epoch": parse_epoch
+}
+
+
+def iso_utc(ms):
+    """Epoch millis as 2026-02-07T10:15:30.000Z"""
+    minutes, ms = divmod(ms, 60000)
+    prefix = _minute_prefixes.get(minutes)
+    if prefix is None:
+        days, minute = divmod(minutes, 1440)
+        hour, minute = divmod(minute, 60)
+        prefix = _remember(_minute_prefixes, minutes,
+                           f"{day_names(days)[0]}T{hour:02d}:{minute:02d}:")
+    second, millis = divmod(ms, 1000)
+    return f"{prefix}{second:02d}.{millis:03d}Z"
+
+
+def partition_for_ms(ms):
+    """Daily partition name (YYYY.MM.DD) of an epoch-millis timestamp"""
+    return day_names(ms // DAY_MS)[1]
+
+
+class TimestampNormalizer:
+    """Turn whatever timestamp a source uses into UTC epoch millis
+
+    The first timestamp seen from a source is tried against every known
+    format; the one that parses is remembered and used directly afterwards,
+    falling back to detection again only if it stops matching. Each format
+    is parsed by slicing fixed offsets rather than through strptime.
+    """
+
+    def __init__(self, formats=None):
+        self.formats = formats or FORMATS
+        self.detected = {}
+
+    def parse(self, value, source=None):
+        """Epoch millis, or None when no known format matches
+
+        A time outside years 1-9999 (e.g. an epoch in microseconds, or
+        9999-12-31 with a negative offset) counts as not matching.
+        """
+        parser = self.detected.get(source)
+        if parser is not None:
+            try:
+                ms = parser(value)
+                if MIN_MS <= ms <= MAX_MS:
+                    return ms
+            except PARSE_ERRORS:
+                pass
+
+        for candidate in self.formats.values():
+            if candidate is parser:
+                continue
+            try:
+                ms = candidate(value)
+            except PARSE_ERRORS:
+                continue
+            if not MIN_MS <= ms <= MAX_MS:
+                continue
+            self.detected[source] = candidate
+            return ms
+        return None
+
+    def format_of(self, source):
+        parser = self.detected.get(source)
+        for name, candidate in self.formats.items():
+            if candidate is parser:
+                return name
+        return None
+
+    def normalize(self, doc, value, source=None):
+        """Set doc timestamp (ISO UTC) and timestamp_ms; unknown formats are kept as is"""
+        ms = self.parse(value, source)
+        if ms is None:
+            doc["timestamp"] = value
+        else:
+            doc["timestamp"] = iso_utc(ms)
+            doc["timestamp_ms"] = ms
+        return doc
@@ -0,0 +1,124 @@
+# tests/test_async_collector.py
+import os
+import json
+import time
+import socket
+import threading
+
+import pytest
+
+from src.async_collector import AsyncLogCollector
+from src.local_store import LocalStore
+from src.storage import set_client
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def connect(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return socket.create_connection(("127.0.0.1", port))
+        except ConnectionRefusedError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+def indexed(store):
+    return store.count(index="siem-logs-*")["count"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalStore(str(tmp_path / "siem.db"))
+    set_client(store)
+    yield store
+    set_client(None)
+    store.close()
+
+
+def write_config(tmp_path, log_sources, **sections):
+    config = {
+        "log_sources": log_sources,
+        "checkpoint_path": str(tmp_path / "checkpoints.json"),
+        "async": {"poll_interval": 0.05, "readers": 2, "read_threads": 2},
+        "bulk": {"max_latency": 0.05}
+    }
+    config.update(sections)
+    path = tmp_path / "log_sources.json"
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def run_collector(config_path):
+    collector = AsyncLogCollector(config_path)
+    thread = threading.Thread(target=collector.start_collection, daemon=True)
+    thread.start()
+    assert wait_for(lambda: collector.sender is not None)
+    return collector, thread
+
+
+def stop_collector(collector, thread):
+    collector.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_network_input_lines_are_indexed(tmp_path, store):
+    port = free_port()
+    config_path = write_config(tmp_path, [], network_inputs=[{
+        "protocol": "tcp", "host": "127.0.0.1", "port": port,
+        "format": "json", "flush_interval": 0.05
+    }])
+    collector, thread = run_collector(config_path)
+
+    try:
+        with connect(port) as conn:
+            conn.sendall(b"".join(
+                json.dumps({"message": f"event {i}"}).encode() + b"\n" for i in range(20)
+            ))
+
+        assert wait_for(lambda: indexed(store) == 20)
+    finally:
+        stop_collector(collector, thread)
+
+    assert indexed(store) == 20
+
+
+def test_removed_source_stops_being_indexed(tmp_path, store):
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    log_file = log_dir / "app.log"
+    log_file.write_text("".join(json.dumps({"message": f"before {i}"}) + "\n" for i in range(5)))
+
+    config_path = write_config(tmp_path, [{"path": str(log_dir)}])
+    collector, thread = run_collector(config_path)
+
+    try:
+        assert wait_for(lambda: indexed(store) == 5)
+        assert str(log_file) in collector.tailers
+
+        collector.reload_config({"log_sources": []})
+        assert wait_for(lambda: str(log_file) not in collector.tailers)
+
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"message": "after removal"}) + "\n")
+        time.sleep(0.5)
+    finally:
+        stop_collector(collector, thread)
+
+    assert indexed(store) == 5